@@ -2,14 +2,17 @@
 agent/tool_schemas.py - LLM Tool Calling을 위한 도구 정의
 LangChain @tool 데코레이터를 사용하여 LLM이 호출할 수 있는 도구들을 정의합니다.
 """
-from typing import Optional
+from typing import List, Optional
 from langchain_core.tools import tool
 
 from agent.tools import (
     tool_get_merchant_metrics,
     tool_get_merchant_metrics_history_summary,
     tool_predict_revenue,
+    tool_predict_revenue_batch,
     tool_detect_anomaly,
+    tool_detect_anomaly_batch,
+    tool_scan_anomalies,
     tool_classify_growth,
     tool_list_merchants,
     tool_rank_merchants,
@@ -66,6 +69,32 @@ def predict_revenue(merchant_id: str) -> dict:
     return tool_predict_revenue(merchant_id)
 
 
+@tool
+def predict_revenue_batch(
+    merchant_ids: Optional[List[str]] = None,
+    industry: Optional[str] = None,
+    region: Optional[str] = None,
+) -> dict:
+    """
+    여러 가맹점의 다음 달 매출을 한 번에 예측합니다.
+    가맹점 ID 목록을 주거나, 업종/지역 필터로 대상 가맹점을 선택합니다.
+
+    사용 예시:
+    - "M0001, M0002, M0003 매출 예측" → merchant_ids=["M0001", "M0002", "M0003"]
+    - "카페 업종 가맹점들 다음 달 매출 예측" → industry="카페"
+    - "서울 지역 전체 매출 예측" → region="서울"
+
+    Args:
+        merchant_ids: 가맹점 ID 목록 (예: ["M0001", "M0002"])
+        industry: 업종 필터 (merchant_ids가 없을 때 사용)
+        region: 지역 필터 (merchant_ids가 없을 때 사용)
+
+    Returns:
+        가맹점별 현재 매출, 예측 매출, 변화율 목록
+    """
+    return tool_predict_revenue_batch(merchant_ids, industry, region)
+
+
 @tool
 def detect_anomaly(merchant_id: str) -> dict:
     """
@@ -81,6 +110,61 @@ def detect_anomaly(merchant_id: str) -> dict:
     return tool_detect_anomaly(merchant_id)
 
 
+@tool
+def detect_anomaly_batch(
+    merchant_ids: Optional[List[str]] = None,
+    industry: Optional[str] = None,
+    region: Optional[str] = None,
+) -> dict:
+    """
+    여러 가맹점의 이상 여부와 주요 영향 요인을 한 번에 탐지합니다.
+    가맹점 ID 목록을 주거나, 업종/지역 필터로 대상 가맹점을 선택합니다.
+
+    사용 예시:
+    - "M0001, M0002 이상 탐지" → merchant_ids=["M0001", "M0002"]
+    - "카페 업종 가맹점 이상 여부" → industry="카페"
+
+    Args:
+        merchant_ids: 가맹점 ID 목록 (예: ["M0001", "M0002"])
+        industry: 업종 필터 (merchant_ids가 없을 때 사용)
+        region: 지역 필터 (merchant_ids가 없을 때 사용)
+
+    Returns:
+        가맹점별 이상 여부, 이상 점수, 주요 영향 요인 목록
+    """
+    return tool_detect_anomaly_batch(merchant_ids, industry, region)
+
+
+@tool
+def scan_anomalies(
+    start_month: Optional[str] = None,
+    end_month: Optional[str] = None,
+    industry: Optional[str] = None,
+    region: Optional[str] = None,
+    top_n: int = 10,
+) -> dict:
+    """
+    전체 가맹점의 월별 데이터를 스캔하여 이상 점수가 가장 낮은(가장 이상한) 가맹점-월을 조회합니다.
+    특정 가맹점이 아닌 전체/기간/업종/지역 단위 이상 거래 점검에 사용합니다.
+
+    사용 예시:
+    - "전체 가맹점 중 이상 거래 상위 10개" → top_n=10
+    - "2024-01부터 2024-03까지 이상 가맹점" → start_month="2024-01", end_month="2024-03"
+    - "카페 업종 이상 거래 점검" → industry="카페"
+
+    Args:
+        start_month: 시작 월 (YYYY-MM, 선택)
+        end_month: 종료 월 (YYYY-MM, 선택)
+        industry: 업종 필터 (선택)
+        region: 지역 필터 (선택)
+        top_n: 조회할 개수 (기본값: 10)
+
+    Returns:
+        이상 점수 순 가맹점-월 목록 (가맹점ID, 월, 점수)과 전체 건수
+    """
+    return tool_scan_anomalies(start_month, end_month, industry, region, top_n)
+
+
 @tool
 def classify_growth(merchant_id: str) -> dict:
     """
@@ -231,7 +315,10 @@ ALL_TOOLS = [
     get_merchant_metrics,
     get_merchant_history,
     predict_revenue,
+    predict_revenue_batch,
     detect_anomaly,
+    detect_anomaly_batch,
+    scan_anomalies,
     classify_growth,
     list_merchants,
     rank_merchants,
@@ -9,20 +9,34 @@ import pandas as pd
 
 from core.constants import (
     FEATURE_COLS_REG, FEATURE_COLS_ANOMALY, FEATURE_COLS_CLF,
-    FEATURE_LABELS, RECO_COL_USER, RECO_COL_ITEM, DEFAULT_TOPN,
+    FEATURE_LABELS, RECO_COL_USER, RECO_COL_ITEM, DEFAULT_TOPN, MAX_BATCH_MERCHANTS, MAX_BATCH_CUSTOMERS,
 )
 from core.utils import safe_str, safe_int, safe_float, json_sanitize
-from ml.helpers import to_numeric_df, build_feature_df, normalize_importance, topk_importance
+from ml.helpers import to_numeric_df, normalize_importance, topk_importance, contribution_factors
+from ml.forest import merchant_contributions, predict_classes, predict_regression
 from data.loader import _merge_merchant_meta, _ensure_popular_merchants
+from data.latest_store import LatestRow
+from ml.scores import get_score_table, lookup_scores
+from ml.anomaly_scan import scan_anomalies
+from ml.sar_serving import (
+    has_user, recommend_for_user, recommend_for_users, reco_ready, sar_package_available, similar_items,
+)
 import state as st
 
 
 # ============================================================
 # 내부 유틸
 # ============================================================
-def _latest_row_for_merchant(merchant_id: str) -> Optional[pd.Series]:
-    key = safe_str(merchant_id, "").strip()
-    return st.LATEST_METRICS_MAP.get(key)
+HISTORY_COLS = [
+    "txn_month", "total_revenue", "revenue_growth_rate", "txn_count", "unique_customers",
+    "avg_order_value", "repeat_purchase_rate", "ltv_cac_ratio", "industry", "region", "growth_type",
+]
+
+
+def _latest_row_for_merchant(merchant_id: str) -> Optional[LatestRow]:
+    if st.LATEST_STORE is None:
+        return None
+    return st.LATEST_STORE.row(merchant_id)
 
 
 # ============================================================
@@ -36,29 +50,26 @@ def tool_get_merchant_metrics(merchant_id: str) -> dict:
     return {
         "status": "SUCCESS",
         "가맹점ID": safe_str(merchant_id).strip(),
-        "기준월": safe_str(latest.get("txn_month", "")),
-        "매출": safe_int(latest.get("total_revenue", 0)),
-        "성장률": round(safe_float(latest.get("revenue_growth_rate", 0.0)), 4),
-        "객단가": safe_int(latest.get("avg_order_value", 0)),
-        "재구매율": round(safe_float(latest.get("repeat_purchase_rate", 0.0)), 4),
-        "LTV_CAC": round(safe_float(latest.get("ltv_cac_ratio", 0.0)), 4),
-        "업종": safe_str(latest.get("industry", "")),
-        "지역": safe_str(latest.get("region", "")),
-        "성장유형": safe_str(latest.get("growth_type", "")),
+        "기준월": latest.get_str("txn_month"),
+        "매출": latest.get_int("total_revenue"),
+        "성장률": round(latest.get_float("revenue_growth_rate"), 4),
+        "객단가": latest.get_int("avg_order_value"),
+        "재구매율": round(latest.get_float("repeat_purchase_rate"), 4),
+        "LTV_CAC": round(latest.get_float("ltv_cac_ratio"), 4),
+        "업종": latest.get_str("industry"),
+        "지역": latest.get_str("region"),
+        "성장유형": latest.get_str("growth_type"),
     }
 
 
 def tool_get_merchant_metrics_history_summary(merchant_id: str, months: int = 6) -> dict:
-    key = safe_str(merchant_id).strip()
-    data = st.METRICS_BY_MERCHANT.get(key)
+    hist = st.METRICS_HISTORY.records(merchant_id, cols=HISTORY_COLS, tail=int(months)) if st.METRICS_HISTORY is not None else None
 
-    if data is None:
+    if hist is None:
         return {"status": "FAILED", "error": f"가맹점 {merchant_id} 없음"}
 
-    tail = data.tail(int(months)).copy()
-
     rows = []
-    for _, r in tail.iterrows():
+    for r in hist:
         rows.append({
             "기준월": safe_str(r.get("txn_month", "")),
             "매출": safe_int(r.get("total_revenue", 0)),
@@ -96,6 +107,14 @@ def tool_get_merchant_metrics_history_summary(merchant_id: str, months: int = 6)
 # ============================================================
 # 매출 예측
 # ============================================================
+def _revenue_top_factors(top_k: int) -> Optional[List[dict]]:
+    """매출 모델 전역 feature importance 상위 k개 (가맹점과 무관, 예측 없이 계산)"""
+    global_imp = getattr(st.rf_reg, "feature_importances_", None)
+    if global_imp is None:
+        return None
+    return topk_importance(FEATURE_COLS_REG, np.array(global_imp, dtype=float), top_k, FEATURE_LABELS)
+
+
 def tool_explain_revenue_prediction(merchant_id: str, top_k: int = 5) -> dict:
     latest = _latest_row_for_merchant(merchant_id)
     if latest is None:
@@ -103,14 +122,29 @@ def tool_explain_revenue_prediction(merchant_id: str, top_k: int = 5) -> dict:
     if st.rf_reg is None:
         return {"status": "FAILED", "error": "매출 예측 모델이 로드되지 않았습니다."}
 
-    x_df = build_feature_df(latest, FEATURE_COLS_REG)
-    pred0 = float(st.rf_reg.predict(x_df)[0])
+    s = lookup_scores(merchant_id)
+    if s is not None and "revenue_pred" in s:
+        pred0 = float(s["revenue_pred"])
+    else:
+        pred0 = float(predict_regression("rf_reg", latest.feature_frame(FEATURE_COLS_REG), FEATURE_COLS_REG)[0])
 
-    global_imp = getattr(st.rf_reg, "feature_importances_", None)
-    if global_imp is None:
-        return {"status": "FAILED", "error": "모델에 feature_importances_가 없습니다."}
+    # 가맹점별 트리 경로 기여도 (평탄화 불가 모델은 전역 importance로 폴백)
+    x_row = latest.feature_frame(FEATURE_COLS_REG).to_numpy()
+    dec = merchant_contributions("rf_reg", merchant_id, x_row)
+    if dec is not None:
+        return {
+            "status": "SUCCESS",
+            "가맹점ID": safe_str(merchant_id).strip(),
+            "model": "RandomForestRegressor",
+            "explain_type": "tree_contributions(saabas)",
+            "predicted": int(round(pred0)),
+            "base_value": int(round(float(dec["bias"][0]))),
+            "top_factors": contribution_factors(FEATURE_COLS_REG, x_row[0], dec["contrib"][:, 0], top_k, FEATURE_LABELS),
+        }
 
-    top = topk_importance(FEATURE_COLS_REG, np.array(global_imp, dtype=float), top_k, FEATURE_LABELS)
+    top = _revenue_top_factors(top_k)
+    if top is None:
+        return {"status": "FAILED", "error": "모델에 feature_importances_가 없습니다."}
 
     return {
         "status": "SUCCESS",
@@ -129,13 +163,20 @@ def tool_predict_revenue(merchant_id: str, top_k: int = 5, include_explain: bool
     if st.rf_reg is None:
         return {"status": "FAILED", "error": "매출 예측 모델이 로드되지 않았습니다."}
 
-    cur_rev = safe_float(latest.get("total_revenue", 0.0))
-    x_df = build_feature_df(latest, FEATURE_COLS_REG)
-    pred = float(st.rf_reg.predict(x_df)[0])
+    s = lookup_scores(merchant_id)
+    if s is not None and "revenue_pred" in s:
+        # 점수 테이블 (데이터/모델 버전별 일괄 계산)
+        cur_rev = float(s["revenue_current"])
+        pred = float(s["revenue_pred"])
+        change_pct = float(s["revenue_change_pct"])
+    else:
+        cur_rev = latest.get_float("total_revenue")
+        x_df = latest.feature_frame(FEATURE_COLS_REG)
+        pred = float(predict_regression("rf_reg", x_df, FEATURE_COLS_REG)[0])
 
-    change_pct = 0.0
-    if cur_rev != 0:
-        change_pct = float((pred - cur_rev) / cur_rev * 100)
+        change_pct = 0.0
+        if cur_rev != 0:
+            change_pct = float((pred - cur_rev) / cur_rev * 100)
 
     base = {
         "status": "SUCCESS",
@@ -146,62 +187,202 @@ def tool_predict_revenue(merchant_id: str, top_k: int = 5, include_explain: bool
     }
 
     if include_explain:
-        explain = tool_explain_revenue_prediction(merchant_id, top_k=top_k)
-        if explain.get("status") == "SUCCESS":
-            base["top_factors"] = explain.get("top_factors", [])
-            base["explain_model"] = explain.get("model", "RandomForestRegressor")
-            base["explain_type"] = explain.get("explain_type", "feature_importances")
+        # 설명은 전역 importance라 같은 행을 다시 예측할 필요 없음
+        top = _revenue_top_factors(top_k)
+        if top is not None:
+            base["top_factors"] = top
+            base["explain_model"] = "RandomForestRegressor"
+            base["explain_type"] = "feature_importances"
 
     return base
 
 
+def _resolve_batch_merchants(
+    merchant_ids: Optional[List[str]], industry: Optional[str], region: Optional[str]
+) -> List[str]:
+    """명시된 ID 목록(순서 유지, 중복 제거) 또는 최신 행 기준 업종/지역 필터 결과"""
+    if merchant_ids:
+        seen = set()
+        out = []
+        for m in merchant_ids:
+            k = safe_str(m).strip()
+            if k and k not in seen:
+                seen.add(k)
+                out.append(k)
+        return out
+
+    store = st.LATEST_STORE
+    mask = np.ones(len(store), dtype=bool)
+    for col, val in (("industry", industry), ("region", region)):
+        if val and col in store.columns:
+            vals = np.asarray([safe_str(x).strip() for x in store.columns[col]], dtype=object)
+            mask &= vals == safe_str(val).strip()
+    return store.ids[mask].tolist()
+
+
+def _batch_targets(
+    merchant_ids: Optional[List[str]], industry: Optional[str], region: Optional[str], limit: int
+):
+    """(찾은 ID, 최신 행 위치, 없는 ID, 잘림 여부) - 대상이 없으면 None"""
+    limit = max(1, min(int(limit), MAX_BATCH_MERCHANTS))
+    targets = _resolve_batch_merchants(merchant_ids, industry, region)
+    if not targets:
+        return None
+    truncated = len(targets) > limit
+    targets = targets[:limit]
+
+    pos = st.LATEST_STORE.positions(targets)
+    found = pos >= 0
+    missing = [m for m, ok in zip(targets, found.tolist()) if not ok]
+    ids = [m for m, ok in zip(targets, found.tolist()) if ok]
+    return ids, pos[found], missing, truncated
+
+
+def _batch_filter_desc(merchant_ids: Optional[List[str]], industry: Optional[str], region: Optional[str]) -> str:
+    filter_desc = []
+    if not merchant_ids:
+        if industry:
+            filter_desc.append(f"업종={industry}")
+        if region:
+            filter_desc.append(f"지역={region}")
+    return ", ".join(filter_desc) if filter_desc else ("ID 목록" if merchant_ids else "전체")
+
+
+def tool_predict_revenue_batch(
+    merchant_ids: Optional[List[str]] = None,
+    industry: Optional[str] = None,
+    region: Optional[str] = None,
+    top_k: int = 5,
+    include_explain: bool = False,
+    limit: int = MAX_BATCH_MERCHANTS,
+) -> dict:
+    """
+    여러 가맹점 매출 예측 (점수 테이블 조회, 없으면 특성 행을 한 행렬로 모아 predict 1회).
+    merchant_ids가 없으면 industry/region 필터(둘 다 없으면 전체)로 대상 선택.
+    """
+    store = st.LATEST_STORE
+    if not store:
+        return {"status": "FAILED", "error": "metrics 데이터가 없습니다."}
+    if st.rf_reg is None:
+        return {"status": "FAILED", "error": "매출 예측 모델이 로드되지 않았습니다."}
+
+    batch = _batch_targets(merchant_ids, industry, region, limit)
+    if batch is None:
+        return {"status": "FAILED", "error": "예측할 가맹점이 없습니다."}
+    ids, pos, missing, truncated = batch
+
+    results: List[dict] = []
+    if len(pos):
+        table = get_score_table()
+        if table is not None and table.has("revenue_pred") and table.store is store:
+            cur = table.take(pos, "revenue_current")
+            preds = table.take(pos, "revenue_pred")
+            change = table.take(pos, "revenue_change_pct")
+        else:
+            preds = predict_regression("rf_reg", store.gather(pos, FEATURE_COLS_REG), FEATURE_COLS_REG)
+            cur = store.numeric_column("total_revenue")[pos]
+            cur = np.where(np.isfinite(cur), cur, 0.0)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                change = np.where(cur != 0, (preds - cur) / np.where(cur != 0, cur, 1.0) * 100, 0.0)
+        for mid, c, p, ch in zip(ids, cur.tolist(), preds.tolist(), change.tolist()):
+            results.append({
+                "가맹점ID": mid,
+                "현재매출": int(round(c)),
+                "예측매출": int(round(p)),
+                "변화율": round(float(ch), 2),
+            })
+
+    out = {
+        "status": "SUCCESS",
+        "filter": _batch_filter_desc(merchant_ids, industry, region),
+        "count": len(results),
+        "truncated": truncated,
+        "missing": missing,
+        "results": results,
+    }
+    if include_explain:
+        top = _revenue_top_factors(top_k)
+        if top is not None:
+            out["top_factors"] = top
+            out["explain_model"] = "RandomForestRegressor"
+            out["explain_type"] = "feature_importances"
+    return out
+
+
 # ============================================================
 # 이상 탐지
 # ============================================================
-def anomaly_pseudo_permutation_importance(x_df: pd.DataFrame, feature_cols: List[str], top_k: int) -> List[dict]:
-    if st.iso_forest is None or st.scaler is None or st.metrics_clean is None or len(st.metrics_clean) == 0:
-        return []
-
-    x_df = to_numeric_df(x_df, feature_cols)
-    score0 = float(st.iso_forest.decision_function(st.scaler.transform(x_df))[0])
-
-    medians: Dict[str, float] = {}
+def _anomaly_medians(feature_cols: List[str]) -> Dict[str, float]:
+    """metrics_clean 피처별 중앙값 (데이터 버전이 바뀔 때만 다시 계산)"""
+    df = st.metrics_clean
+    key = (st.DATA_VERSION, id(df))
+    cached = st.ANOMALY_MEDIANS
+    if cached is not None and cached[0] == key and all(f in cached[1] for f in feature_cols):
+        return cached[1]
+
+    medians: Dict[str, float] = dict(cached[1]) if cached is not None and cached[0] == key else {}
     for f in feature_cols:
-        if f in st.metrics_clean.columns:
+        if f in medians:
+            continue
+        if f in df.columns:
             try:
-                med_val = pd.to_numeric(st.metrics_clean[f], errors="coerce").median()
+                med_val = pd.to_numeric(df[f], errors="coerce").astype(float).median()
                 medians[f] = 0.0 if pd.isna(med_val) else float(med_val)
             except Exception:
                 medians[f] = 0.0
         else:
             medians[f] = 0.0
+    st.ANOMALY_MEDIANS = (key, medians)
+    return medians
 
-    rows = []
-    for f in feature_cols:
-        x_rep = x_df.copy()
-        original_value = safe_float(x_df.iloc[0].get(f, 0.0), 0.0)
-        x_rep.loc[:, f] = medians.get(f, 0.0)
-        score_r = float(st.iso_forest.decision_function(st.scaler.transform(x_rep))[0])
-        drop = max(0.0, score0 - score_r)
 
-        rows.append({
+def anomaly_pseudo_permutation_importance_batch(x_df: pd.DataFrame, feature_cols: List[str], top_k: int) -> List[List[dict]]:
+    """
+    여러 행의 중앙값 대체 중요도를 한 번에 계산.
+    행마다 [원본, 피처1 대체, ..., 피처F 대체] 변형을 하나의 행렬로 쌓아 scaler/decision_function 1회 호출
+    """
+    if st.iso_forest is None or st.scaler is None or st.metrics_clean is None or len(st.metrics_clean) == 0:
+        return [[] for _ in range(len(x_df))]
+    if len(x_df) == 0:
+        return []
+
+    x_df = to_numeric_df(x_df, feature_cols)
+    medians = _anomaly_medians(feature_cols)
+    x = x_df.to_numpy(dtype=float)
+    n, n_feat = x.shape
+    med = np.array([medians.get(f, 0.0) for f in feature_cols], dtype=float)
+
+    # (n, 1 + F, F): 0번은 원본, j+1번은 피처 j를 중앙값으로 대체
+    variants = np.repeat(x[:, None, :], n_feat + 1, axis=1)
+    idx = np.arange(n_feat)
+    variants[:, idx + 1, idx] = med
+    stacked = pd.DataFrame(variants.reshape(-1, n_feat), columns=feature_cols)
+    scores = np.asarray(st.iso_forest.decision_function(st.scaler.transform(stacked)), dtype=float).reshape(n, n_feat + 1)
+
+    score0 = scores[:, 0]
+    drops = np.maximum(0.0, score0[:, None] - scores[:, 1:])
+
+    out: List[List[dict]] = []
+    for i in range(n):
+        norm = normalize_importance(drops[i])
+        rows = [{
             "feature": f,
             "feature_label": FEATURE_LABELS.get(f, f),
-            "original_value": float(original_value),
-            "baseline_median": float(medians.get(f, 0.0)),
-            "score0": round(float(score0), 6),
-            "score_replaced": round(float(score_r), 6),
-            "importance": float(drop),
-            "importance_pct": 0.0,
-        })
+            "original_value": float(x[i, j]),
+            "baseline_median": float(med[j]),
+            "score0": round(float(score0[i]), 6),
+            "score_replaced": round(float(scores[i, j + 1]), 6),
+            "importance": float(drops[i, j]),
+            "importance_pct": round(float(norm[j]) * 100, 4),
+        } for j, f in enumerate(feature_cols)]
+        rows.sort(key=lambda r: r["importance"], reverse=True)
+        out.append(rows[:int(top_k)])
+    return out
 
-    imp = np.array([r["importance"] for r in rows], dtype=float)
-    norm = normalize_importance(imp)
-    for i, r in enumerate(rows):
-        r["importance_pct"] = round(float(norm[i]) * 100, 4)
 
-    rows.sort(key=lambda r: r["importance"], reverse=True)
-    return rows[:int(top_k)]
+def anomaly_pseudo_permutation_importance(x_df: pd.DataFrame, feature_cols: List[str], top_k: int) -> List[dict]:
+    res = anomaly_pseudo_permutation_importance_batch(x_df.iloc[:1], feature_cols, top_k)
+    return res[0] if res else []
 
 
 def tool_explain_anomaly_detection(merchant_id: str, top_k: int = 5) -> dict:
@@ -211,10 +392,14 @@ def tool_explain_anomaly_detection(merchant_id: str, top_k: int = 5) -> dict:
     if st.iso_forest is None or st.scaler is None:
         return {"status": "FAILED", "error": "이상 탐지 모델이 로드되지 않았습니다."}
 
-    x_df = build_feature_df(latest, FEATURE_COLS_ANOMALY)
-    x_scaled = st.scaler.transform(x_df)
-    pred = int(st.iso_forest.predict(x_scaled)[0])
-    score0 = float(st.iso_forest.decision_function(x_scaled)[0])
+    x_df = latest.feature_frame(FEATURE_COLS_ANOMALY)
+    s = lookup_scores(merchant_id)
+    if s is not None and "anomaly_label" in s:
+        pred, score0 = int(s["anomaly_label"]), float(s["anomaly_score"])
+    else:
+        x_scaled = st.scaler.transform(x_df)
+        pred = int(st.iso_forest.predict(x_scaled)[0])
+        score0 = float(st.iso_forest.decision_function(x_scaled)[0])
 
     top = anomaly_pseudo_permutation_importance(x_df, FEATURE_COLS_ANOMALY, top_k)
 
@@ -236,30 +421,137 @@ def tool_detect_anomaly(merchant_id: str, top_k: int = 5, include_explain: bool
     if st.iso_forest is None or st.scaler is None:
         return {"status": "FAILED", "error": "이상 탐지 모델이 로드되지 않았습니다."}
 
-    x_df = build_feature_df(latest, FEATURE_COLS_ANOMALY)
-    x_scaled = st.scaler.transform(x_df)
+    s = lookup_scores(merchant_id)
+    if s is not None and "anomaly_label" in s:
+        pred, score = int(s["anomaly_label"]), float(s["anomaly_score"])
+    else:
+        x_scaled = st.scaler.transform(latest.feature_frame(FEATURE_COLS_ANOMALY))
+        pred = int(st.iso_forest.predict(x_scaled)[0])
+        score = float(st.iso_forest.decision_function(x_scaled)[0])
 
-    pred = int(st.iso_forest.predict(x_scaled)[0])
     base = {
         "status": "SUCCESS",
         "가맹점ID": safe_str(merchant_id).strip(),
         "결과": "이상" if pred == -1 else "정상",
-        "점수": round(float(st.iso_forest.decision_function(x_scaled)[0]), 4),
+        "점수": round(score, 4),
     }
 
     if include_explain:
-        explain = tool_explain_anomaly_detection(merchant_id, top_k=top_k)
-        if explain.get("status") == "SUCCESS":
-            base["top_factors"] = explain.get("top_factors", [])
-            base["explain_model"] = explain.get("model", "IsolationForest")
-            base["explain_type"] = explain.get("explain_type", "pseudo_permutation_importance(median_replace)")
+        base["top_factors"] = anomaly_pseudo_permutation_importance(latest.feature_frame(FEATURE_COLS_ANOMALY), FEATURE_COLS_ANOMALY, top_k)
+        base["explain_model"] = "IsolationForest"
+        base["explain_type"] = "pseudo_permutation_importance(median_replace)"
 
     return base
 
 
+def tool_detect_anomaly_batch(
+    merchant_ids: Optional[List[str]] = None,
+    industry: Optional[str] = None,
+    region: Optional[str] = None,
+    top_k: int = 5,
+    include_explain: bool = True,
+    limit: int = MAX_BATCH_MERCHANTS,
+) -> dict:
+    """
+    여러 가맹점 이상 탐지 (점수 테이블 조회 + 설명은 전체 변형 행렬 decision_function 1회).
+    merchant_ids가 없으면 industry/region 필터(둘 다 없으면 전체)로 대상 선택.
+    """
+    store = st.LATEST_STORE
+    if not store:
+        return {"status": "FAILED", "error": "metrics 데이터가 없습니다."}
+    if st.iso_forest is None or st.scaler is None:
+        return {"status": "FAILED", "error": "이상 탐지 모델이 로드되지 않았습니다."}
+
+    batch = _batch_targets(merchant_ids, industry, region, limit)
+    if batch is None:
+        return {"status": "FAILED", "error": "탐지할 가맹점이 없습니다."}
+    ids, pos, missing, truncated = batch
+
+    results: List[dict] = []
+    if len(pos):
+        table = get_score_table()
+        x_df = None
+        if table is not None and table.has("anomaly_label") and table.store is store:
+            labels = table.take(pos, "anomaly_label")
+            scores = table.take(pos, "anomaly_score")
+        else:
+            x_df = store.feature_frame(pos, FEATURE_COLS_ANOMALY)
+            x_scaled = st.scaler.transform(x_df)
+            labels = np.asarray(st.iso_forest.predict(x_scaled)).astype(int)
+            scores = np.asarray(st.iso_forest.decision_function(x_scaled), dtype=float)
+
+        factors = None
+        if include_explain:
+            if x_df is None:
+                x_df = store.feature_frame(pos, FEATURE_COLS_ANOMALY)
+            factors = anomaly_pseudo_permutation_importance_batch(x_df, FEATURE_COLS_ANOMALY, top_k)
+
+        for i, (mid, lab, sc) in enumerate(zip(ids, labels.tolist(), scores.tolist())):
+            row = {
+                "가맹점ID": mid,
+                "결과": "이상" if int(lab) == -1 else "정상",
+                "점수": round(float(sc), 4),
+            }
+            if factors is not None:
+                row["top_factors"] = factors[i]
+            results.append(row)
+
+    out = {
+        "status": "SUCCESS",
+        "filter": _batch_filter_desc(merchant_ids, industry, region),
+        "count": len(results),
+        "anomaly_count": sum(1 for r in results if r["결과"] == "이상"),
+        "truncated": truncated,
+        "missing": missing,
+        "results": results,
+    }
+    if include_explain:
+        out["explain_model"] = "IsolationForest"
+        out["explain_type"] = "pseudo_permutation_importance(median_replace)"
+    return out
+
+
+def tool_scan_anomalies(
+    start_month: Optional[str] = None,
+    end_month: Optional[str] = None,
+    industry: Optional[str] = None,
+    region: Optional[str] = None,
+    top_n: int = DEFAULT_TOPN,
+    offset: int = 0,
+    only_anomalies: bool = True,
+) -> dict:
+    """전체 가맹점-월 이상 스캔 (이상 점수 낮은 순 상위 top_n, offset 페이지)"""
+    return scan_anomalies(
+        start_month=start_month,
+        end_month=end_month,
+        industry=industry,
+        region=region,
+        only_anomalies=only_anomalies,
+        offset=offset,
+        limit=top_n,
+    )
+
+
 # ============================================================
 # 성장 분류
 # ============================================================
+def _growth_top_factors(top_k: int) -> Optional[List[dict]]:
+    """성장 분류 모델 전역 feature importance 상위 k개"""
+    global_imp = getattr(st.rf_clf, "feature_importances_", None)
+    if global_imp is None:
+        return None
+    return topk_importance(FEATURE_COLS_CLF, np.array(global_imp, dtype=float), top_k, FEATURE_LABELS)
+
+
+def _growth_prediction(merchant_id: str, latest: LatestRow):
+    """(성장유형, 최대 확률) - 점수 테이블 우선, 없으면 단건 계산"""
+    s = lookup_scores(merchant_id)
+    if s is not None and "growth_class" in s:
+        return safe_str(s["growth_class"]), float(s["growth_confidence"])
+    pred, proba = predict_classes("rf_clf", latest.feature_frame(FEATURE_COLS_CLF), FEATURE_COLS_CLF)
+    return safe_str(st.le_growth.inverse_transform(pred[:1])[0]), float(max(proba[0]))
+
+
 def tool_explain_growth_classification(merchant_id: str, top_k: int = 5) -> dict:
     latest = _latest_row_for_merchant(merchant_id)
     if latest is None:
@@ -267,19 +559,30 @@ def tool_explain_growth_classification(merchant_id: str, top_k: int = 5) -> dict
     if st.rf_clf is None or st.le_growth is None:
         return {"status": "FAILED", "error": "성장 분류 모델이 로드되지 않았습니다."}
 
-    x_df = build_feature_df(latest, FEATURE_COLS_CLF)
-    pred = st.rf_clf.predict(x_df)[0]
-    proba = st.rf_clf.predict_proba(x_df)[0]
+    pred_label, max_proba = _growth_prediction(merchant_id, latest)
+    conf = round(max_proba * 100, 2)
 
-    pred_label = safe_str(st.le_growth.inverse_transform([pred])[0])
-    conf = round(float(max(proba)) * 100, 2)
+    # 예측 클래스 확률에 대한 가맹점별 트리 경로 기여도
+    x_row = latest.feature_frame(FEATURE_COLS_CLF).to_numpy()
+    dec = merchant_contributions("rf_clf", merchant_id, x_row)
+    if dec is not None:
+        labels = [safe_str(x) for x in st.le_growth.inverse_transform(st.rf_clf.classes_)]
+        k = labels.index(pred_label) if pred_label in labels else int(np.argmax(dec["pred"]))
+        return {
+            "status": "SUCCESS",
+            "가맹점ID": safe_str(merchant_id).strip(),
+            "model": "RandomForestClassifier",
+            "explain_type": "tree_contributions(saabas)",
+            "predicted_class": pred_label,
+            "confidence": conf,
+            "base_probability": round(float(dec["bias"][k]) * 100, 2),
+            "top_factors": contribution_factors(FEATURE_COLS_CLF, x_row[0], dec["contrib"][:, k], top_k, FEATURE_LABELS),
+        }
 
-    global_imp = getattr(st.rf_clf, "feature_importances_", None)
-    if global_imp is None:
+    top = _growth_top_factors(top_k)
+    if top is None:
         return {"status": "FAILED", "error": "모델에 feature_importances_가 없습니다."}
 
-    top = topk_importance(FEATURE_COLS_CLF, np.array(global_imp, dtype=float), top_k, FEATURE_LABELS)
-
     return {
         "status": "SUCCESS",
         "가맹점ID": safe_str(merchant_id).strip(),
@@ -298,23 +601,21 @@ def tool_classify_growth(merchant_id: str, top_k: int = 5, include_explain: bool
     if st.rf_clf is None or st.le_growth is None:
         return {"status": "FAILED", "error": "성장 분류 모델이 로드되지 않았습니다."}
 
-    x_df = build_feature_df(latest, FEATURE_COLS_CLF)
-    pred = st.rf_clf.predict(x_df)[0]
-    proba = st.rf_clf.predict_proba(x_df)[0]
+    pred_label, max_proba = _growth_prediction(merchant_id, latest)
 
     base = {
         "status": "SUCCESS",
         "가맹점ID": safe_str(merchant_id).strip(),
-        "성장유형": safe_str(st.le_growth.inverse_transform([pred])[0]),
-        "신뢰도": round(float(max(proba)) * 100, 2),
+        "성장유형": pred_label,
+        "신뢰도": round(max_proba * 100, 2),
     }
 
     if include_explain:
-        explain = tool_explain_growth_classification(merchant_id, top_k=top_k)
-        if explain.get("status") == "SUCCESS":
-            base["top_factors"] = explain.get("top_factors", [])
-            base["explain_model"] = explain.get("model", "RandomForestClassifier")
-            base["explain_type"] = explain.get("explain_type", "feature_importances")
+        top = _growth_top_factors(top_k)
+        if top is not None:
+            base["top_factors"] = top
+            base["explain_model"] = "RandomForestClassifier"
+            base["explain_type"] = "feature_importances"
 
     return base
 
@@ -322,40 +623,51 @@ def tool_classify_growth(merchant_id: str, top_k: int = 5, include_explain: bool
 # ============================================================
 # 랭킹
 # ============================================================
+def _cube_mean(agg: Dict[str, Any], measure: str) -> np.ndarray:
+    """큐브 집계 결과의 그룹별 평균 (지표 컬럼이 없으면 0)"""
+    count = agg["count"]
+    total = agg["sum"].get(measure)
+    if total is None:
+        return np.zeros(len(count), dtype=float)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return total / count
+
+
 def tool_rank_dimension(
     dimension: str,
     start_month: Optional[str] = None,
     end_month: Optional[str] = None,
     top_n: int = DEFAULT_TOPN,
 ) -> dict:
-    from core.parsers import filter_metrics_by_month_range
+    from core.parsers import month_code_range
 
-    if st.metrics_clean is None or len(st.metrics_clean) == 0:
+    cube = st.METRICS_CUBE
+    if st.metrics_clean is None or len(st.metrics_clean) == 0 or cube is None:
         return {"status": "FAILED", "error": "metrics 데이터가 없습니다."}
 
     dim = safe_str(dimension).strip()
     if dim not in ("industry", "region", "growth_type"):
         return {"status": "FAILED", "error": f"지원하지 않는 dimension: {dim}"}
 
-    df = filter_metrics_by_month_range(st.metrics_clean, start_month, end_month)
-
-    if dim not in df.columns:
+    if dim not in cube.dims:
         return {"status": "FAILED", "error": f"{dim} 컬럼이 없습니다."}
 
-    rev = pd.to_numeric(df.get("total_revenue", 0.0), errors="coerce").replace([np.inf, -np.inf], np.nan).fillna(0.0)
-    gr = pd.to_numeric(df.get("revenue_growth_rate", 0.0), errors="coerce").replace([np.inf, -np.inf], np.nan).fillna(0.0)
-    rr = pd.to_numeric(df.get("repeat_purchase_rate", 0.0), errors="coerce").replace([np.inf, -np.inf], np.nan).fillna(0.0)
-
-    tmp = df.assign(_rev=rev, _gr=gr, _rr=rr)
+    # 월 범위에 해당하는 큐브 셀만 합산 (inf/결측은 0으로 취급)
+    month_range = month_code_range(start_month, end_month)
+    agg = cube.aggregate(dim, month_range=month_range)
+    if cube.presence:
+        merchants = cube.distinct_merchants(dim, month_range=month_range)[agg["codes"]]
+    else:
+        merchants = agg["count"]
 
-    g = tmp.groupby(tmp[dim].astype(str))
-    out = g.agg(
-        표본수=("_rev", "size"),
-        평균매출=("_rev", "mean"),
-        평균성장률=("_gr", "mean"),
-        평균재구매율=("_rr", "mean"),
-        가맹점수=("merchant_id", "nunique") if "merchant_id" in tmp.columns else ("_rev", "size"),
-    ).reset_index().rename(columns={dim: "그룹"})
+    out = pd.DataFrame({
+        "그룹": agg["labels"],
+        "표본수": agg["count"],
+        "평균매출": _cube_mean(agg, "total_revenue"),
+        "평균성장률": _cube_mean(agg, "revenue_growth_rate"),
+        "평균재구매율": _cube_mean(agg, "repeat_purchase_rate"),
+        "가맹점수": merchants,
+    })
 
     out["평균매출"] = out["평균매출"].round(0).astype(int)
     out["평균성장률"] = out["평균성장률"].round(2)
@@ -383,7 +695,7 @@ def tool_rank_merchants(
     가맹점 랭킹. industry/region으로 필터링 가능.
     예: 음식점 업종 Top 10 → industry="음식점", top_n=10
     """
-    from core.parsers import filter_metrics_by_month_range
+    from core.parsers import month_code_range
 
     if st.metrics_clean is None or len(st.metrics_clean) == 0:
         return {"status": "FAILED", "error": "metrics 데이터가 없습니다."}
@@ -392,39 +704,32 @@ def tool_rank_merchants(
     if m not in ("total_revenue", "revenue_growth_rate", "repeat_purchase_rate"):
         return {"status": "FAILED", "error": f"지원하지 않는 metric: {m}"}
 
-    df = filter_metrics_by_month_range(st.metrics_clean, start_month, end_month)
-    if "merchant_id" not in df.columns:
+    index = st.RANK_INDEX
+    if index is None or "merchant_id" not in index.keys:
         return {"status": "FAILED", "error": "merchant_id 컬럼이 없습니다."}
 
+    # 전체 기간은 사전 계산된 그룹 합계, 월 범위는 (그룹, 월) 셀 합산
+    decimals = 0 if m == "total_revenue" else 2
+    count, mean = index.group_stats(m, month_code_range(start_month, end_month), decimals)
+    mask = count > 0
+
     # 업종 필터
-    if industry and "industry" in df.columns:
-        industry_clean = safe_str(industry).strip()
-        df = df[df["industry"].astype(str).str.strip() == industry_clean]
-        if len(df) == 0:
+    if industry and "industry" in index.keys:
+        mask &= index.dim_mask("industry", safe_str(industry).strip())
+        if not mask.any():
             return {"status": "FAILED", "error": f"'{industry}' 업종에 해당하는 가맹점이 없습니다."}
 
     # 지역 필터
-    if region and "region" in df.columns:
-        region_clean = safe_str(region).strip()
-        df = df[df["region"].astype(str).str.strip() == region_clean]
-        if len(df) == 0:
+    if region and "region" in index.keys:
+        mask &= index.dim_mask("region", safe_str(region).strip())
+        if not mask.any():
             return {"status": "FAILED", "error": f"'{region}' 지역에 해당하는 가맹점이 없습니다."}
 
-    val = pd.to_numeric(df.get(m, 0.0), errors="coerce").replace([np.inf, -np.inf], np.nan).fillna(0.0)
-    tmp = df.assign(_val=val)
-
-    grp_cols = ["merchant_id"]
-    for c in ["merchant_name", "industry", "region", "growth_type"]:
-        if c in tmp.columns:
-            grp_cols.append(c)
-
-    g = tmp.groupby(grp_cols)["_val"].mean().reset_index().rename(columns={"_val": "평균값"})
-    if m == "total_revenue":
-        g["평균값"] = g["평균값"].round(0).astype(int)
-    else:
-        g["평균값"] = g["평균값"].round(2)
-
-    g = g.sort_values("평균값", ascending=False).head(int(top_n))
+    rounded = np.round(mean, decimals)
+    top = index.top(rounded, np.flatnonzero(mask), int(top_n))
+    data = index.records(top)
+    for rec, v in zip(data, rounded[top].tolist()):
+        rec["평균값"] = int(v) if m == "total_revenue" else float(v)
 
     filter_desc = []
     if industry:
@@ -438,8 +743,8 @@ def tool_rank_merchants(
         "filter": ", ".join(filter_desc) if filter_desc else "전체",
         "기간": f"{start_month or '전체'} ~ {end_month or '전체'}",
         "top_n": int(top_n),
-        "count": len(g),
-        "data": g.to_dict("records"),
+        "count": len(data),
+        "data": data,
     }
 
 
@@ -447,10 +752,11 @@ def tool_rank_merchants(
 # 업종 비교
 # ============================================================
 def tool_compare_industry(industry: str) -> dict:
-    if st.metrics_clean is None or len(st.metrics_clean) == 0:
+    cube = st.METRICS_CUBE
+    if st.metrics_clean is None or len(st.metrics_clean) == 0 or cube is None:
         return {"status": "FAILED", "error": "metrics 데이터가 없습니다."}
 
-    if "industry" not in st.metrics_clean.columns:
+    if "industry" not in cube.dims:
         return {"status": "FAILED", "error": "industry 컬럼이 없습니다."}
 
     from core.parsers import _norm_key
@@ -458,7 +764,7 @@ def tool_compare_industry(industry: str) -> dict:
     if not raw_industry:
         return {"status": "FAILED", "error": "업종명이 비어 있습니다."}
 
-    available = st.metrics_clean["industry"].astype(str).unique().tolist()
+    available = list(cube.labels["industry"])
 
     if raw_industry not in available and st.INDUSTRY_NORM_MAP:
         nk = _norm_key(raw_industry)
@@ -468,15 +774,17 @@ def tool_compare_industry(industry: str) -> dict:
     if raw_industry not in available:
         return {"status": "FAILED", "error": f"업종 '{industry}' 없음", "가능업종": available}
 
-    data = st.metrics_clean[st.metrics_clean["industry"].astype(str) == raw_industry]
-    avg_rev = float(pd.to_numeric(data.get("total_revenue", 0.0), errors="coerce").fillna(0.0).mean())
-    avg_gr = float(pd.to_numeric(data.get("revenue_growth_rate", 0.0), errors="coerce").fillna(0.0).mean())
-    avg_rr = float(pd.to_numeric(data.get("repeat_purchase_rate", 0.0), errors="coerce").fillna(0.0).mean())
+    # 업종 셀 합계 (inf는 그대로 전파, 결측은 0)
+    agg = cube.aggregate(None, filters={"industry": raw_industry}, keep_inf=True)
+    avg_rev = float(_cube_mean(agg, "total_revenue")[0])
+    avg_gr = float(_cube_mean(agg, "revenue_growth_rate")[0])
+    avg_rr = float(_cube_mean(agg, "repeat_purchase_rate")[0])
+    merchants = int(cube.distinct_merchants("industry", label=raw_industry).sum())
 
     return {
         "status": "SUCCESS",
         "업종": safe_str(raw_industry),
-        "가맹점수": int(data["merchant_id"].nunique()),
+        "가맹점수": merchants,
         "평균매출": int(round(avg_rev)),
         "평균성장률": round(avg_gr, 2),
         "평균재구매율": round(avg_rr, 2),
@@ -525,14 +833,19 @@ def _normalize_reco_output(df: pd.DataFrame, top_k: int) -> List[dict]:
     return json_sanitize(out[cols].to_dict("records")) or []
 
 
-def tool_recommend_merchants_for_customer(customer_id: str, top_k: int = 10) -> dict:
-    from rag.service import SAR_AVAILABLE, SARSingleNode
-
-    if not SAR_AVAILABLE or SARSingleNode is None:
+def _reco_unavailable() -> Optional[dict]:
+    """추천 불가 사유 (네이티브 SAR 행렬 또는 SAR 모델 중 하나가 있으면 None)"""
+    if reco_ready():
+        return None
+    if not sar_package_available():
         return {"status": "FAILED", "error": "recommenders 패키지가 없습니다. (pip install recommenders)"}
+    return {"status": "FAILED", "error": "추천 모델(model_reco.pkl)이 로드되지 않았습니다."}
 
-    if st.sar_model is None:
-        return {"status": "FAILED", "error": "추천 모델(model_reco.pkl)이 로드되지 않았습니다."}
+
+def tool_recommend_merchants_for_customer(customer_id: str, top_k: int = 10) -> dict:
+    err = _reco_unavailable()
+    if err is not None:
+        return err
 
     cid = safe_str(customer_id).strip().upper()
     if not cid:
@@ -540,21 +853,12 @@ def tool_recommend_merchants_for_customer(customer_id: str, top_k: int = 10) ->
 
     k = max(1, int(top_k))
 
-    has_user = False
-    try:
-        user_map = getattr(st.sar_model, "user2index", None)
-        if isinstance(user_map, dict) and cid in user_map:
-            has_user = True
-    except Exception:
-        has_user = False
-
-    if not has_user:
+    if not has_user(cid):
         recs = _ensure_popular_merchants(top_k=k)
         return {"status": "SUCCESS", "type": "popularity_fallback", "customer_id": cid, "top_k": k, "data": recs}
 
     try:
-        user_df = pd.DataFrame({RECO_COL_USER: [cid]})
-        rec_df = st.sar_model.recommend_k_items(user_df, top_k=k, sort_top_k=True, remove_seen=True)
+        rec_df = recommend_for_user(cid, top_k=k)
         recs = _normalize_reco_output(rec_df, top_k=k)
         return {"status": "SUCCESS", "type": "sar_user_reco", "customer_id": cid, "top_k": k, "data": recs}
     except Exception as e:
@@ -562,13 +866,9 @@ def tool_recommend_merchants_for_customer(customer_id: str, top_k: int = 10) ->
 
 
 def tool_recommend_similar_merchants(seed_merchant_id: str, top_k: int = 10) -> dict:
-    from rag.service import SAR_AVAILABLE, SARSingleNode
-
-    if not SAR_AVAILABLE or SARSingleNode is None:
-        return {"status": "FAILED", "error": "recommenders 패키지가 없습니다. (pip install recommenders)"}
-
-    if st.sar_model is None:
-        return {"status": "FAILED", "error": "추천 모델(model_reco.pkl)이 로드되지 않았습니다."}
+    err = _reco_unavailable()
+    if err is not None:
+        return err
 
     mid = safe_str(seed_merchant_id).strip().upper()
     if not mid:
@@ -577,14 +877,85 @@ def tool_recommend_similar_merchants(seed_merchant_id: str, top_k: int = 10) ->
     k = max(1, int(top_k))
 
     try:
-        seed_df = pd.DataFrame({RECO_COL_ITEM: [mid]})
-        rec_df = st.sar_model.get_item_based_topk(seed_df, top_k=k, sort_top_k=True)
+        rec_df = similar_items(mid, top_k=k)
         recs = _normalize_reco_output(rec_df, top_k=k)
         return {"status": "SUCCESS", "type": "sar_item_similarity", "merchant_id": mid, "top_k": k, "data": recs}
     except Exception as e:
         return {"status": "FAILED", "error": f"SAR 유사 가맹점 실패: {safe_str(e)}", "merchant_id": mid, "top_k": k}
 
 
+def _normalize_reco_batch(df: pd.DataFrame) -> Dict[str, List[dict]]:
+    """(customer_id, merchant_id, prediction) → 고객별 _normalize_reco_output 형식 목록 (가맹점 메타 병합 1회)"""
+    if df is None or len(df) == 0:
+        return {}
+    out = df.rename(columns={"prediction": "score", RECO_COL_ITEM: "merchant_id"})
+    out["merchant_id"] = out["merchant_id"].astype(str)
+    out["score"] = pd.to_numeric(out["score"], errors="coerce").replace([np.inf, -np.inf], np.nan).fillna(0.0)
+    out = _merge_merchant_meta(out)
+
+    cols = ["merchant_id", "merchant_name", "industry", "region", "growth_type", "score"]
+    cols = [c for c in cols if c in out.columns]
+    records = json_sanitize(out[cols].to_dict("records")) or []
+    grouped: Dict[str, List[dict]] = {}
+    for cid, rec in zip(out[RECO_COL_USER].astype(str).tolist(), records):
+        grouped.setdefault(cid, []).append(rec)
+    return grouped
+
+
+def tool_recommend_merchants_batch(
+    customer_ids: Optional[List[str]] = None,
+    top_k: int = 10,
+    limit: int = MAX_BATCH_CUSTOMERS,
+) -> dict:
+    """
+    여러 고객 가맹점 추천 (캠페인 추출용).
+    학습된 고객은 SAR 행렬 곱을 청크 단위로 한 번에 계산하고, 학습에 없는 고객은 단건과 같은 인기 가맹점 폴백.
+    """
+    err = _reco_unavailable()
+    if err is not None:
+        return err
+
+    ids: List[str] = []
+    seen = set()
+    for c in customer_ids or []:
+        cid = safe_str(c).strip().upper()
+        if cid and cid not in seen:
+            seen.add(cid)
+            ids.append(cid)
+    if not ids:
+        return {"status": "FAILED", "error": "customer_ids가 비어 있습니다."}
+
+    limit = max(1, min(int(limit), MAX_BATCH_CUSTOMERS))
+    truncated = len(ids) > limit
+    ids = ids[:limit]
+    k = max(1, int(top_k))
+
+    known = [c for c in ids if has_user(c)]
+    try:
+        by_user = _normalize_reco_batch(recommend_for_users(known, top_k=k)) if known else {}
+    except Exception as e:
+        return {"status": "FAILED", "error": f"SAR 일괄 추천 실패: {safe_str(e)}", "top_k": k}
+
+    known_set = set(known)
+    popular = _ensure_popular_merchants(top_k=k) if len(known) < len(ids) else []
+    results = []
+    for cid in ids:
+        if cid in known_set:
+            results.append({"customer_id": cid, "type": "sar_user_reco", "data": by_user.get(cid, [])})
+        else:
+            results.append({"customer_id": cid, "type": "popularity_fallback", "data": popular})
+
+    return {
+        "status": "SUCCESS",
+        "top_k": k,
+        "count": len(results),
+        "sar_users": len(known),
+        "fallback_users": len(ids) - len(known),
+        "truncated": truncated,
+        "results": results,
+    }
+
+
 # ============================================================
 # 전체 가맹점 목록
 # ============================================================
@@ -600,13 +971,13 @@ def tool_list_merchants(summary_only: bool = True) -> dict:
     cols = ["merchant_id", "merchant_name", "industry", "region", "growth_type"]
     safe_cols = [c for c in cols if c in st.metrics_clean.columns]
 
-    if not st.LATEST_METRICS_MAP:
+    if not st.LATEST_STORE:
         return {
             "status": "SUCCESS", "count": 0,
             "summary_by_industry": [], "summary_by_region": [], "summary_by_growth_type": [],
         }
 
-    cached_latest = pd.DataFrame(list(st.LATEST_METRICS_MAP.values()))
+    cached_latest = st.LATEST_STORE.frame(cols)
 
     if len(safe_cols) == 0:
         merchant_list = [{"merchant_id": safe_str(x)} for x in cached_latest["merchant_id"].unique().tolist()]
@@ -637,7 +1008,7 @@ def tool_list_merchants(summary_only: bool = True) -> dict:
 # ============================================================
 # 체크리스트 / 리포트 생성
 # ============================================================
-def build_checklist_from_metrics(latest: pd.Series) -> List[str]:
+def build_checklist_from_metrics(latest: Optional[LatestRow]) -> List[str]:
     if latest is None:
         return ["데이터 없음"]
 
@@ -5,6 +5,7 @@ APIRouter를 사용하여 모든 엔드포인트를 정의합니다.
 import os
 import json
 from datetime import datetime
+from threading import Lock
 from typing import Optional, List
 from io import StringIO, BytesIO
 
@@ -14,7 +15,7 @@ import joblib
 
 from fastapi import APIRouter, HTTPException, Depends, status, Request, UploadFile, File, BackgroundTasks
 from fastapi.security import HTTPBasic, HTTPBasicCredentials
-from fastapi.responses import StreamingResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 from pydantic import BaseModel, Field
 
 try:
@@ -25,14 +26,15 @@ except ImportError:
     OCR_AVAILABLE = False
     OCR_READER = None
 
-from core.constants import DEFAULT_SYSTEM_PROMPT, ML_MODEL_INFO
+from core.constants import DEFAULT_SYSTEM_PROMPT, ML_MODEL_INFO, MAX_BATCH_MERCHANTS, MAX_BATCH_CUSTOMERS, DEFAULT_SCAN_PAGE_SIZE
 from core.utils import safe_str, safe_int, json_sanitize
 from core.memory import clear_memory, append_memory
 from core.parsers import extract_merchant_id, extract_top_k_from_text
+from core.readiness import is_loading, not_ready, readiness_report, set_status
 from agent.tools import (
     tool_get_merchant_metrics, tool_get_merchant_metrics_history_summary,
-    tool_predict_revenue, tool_detect_anomaly, tool_classify_growth,
-    tool_compare_industry, tool_explain_revenue_prediction,
+    tool_predict_revenue, tool_predict_revenue_batch, tool_detect_anomaly, tool_detect_anomaly_batch, tool_scan_anomalies, tool_classify_growth,
+    tool_compare_industry, tool_explain_revenue_prediction, tool_recommend_merchants_batch,
     tool_explain_growth_classification, tool_explain_anomaly_detection,
     build_list_merchants_report, build_fallback_report_from_results,
 )
@@ -43,9 +45,14 @@ from agent.llm import (
     build_langchain_messages, get_llm, chunk_text, pick_api_key,
 )
 from agent.runner import run_agent
+from data.refresh import append_metrics_rows
+from ml.forest import prepare_flat_forests
+from ml.scores import bump_model_version, get_score_table
+from ml.sar_serving import prepare_sar_scorer, reco_ready
+from rag.embeddings import embedding_backend_requires_key, embedding_cache_stats
 from rag.service import (
     rag_build_or_load_index, tool_rag_search, _rag_list_files,
-    rag_search_hybrid, BM25_AVAILABLE, RERANKER_AVAILABLE, KNOWLEDGE_GRAPH
+    rag_search_hybrid, rag_query_cache_stats, BM25_AVAILABLE, RERANKER_AVAILABLE, KNOWLEDGE_GRAPH
 )
 from rag.graph_rag import (
     build_graph_from_chunks, search_graph_rag, get_graph_rag_status,
@@ -70,6 +77,43 @@ class MerchantRequest(BaseModel):
 class IndustryRequest(BaseModel):
     industry: str
 
+class BatchPredictRequest(BaseModel):
+    merchant_ids: List[str] = Field(default_factory=list, alias="merchantIds")
+    industry: Optional[str] = None
+    region: Optional[str] = None
+    top_k: int = Field(5, alias="topK")
+    include_explain: bool = Field(False, alias="includeExplain")
+    limit: int = Field(MAX_BATCH_MERCHANTS, alias="limit")
+    class Config:
+        populate_by_name = True
+        allow_population_by_field_name = True
+        allow_population_by_alias = True
+
+class BatchAnomalyRequest(BatchPredictRequest):
+    include_explain: bool = Field(True, alias="includeExplain")
+
+class AnomalyScanRequest(BaseModel):
+    start_month: Optional[str] = Field(None, alias="startMonth")
+    end_month: Optional[str] = Field(None, alias="endMonth")
+    industry: Optional[str] = None
+    region: Optional[str] = None
+    only_anomalies: bool = Field(True, alias="onlyAnomalies")
+    offset: int = Field(0, alias="offset")
+    limit: int = Field(DEFAULT_SCAN_PAGE_SIZE, alias="limit")
+    class Config:
+        populate_by_name = True
+        allow_population_by_field_name = True
+        allow_population_by_alias = True
+
+class BatchRecommendRequest(BaseModel):
+    customer_ids: List[str] = Field(default_factory=list, alias="customerIds")
+    top_k: int = Field(10, alias="topK")
+    limit: int = Field(MAX_BATCH_CUSTOMERS, alias="limit")
+    class Config:
+        populate_by_name = True
+        allow_population_by_field_name = True
+        allow_population_by_alias = True
+
 class RagRequest(BaseModel):
     query: str
     api_key: str = Field("", alias="apiKey")
@@ -108,6 +152,7 @@ class UserCreateRequest(BaseModel):
 class RagReloadRequest(BaseModel):
     api_key: str = Field("", alias="apiKey")
     force: bool = Field(True, alias="force")
+    full: bool = Field(False, alias="fullRebuild")  # True면 매니페스트를 무시하고 전체 재임베딩
     class Config:
         populate_by_name = True
         allow_population_by_field_name = True
@@ -172,6 +217,24 @@ def verify_credentials(credentials: HTTPBasicCredentials = Depends(security)):
     return {"username": username, "role": st.USERS[username]["role"], "name": st.USERS[username]["name"]}
 
 
+# ============================================================
+# 준비 상태 게이트 (백그라운드 워밍업 중이면 즉시 503)
+# ============================================================
+def require_ready(*names: str):
+    def _dependency():
+        pending = not_ready(names)
+        if pending:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail=f"서비스 준비 중: {', '.join(pending)}",
+                headers={"Retry-After": str(st.READY_RETRY_AFTER_SEC)},
+            )
+    return _dependency
+
+
+require_data = require_ready("data")
+
+
 # ============================================================
 # 유틸
 # ============================================================
@@ -191,12 +254,22 @@ def health():
         "log_file": st.LOG_FILE,
         "pid": os.getpid(),
         "models_ready": bool(st.rf_reg is not None and st.iso_forest is not None and st.rf_clf is not None and st.scaler is not None),
-        "reco_ready": bool(st.sar_model is not None),
+        "reco_ready": reco_ready(),
         "metrics_rows": int(len(st.metrics_clean)) if st.metrics_clean is not None else 0,
         "merchants_rows": int(len(st.merchants)) if st.merchants is not None else 0,
     }
 
 
+@router.get("/ready")
+def ready():
+    """서브시스템별 준비 상태 (필수 구성요소 미준비 시 503)"""
+    report = readiness_report()
+    body = {"status": "SUCCESS" if report["ready"] else "FAILED", **report}
+    if not report["ready"]:
+        return JSONResponse(status_code=503, content=body, headers={"Retry-After": str(st.READY_RETRY_AFTER_SEC)})
+    return body
+
+
 # ============================================================
 # 로그인
 # ============================================================
@@ -214,57 +287,101 @@ def login(credentials: HTTPBasicCredentials = Depends(security)):
 # ============================================================
 # 가맹점
 # ============================================================
-@router.get("/merchants")
+@router.get("/merchants", dependencies=[Depends(require_data)])
 def get_merchants(user: dict = Depends(verify_credentials)):
     return {"status": "SUCCESS", "data": st.merchants.to_dict("records") if st.merchants is not None else []}
 
 
-@router.get("/merchants/{merchant_id}")
+@router.get("/merchants/{merchant_id}", dependencies=[Depends(require_data)])
 def get_merchant(merchant_id: str, user: dict = Depends(verify_credentials)):
     return tool_get_merchant_metrics(merchant_id)
 
 
-@router.get("/merchants/{merchant_id}/metrics")
+@router.get("/merchants/{merchant_id}/metrics", dependencies=[Depends(require_data)])
 def get_merchant_metrics_history(merchant_id: str, user: dict = Depends(verify_credentials)):
-    key = safe_str(merchant_id).strip()
-    data = st.METRICS_BY_MERCHANT.get(key)
-    if data is None:
+    cols_to_convert = ("txn_month", "industry", "region", "growth_type", "merchant_name", "merchant_id")
+    records = st.METRICS_HISTORY.records(merchant_id, str_cols=cols_to_convert) if st.METRICS_HISTORY is not None else None
+    if records is None:
         raise HTTPException(status_code=404, detail="가맹점 없음")
 
-    result_data = data.copy()
-    cols_to_convert = ["txn_month", "industry", "region", "growth_type", "merchant_name", "merchant_id"]
-    for col in cols_to_convert:
-        if col in result_data.columns:
-            result_data[col] = result_data[col].astype(str)
-
-    records = result_data.to_dict("records")
     return json_sanitize({"status": "SUCCESS", "data": records})
 
 
 # ============================================================
 # ML 예측/분류/탐지
 # ============================================================
-@router.post("/predict/revenue")
+@router.post("/predict/revenue", dependencies=[Depends(require_data)])
 def predict_revenue(req: MerchantRequest, user: dict = Depends(verify_credentials)):
     return tool_predict_revenue(req.merchant_id, top_k=5, include_explain=True)
 
 
-@router.post("/detect/anomaly")
+@router.post("/predict/revenue/batch", dependencies=[Depends(require_data)])
+def predict_revenue_batch(req: BatchPredictRequest, user: dict = Depends(verify_credentials)):
+    """여러 가맹점 매출 예측 (ID 목록 또는 업종/지역 필터, predict 1회)"""
+    return json_sanitize(tool_predict_revenue_batch(
+        merchant_ids=req.merchant_ids,
+        industry=req.industry,
+        region=req.region,
+        top_k=req.top_k,
+        include_explain=req.include_explain,
+        limit=req.limit,
+    ))
+
+
+@router.post("/detect/anomaly", dependencies=[Depends(require_data)])
 def detect_anomaly(req: MerchantRequest, user: dict = Depends(verify_credentials)):
     return tool_detect_anomaly(req.merchant_id, top_k=5, include_explain=True)
 
 
-@router.post("/classify/growth")
+@router.post("/detect/anomaly/batch", dependencies=[Depends(require_data)])
+def detect_anomaly_batch(req: BatchAnomalyRequest, user: dict = Depends(verify_credentials)):
+    """여러 가맹점 이상 탐지 (ID 목록 또는 업종/지역 필터, 설명은 decision_function 1회)"""
+    return json_sanitize(tool_detect_anomaly_batch(
+        merchant_ids=req.merchant_ids,
+        industry=req.industry,
+        region=req.region,
+        top_k=req.top_k,
+        include_explain=req.include_explain,
+        limit=req.limit,
+    ))
+
+
+@router.post("/recommend/customers/batch", dependencies=[Depends(require_data)])
+def recommend_customers_batch(req: BatchRecommendRequest, user: dict = Depends(verify_credentials)):
+    """여러 고객 가맹점 추천 (캠페인 추출용, SAR 행렬 곱을 고객 청크 단위로 1회)"""
+    out = tool_recommend_merchants_batch(customer_ids=req.customer_ids, top_k=req.top_k, limit=req.limit)
+    st.logger.info(
+        "RECO_BATCH user=%s customers=%s sar=%s fallback=%s top_k=%s",
+        user.get("username"), out.get("count"), out.get("sar_users"), out.get("fallback_users"), req.top_k,
+    )
+    return json_sanitize(out)
+
+
+@router.post("/detect/anomaly/scan", dependencies=[Depends(require_data)])
+def scan_anomaly(req: AnomalyScanRequest, user: dict = Depends(verify_credentials)):
+    """전체 가맹점-월 이상 스캔 (점수 낮은 순, offset/limit 페이지, 데이터/모델 버전별 캐시)"""
+    return json_sanitize(tool_scan_anomalies(
+        start_month=req.start_month,
+        end_month=req.end_month,
+        industry=req.industry,
+        region=req.region,
+        top_n=req.limit,
+        offset=req.offset,
+        only_anomalies=req.only_anomalies,
+    ))
+
+
+@router.post("/classify/growth", dependencies=[Depends(require_data)])
 def classify_growth(req: MerchantRequest, user: dict = Depends(verify_credentials)):
     return tool_classify_growth(req.merchant_id, top_k=5, include_explain=True)
 
 
-@router.post("/industry/compare")
+@router.post("/industry/compare", dependencies=[Depends(require_data)])
 def compare_industry(req: IndustryRequest, user: dict = Depends(verify_credentials)):
     return tool_compare_industry(req.industry)
 
 
-@router.get("/industries")
+@router.get("/industries", dependencies=[Depends(require_data)])
 def get_industries(user: dict = Depends(verify_credentials)):
     if st.metrics_clean is None or len(st.metrics_clean) == 0 or "industry" not in st.metrics_clean.columns:
         return {"status": "SUCCESS", "data": []}
@@ -299,6 +416,8 @@ def search_rag_hybrid(req: HybridSearchRequest, user: dict = Depends(verify_cred
 @router.get("/rag/status")
 def rag_status(user: dict = Depends(verify_credentials)):
     graph_status = get_graph_rag_status()
+    embed_cache = embedding_cache_stats()
+    query_cache = rag_query_cache_stats()
     with st.RAG_LOCK:
         return {
             "status": "SUCCESS",
@@ -306,6 +425,9 @@ def rag_status(user: dict = Depends(verify_credentials)):
             "docs_dir": st.RAG_DOCS_DIR,
             "faiss_dir": st.RAG_FAISS_DIR,
             "embed_model": st.RAG_EMBED_MODEL,
+            "embed_backend": st.RAG_EMBED_BACKEND,
+            "embed_cache": embed_cache,
+            "query_cache": query_cache,
             "files_count": int(st.RAG_STORE.get("files_count") or st.RAG_STORE.get("docs_count") or 0),
             "chunks_count": int(st.RAG_STORE.get("chunks_count") or st.RAG_STORE.get("docs_count") or 0),
             "hash": safe_str(st.RAG_STORE.get("hash", "")),
@@ -334,10 +456,10 @@ def rag_reload(req: RagReloadRequest, user: dict = Depends(verify_credentials)):
 
     try:
         k = safe_str(req.api_key).strip() or st.OPENAI_API_KEY
-        if not k:
+        if not k and embedding_backend_requires_key():
             return {"status": "FAILED", "error": "OpenAI API Key가 설정되지 않았습니다."}
 
-        rag_build_or_load_index(api_key=k, force_rebuild=bool(req.force))
+        rag_build_or_load_index(api_key=k, force_rebuild=bool(req.force), full_rebuild=bool(req.full))
 
         with st.RAG_LOCK:
             ok = bool(st.RAG_STORE.get("ready"))
@@ -386,7 +508,7 @@ async def upload_rag_document(
 
         # 백그라운드에서 인덱스 재빌드 (즉시 응답 반환)
         k = (api_key or "").strip() or st.OPENAI_API_KEY
-        if k and background_tasks:
+        if (k or not embedding_backend_requires_key()) and background_tasks:
             background_tasks.add_task(rag_build_or_load_index, api_key=k, force_rebuild=True)
 
         return {
@@ -451,7 +573,7 @@ def delete_rag_file(
 
         # 백그라운드에서 인덱스 재빌드 (즉시 응답 반환)
         k = safe_str(req.api_key).strip() or st.OPENAI_API_KEY
-        if k:
+        if k or not embedding_backend_requires_key():
             background_tasks.add_task(rag_build_or_load_index, api_key=k, force_rebuild=True)
 
         return {"status": "SUCCESS", "message": "파일이 삭제되었습니다. 인덱스 재빌드 중...", "filename": filename}
@@ -550,6 +672,31 @@ def graphrag_clear(user: dict = Depends(verify_credentials)):
 # OCR (이미지 → 텍스트 추출 → RAG 연동)
 # ============================================================
 OCR_ALLOWED_EXTS = {".jpg", ".jpeg", ".png", ".bmp", ".tiff", ".tif", ".gif", ".webp"}
+OCR_LOAD_LOCK = Lock()
+
+
+def load_ocr_reader(blocking: bool = True):
+    """
+    EasyOCR Reader 로드 (첫 호출 시 1회)
+    blocking=False면 다른 스레드(시작 워밍업)가 로드 중일 때 기다리지 않고 None 반환
+    """
+    global OCR_READER
+
+    if not OCR_AVAILABLE:
+        return None
+    if OCR_READER is not None:
+        return OCR_READER
+    if not OCR_LOAD_LOCK.acquire(blocking=blocking):
+        return None
+    try:
+        if OCR_READER is None:
+            st.logger.info("OCR_INIT: EasyOCR Reader 초기화 중...")
+            OCR_READER = easyocr.Reader(['ko', 'en'], gpu=False)
+            st.logger.info("OCR_INIT: EasyOCR Reader 초기화 완료")
+            set_status("ocr", "ready")
+        return OCR_READER
+    finally:
+        OCR_LOAD_LOCK.release()
 
 
 @router.post("/ocr/extract")
@@ -560,8 +707,6 @@ async def ocr_extract(
     user: dict = Depends(verify_credentials),
 ):
     """이미지에서 텍스트 추출 (EasyOCR) + RAG 연동"""
-    global OCR_READER
-
     if not OCR_AVAILABLE:
         return {"status": "FAILED", "error": "OCR 라이브러리(easyocr)가 설치되지 않았습니다. pip install easyocr"}
 
@@ -577,14 +722,17 @@ async def ocr_extract(
         if len(contents) > MAX_FILE_SIZE:
             return {"status": "FAILED", "error": "파일 크기는 20MB를 초과할 수 없습니다."}
 
-        # EasyOCR Reader 초기화 (Lazy loading - 첫 호출시만)
-        if OCR_READER is None:
-            st.logger.info("OCR_INIT: EasyOCR Reader 초기화 중...")
-            OCR_READER = easyocr.Reader(['ko', 'en'], gpu=False)
-            st.logger.info("OCR_INIT: EasyOCR Reader 초기화 완료")
+        # EasyOCR Reader (시작 워밍업 중이면 기다리지 않고 503, 워밍업 생략 시 첫 호출에서 로드)
+        reader = load_ocr_reader(blocking=not is_loading("ocr"))
+        if reader is None:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="OCR 모델 로딩 중입니다.",
+                headers={"Retry-After": str(st.READY_RETRY_AFTER_SEC)},
+            )
 
         # OCR 수행
-        result_list = OCR_READER.readtext(contents)
+        result_list = reader.readtext(contents)
         extracted_text = "\n".join([text for _, text, _ in result_list])
         extracted_text = extracted_text.strip()
 
@@ -615,7 +763,7 @@ async def ocr_extract(
 
             # RAG 인덱스 재빌드
             k = (api_key or "").strip() or st.OPENAI_API_KEY
-            if k:
+            if k or not embedding_backend_requires_key():
                 rag_build_or_load_index(api_key=k, force_rebuild=True)
 
             result["saved_to_rag"] = True
@@ -628,6 +776,8 @@ async def ocr_extract(
         st.logger.info(f"OCR_EXTRACT file={filename} text_len={len(extracted_text)} saved_to_rag={save_to_rag}")
         return result
 
+    except HTTPException:
+        raise
     except Exception as e:
         st.logger.exception("OCR 추출 실패")
         return {"status": "FAILED", "error": f"OCR 추출 실패: {safe_str(e)}"}
@@ -660,7 +810,7 @@ def ocr_status(user: dict = Depends(verify_credentials)):
 # ============================================================
 # 에이전트 (동기/스트리밍)
 # ============================================================
-@router.post("/agent/chat")
+@router.post("/agent/chat", dependencies=[Depends(require_data)])
 def agent_chat(req: AgentRequest, user: dict = Depends(verify_credentials)):
     out = run_agent(req, username=user["username"])
     if isinstance(out, dict) and "status" not in out:
@@ -674,7 +824,7 @@ def clear_agent_memory(user: dict = Depends(verify_credentials)):
     return {"status": "SUCCESS", "message": "메모리 초기화 완료"}
 
 
-@router.post("/agent/stream")
+@router.post("/agent/stream", dependencies=[Depends(require_data)])
 async def agent_stream(req: AgentRequest, request: Request, user: dict = Depends(verify_credentials)):
     st.logger.info(
         "STREAM_REQ headers_auth=%s origin=%s ua=%s",
@@ -784,38 +934,78 @@ async def agent_stream(req: AgentRequest, request: Request, user: dict = Depends
     return StreamingResponse(gen(), media_type="text/event-stream", headers=headers)
 
 
+# ============================================================
+# 데이터 증분 갱신 (관리자)
+# ============================================================
+@router.post("/admin/data/append", dependencies=[Depends(require_data)])
+def append_metrics_data(
+    file: UploadFile = File(...),
+    persist: bool = True,
+    user: dict = Depends(verify_credentials),
+):
+    """새 월 metrics 행(CSV)을 재시작 없이 추가"""
+    if user.get("role") != "관리자":
+        raise HTTPException(status_code=403, detail="권한 없음")
+
+    try:
+        contents = file.file.read()
+        rows = pd.read_csv(BytesIO(contents), encoding="utf-8-sig")
+    except Exception as e:
+        return {"status": "FAILED", "error": f"CSV 파싱 실패: {safe_str(e)}"}
+
+    try:
+        return json_sanitize(append_metrics_rows(rows, persist=bool(persist)))
+    except Exception as e:
+        st.logger.exception("데이터 추가 실패")
+        return {"status": "FAILED", "error": f"데이터 추가 실패: {safe_str(e)}"}
+
+
+@router.get("/admin/data/version")
+def get_data_version(user: dict = Depends(verify_credentials)):
+    return {
+        "status": "SUCCESS",
+        "version": st.DATA_VERSION,
+        "rows": int(len(st.metrics_clean)) if st.metrics_clean is not None else 0,
+        "merchants": int(len(st.LATEST_STORE)) if st.LATEST_STORE is not None else 0,
+        "mmap": st.DATA_MMAP_ENABLED,
+    }
+
+
 # ============================================================
 # 통계/내보내기/설정
 # ============================================================
-@router.get("/stats/summary")
+@router.get("/stats/summary", dependencies=[Depends(require_data)])
 def get_summary_stats(user: dict = Depends(verify_credentials)):
     total_rev = 0.0
     avg_gr = 0.0
-
-    if st.metrics_clean is not None and len(st.metrics_clean):
-        total_rev = float(pd.to_numeric(st.metrics_clean.get("total_revenue", 0.0), errors="coerce").fillna(0.0).sum())
-        avg_gr = float(pd.to_numeric(st.metrics_clean.get("revenue_growth_rate", 0.0), errors="coerce").fillna(0.0).mean())
+    industry_stats = {}
+    region_stats = {}
+    cube = st.METRICS_CUBE
+
+    # 사전 집계 큐브 셀 합산 (metrics_clean 재스캔 없음)
+    if cube is not None and cube.n_rows:
+        total = cube.aggregate(None, keep_inf=True)
+        if "total_revenue" in total["sum"]:
+            total_rev = float(total["sum"]["total_revenue"][0])
+        if "revenue_growth_rate" in total["sum"]:
+            avg_gr = float(total["sum"]["revenue_growth_rate"][0] / total["count"][0])
         if not np.isfinite(total_rev):
             total_rev = 0.0
         if not np.isfinite(avg_gr):
             avg_gr = 0.0
         avg_gr = round(avg_gr, 2)
 
-    industry_stats = {}
-    if st.metrics_clean is not None and "industry" in st.metrics_clean.columns and "total_revenue" in st.metrics_clean.columns and len(st.metrics_clean):
-        s = pd.to_numeric(st.metrics_clean["total_revenue"], errors="coerce").replace([np.inf, -np.inf], np.nan).fillna(0.0)
-        tmp = st.metrics_clean.assign(_rev=s).groupby(st.metrics_clean["industry"].astype(str))["_rev"].mean()
-        industry_stats = {str(k): float(v) if np.isfinite(float(v)) else 0.0 for k, v in tmp.to_dict().items()}
-
-    region_stats = {}
-    if st.metrics_clean is not None and "region" in st.metrics_clean.columns and "total_revenue" in st.metrics_clean.columns and len(st.metrics_clean):
-        s = pd.to_numeric(st.metrics_clean["total_revenue"], errors="coerce").replace([np.inf, -np.inf], np.nan).fillna(0.0)
-        tmp = st.metrics_clean.assign(_rev=s).groupby(st.metrics_clean["region"].astype(str))["_rev"].mean()
-        region_stats = {str(k): float(v) if np.isfinite(float(v)) else 0.0 for k, v in tmp.to_dict().items()}
+        for dim, out in (("industry", industry_stats), ("region", region_stats)):
+            if dim not in cube.dims or "total_revenue" not in cube.measures:
+                continue
+            agg = cube.aggregate(dim)
+            means = agg["sum"]["total_revenue"] / agg["count"]
+            for k, v in zip(agg["labels"], means.tolist()):
+                out[str(k)] = float(v) if np.isfinite(float(v)) else 0.0
 
     payload = {
         "status": "SUCCESS",
-        "merchant_count": int(st.metrics_clean["merchant_id"].nunique()) if st.metrics_clean is not None and "merchant_id" in st.metrics_clean.columns else 0,
+        "merchant_count": int(cube.n_merchants) if cube is not None else 0,
         "data_count": int(len(st.metrics_clean)) if st.metrics_clean is not None else 0,
         "total_revenue": total_rev,
         "avg_growth_rate": avg_gr,
@@ -996,7 +1186,7 @@ class ModelSelectRequest(BaseModel):
     version: str
 
 
-@router.post("/mlflow/models/select")
+@router.post("/mlflow/models/select", dependencies=[Depends(require_data)])
 def select_mlflow_model(req: ModelSelectRequest, user: dict = Depends(verify_credentials)):
     """MLflow에서 특정 버전의 모델을 선택하여 로드"""
     if user.get("role") != "관리자":
@@ -1029,6 +1219,7 @@ def select_mlflow_model(req: ModelSelectRequest, user: dict = Depends(verify_cre
             if os.path.exists(reco_path):
                 model = joblib.load(reco_path)
                 st.sar_model = model
+                st.SAR_SCORER = prepare_sar_scorer(model)
                 st.logger.info(f"MLFLOW_MODEL_LOADED name={req.model_name} version={req.version} target=sar_model")
                 return {
                     "status": "SUCCESS",
@@ -1095,6 +1286,11 @@ def select_mlflow_model(req: ModelSelectRequest, user: dict = Depends(verify_cre
         else:
             return {"status": "FAILED", "error": f"지원하지 않는 모델입니다: {req.model_name}"}
 
+        # 모델 교체 -> 트리 평탄화 + 점수 테이블 재계산
+        bump_model_version()
+        prepare_flat_forests()
+        get_score_table(force=True)
+
         return {
             "status": "SUCCESS",
             "message": f"{req.model_name} v{req.version} 모델이 로드되었습니다.",
@@ -1145,7 +1341,7 @@ def create_user(req: UserCreateRequest, user: dict = Depends(verify_credentials)
     return {"status": "SUCCESS", "message": f"{req.name} 추가됨"}
 
 
-@router.get("/export/csv")
+@router.get("/export/csv", dependencies=[Depends(require_data)])
 def export_csv(user: dict = Depends(verify_credentials)):
     output = StringIO()
     export_df = st.metrics_clean.copy() if st.metrics_clean is not None else pd.DataFrame()
@@ -1162,7 +1358,7 @@ def export_csv(user: dict = Depends(verify_credentials)):
     )
 
 
-@router.get("/export/excel")
+@router.get("/export/excel", dependencies=[Depends(require_data)])
 def export_excel(user: dict = Depends(verify_credentials)):
     output = BytesIO()
     export_df = st.metrics_clean.copy() if st.metrics_clean is not None else pd.DataFrame()
@@ -1180,31 +1376,31 @@ def export_excel(user: dict = Depends(verify_credentials)):
     )
 
 
-@router.post("/explain/revenue")
+@router.post("/explain/revenue", dependencies=[Depends(require_data)])
 def explain_revenue(req: MerchantRequest, user: dict = Depends(verify_credentials)):
     return tool_explain_revenue_prediction(req.merchant_id, top_k=5)
 
 
-@router.post("/explain/growth")
+@router.post("/explain/growth", dependencies=[Depends(require_data)])
 def explain_growth(req: MerchantRequest, user: dict = Depends(verify_credentials)):
     return tool_explain_growth_classification(req.merchant_id, top_k=5)
 
 
-@router.post("/explain/anomaly")
+@router.post("/explain/anomaly", dependencies=[Depends(require_data)])
 def explain_anomaly(req: MerchantRequest, user: dict = Depends(verify_credentials)):
     return tool_explain_anomaly_detection(req.merchant_id, top_k=5)
 
 
-@router.post("/metrics/history/summary")
+@router.post("/metrics/history/summary", dependencies=[Depends(require_data)])
 def metrics_history_summary(req: MerchantRequest, user: dict = Depends(verify_credentials)):
     return tool_get_merchant_metrics_history_summary(req.merchant_id, months=6)
 
 
-@router.get("/dashboard/{merchant_id}")
+@router.get("/dashboard/{merchant_id}", dependencies=[Depends(require_data)])
 def dashboard_merchant(merchant_id: str, user: dict = Depends(verify_credentials)):
     return tool_get_merchant_metrics_history_summary(merchant_id, months=12)
 
 
-@router.get("/metrics")
+@router.get("/metrics", dependencies=[Depends(require_data)])
 def metrics_query(merchant_id: str, user: dict = Depends(verify_credentials)):
     return tool_get_merchant_metrics_history_summary(merchant_id, months=12)
@@ -0,0 +1,89 @@
+"""
+core/cache.py - 프로세스 내 LRU + TTL 캐시
+- maxsize를 넘으면 가장 오래 사용하지 않은 항목부터 제거
+- ttl_sec이 지난 항목은 조회 시 만료
+- generation(예: RAG 인덱스 hash)이 바뀌면 조회/저장 시점에 전체 비움 → 별도 무효화 호출 불필요
+"""
+import copy
+import time
+from collections import OrderedDict
+from threading import Lock
+from typing import Any, Dict, Hashable, Optional
+
+
+class LRUTTLCache:
+    """스레드 안전 LRU + TTL 캐시 (maxsize <= 0 또는 ttl_sec <= 0이면 비활성)"""
+
+    def __init__(self, maxsize: int, ttl_sec: float, copy_values: bool = False):
+        self.maxsize = int(maxsize)
+        self.ttl_sec = float(ttl_sec)
+        # 호출자가 결과(dict/list)를 수정해도 캐시 값이 바뀌지 않도록 저장/조회 시 deepcopy
+        self.copy_values = copy_values
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = Lock()
+        self._generation: Any = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.maxsize > 0 and self.ttl_sec > 0
+
+    def _sync_generation(self, generation: Any) -> None:
+        if generation != self._generation:
+            if self._data:
+                self.invalidations += 1
+            self._data.clear()
+            self._generation = generation
+
+    def get(self, key: Hashable, generation: Any = None) -> Optional[Any]:
+        if not self.enabled:
+            return None
+        with self._lock:
+            self._sync_generation(generation)
+            item = self._data.get(key)
+            if item is None:
+                self.misses += 1
+                return None
+            expires, value = item
+            if expires < time.monotonic():
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+        return copy.deepcopy(value) if self.copy_values else value
+
+    def put(self, key: Hashable, value: Any, generation: Any = None) -> None:
+        if not self.enabled:
+            return
+        if self.copy_values:
+            value = copy.deepcopy(value)
+        with self._lock:
+            self._sync_generation(generation)
+            self._data[key] = (time.monotonic() + self.ttl_sec, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            size = len(self._data)
+        total = self.hits + self.misses
+        return {
+            "size": size,
+            "maxsize": self.maxsize,
+            "ttl_sec": self.ttl_sec,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
@@ -34,6 +34,13 @@ FEATURE_COLS_CLF = [
     "revenue_rolling_mean_3",
 ]
 
+# Lag / Rolling / Diff 피처 정의 (학습/서빙 공용, ml/features.py)
+# 컬럼명: {prefix}_lag_{k}, {prefix}_rolling_mean_{w}, {prefix}_diff_{k}
+LAG_FEATURE_SPEC = {
+    "total_revenue": {"prefix": "revenue", "lags": [1, 2, 3], "rolling": [3], "diffs": []},
+    "txn_count": {"prefix": "txn", "lags": [], "rolling": [3], "diffs": []},
+}
+
 FEATURE_LABELS = {
     "txn_count": "거래건수",
     "unique_customers": "고객수",
@@ -164,6 +171,17 @@ MAX_MEMORY_TURNS = 5
 DEFAULT_TOPN = 10
 MAX_TOPN = 50
 
+# Batch Prediction Settings
+MAX_BATCH_MERCHANTS = 1000
+
+# Recommendation Settings
+SAR_NEIGHBOR_K = MAX_TOPN  # 아이템별 유사 가맹점 테이블 크기
+MAX_BATCH_CUSTOMERS = 10000
+
+# Anomaly Scan Settings
+DEFAULT_SCAN_PAGE_SIZE = 50
+MAX_SCAN_PAGE_SIZE = 500
+
 # Summary Triggers
 SUMMARY_TRIGGERS = [
     "요약", "정리", "요점", "핵심", "한줄", "한 줄", "간단히", "짧게", "요약해줘", "요약해 줘",
@@ -1,6 +1,7 @@
 import re
 from typing import Any, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 
 from .utils import safe_str
@@ -71,32 +72,40 @@ def month_to_period(x: Any) -> Optional[pd.Period]:
         return None
 
 
-def filter_metrics_by_month_range(
-    df: pd.DataFrame, start_month: Optional[str], end_month: Optional[str]
-) -> pd.DataFrame:
-    """메트릭 데이터프레임을 월 범위로 필터링"""
-    if df is None or len(df) == 0:
-        return df
-    if "txn_month_dt" not in df.columns:
-        return df
+# 월 코드: 1970-01 기준 월 순번 (pd.Period("M").ordinal과 동일), NaT는 MONTH_CODE_NA
+MONTH_CODE_NA = -(2 ** 31)
+
+
+def month_codes(dt_values: Any) -> np.ndarray:
+    """datetime 배열/Series → int32 월 코드 (NaT는 MONTH_CODE_NA)"""
+    arr = np.asarray(dt_values, dtype="datetime64[ns]")
+    out = arr.astype("datetime64[M]").astype(np.int64)
+    out[np.isnat(arr)] = MONTH_CODE_NA
+    return out.astype(np.int32)
 
-    if not start_month and not end_month:
-        return df
 
+def month_code_range(start_month: Optional[str], end_month: Optional[str]) -> Optional[Tuple[int, int]]:
+    """
+    시작/종료 월(YYYY-MM) → [lo, hi] 월 코드 범위 (집계 큐브/랭킹 인덱스/이상 스캔 공통 규칙).
+    None이면 필터 없음(NaT 행 포함), 범위가 있으면 NaT 행은 제외됩니다.
+    """
+    if not start_month and not end_month:
+        return None
     sp = month_to_period(start_month) if start_month else None
     ep = month_to_period(end_month) if end_month else None
     if sp is None and ep is None:
-        return df
+        return None
+    lo = int(sp.ordinal) if sp is not None else MONTH_CODE_NA + 1
+    hi = int(ep.ordinal) if ep is not None else 2 ** 31 - 1
+    return lo, hi
 
-    period = df["txn_month_dt"].dt.to_period("M")
-    if sp is not None and ep is not None:
-        mask = (period >= sp) & (period <= ep)
-    elif sp is not None:
-        mask = (period >= sp)
-    else:
-        mask = (period <= ep)
 
-    return df[mask].copy()
+def frame_month_codes(df: pd.DataFrame) -> np.ndarray:
+    """df의 txn_month_dt → int32 월 코드 (컬럼이 없으면 전부 MONTH_CODE_NA)"""
+    if df is not None and "txn_month_dt" in df.columns:
+        return month_codes(df["txn_month_dt"].to_numpy())
+    n = 0 if df is None else len(df)
+    return np.full(n, MONTH_CODE_NA, dtype=np.int32)
 
 
 def extract_merchant_id(text: str) -> Optional[str]:
@@ -0,0 +1,83 @@
+"""
+core/readiness.py - 서브시스템 준비 상태 / 백그라운드 워밍업
+데이터·모델, RAG 인덱스, Reranker, OCR을 각각 백그라운드 스레드에서 로드하고 상태를 기록합니다.
+서버는 가장 느린 선택 구성요소를 기다리지 않고 바로 요청을 받으며, /api/ready로 상태를 확인합니다.
+"""
+import time
+from threading import Thread
+from typing import Any, Callable, Dict, List
+
+from core.utils import safe_str
+import state as st
+
+SUBSYSTEMS = ("data", "rag", "reranker", "ocr")
+# 이 구성요소가 준비되어야 /api/ready가 200을 반환
+REQUIRED_SUBSYSTEMS = ("data",)
+
+
+def set_status(name: str, status: str, error: str = "") -> None:
+    now = time.time()
+    with st.READINESS_LOCK:
+        cur = st.READINESS.setdefault(name, {"status": "pending", "error": "", "started_ts": 0.0, "elapsed_sec": 0.0})
+        if status == "loading":
+            cur["started_ts"] = now
+            cur["elapsed_sec"] = 0.0
+        elif cur.get("started_ts"):
+            cur["elapsed_sec"] = round(now - cur["started_ts"], 3)
+        cur["status"] = status
+        cur["error"] = safe_str(error)
+
+
+def get_status(name: str) -> str:
+    with st.READINESS_LOCK:
+        return safe_str(st.READINESS.get(name, {}).get("status"), "pending")
+
+
+def is_ready(name: str) -> bool:
+    return get_status(name) == "ready"
+
+
+def is_loading(name: str) -> bool:
+    return get_status(name) == "loading"
+
+
+def not_ready(names) -> List[str]:
+    return [n for n in names if not is_ready(n)]
+
+
+def readiness_report() -> Dict[str, Any]:
+    with st.READINESS_LOCK:
+        subs = {n: dict(st.READINESS.get(n, {"status": "pending", "error": ""})) for n in SUBSYSTEMS}
+    # 요청 중 지연 로드(첫 검색 시 인덱스 빌드 등)로 준비된 경우 반영
+    with st.RAG_LOCK:
+        if st.RAG_STORE.get("ready") and subs["rag"].get("status") != "loading":
+            subs["rag"]["status"] = "ready"
+    now = time.time()
+    for v in subs.values():
+        started = v.pop("started_ts", 0.0)
+        if v.get("status") == "loading" and started:
+            v["elapsed_sec"] = round(now - started, 3)
+    return {
+        "ready": all(subs[n]["status"] == "ready" for n in REQUIRED_SUBSYSTEMS),
+        "required": list(REQUIRED_SUBSYSTEMS),
+        "subsystems": subs,
+    }
+
+
+def start_background(name: str, fn: Callable[..., Any], *args, **kwargs) -> Thread:
+    """fn을 데몬 스레드에서 실행 (예외 없이 끝나면 ready, 예외면 failed)"""
+    set_status(name, "loading")
+
+    def _run():
+        t0 = time.time()
+        try:
+            fn(*args, **kwargs)
+            set_status(name, "ready")
+            st.logger.info("WARMUP_READY name=%s elapsed=%.3fs", name, time.time() - t0)
+        except Exception as e:
+            set_status(name, "failed", safe_str(e))
+            st.logger.exception("WARMUP_FAIL name=%s err=%s", name, safe_str(e))
+
+    th = Thread(target=_run, name=f"warmup-{name}", daemon=True)
+    th.start()
+    return th
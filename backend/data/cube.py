@@ -0,0 +1,232 @@
+"""
+data/cube.py - 월 × 업종 × 지역 × 성장유형 사전 집계 큐브
+로드 시 (월, industry, region, growth_type) 셀마다 행 수와 지표 합계를 한 번만 계산해 두고,
+랭킹/업종 비교/통계 요약은 선택된 셀을 더하는 것으로 답합니다 (전체 이력 행 재스캔 없음).
+가맹점 수는 (그룹, 가맹점)별 월 비트맵으로 임의 월 범위에서도 정확한 distinct 값을 제공합니다.
+"""
+import math
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+
+from core.parsers import month_codes
+
+CUBE_DIMS = ("industry", "region", "growth_type")
+CUBE_MEASURES = ("total_revenue", "revenue_growth_rate", "repeat_purchase_rate", "txn_count")
+
+
+def _factorize_str(s: pd.Series) -> Tuple[np.ndarray, List[str]]:
+    """astype(str) 기준 코드와 라벨 (등장 순서, category는 코드로 처리)"""
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        codes, uniq = pd.factorize(s.cat.codes.to_numpy())
+        cats = s.cat.categories
+        labels = [str(cats[c]) if c >= 0 else "nan" for c in uniq]
+    else:
+        codes, uniq = pd.factorize(s.astype(str).to_numpy())
+        labels = [str(x) for x in uniq]
+
+    # 결측과 문자열 "nan"처럼 같은 라벨로 보이는 코드는 하나로 합침
+    first: Dict[str, int] = {}
+    remap = np.empty(len(labels), dtype=np.int64)
+    for i, lab in enumerate(labels):
+        remap[i] = first.setdefault(lab, len(first))
+    return remap[codes] if len(codes) else codes.astype(np.int64), list(first.keys())
+
+
+def _exact_sums(values: np.ndarray, groups: np.ndarray, n_groups: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    그룹별 오차 없는 합계를 (hi, lo) 두 float로 보관 (hi + lo = 정확한 합, math.fsum 기반).
+    셀 합계를 다시 더할 때도 반올림 오차가 누적되지 않아 행 단위 groupby 평균과 같은 값을 냅니다.
+    """
+    hi = np.zeros(n_groups, dtype=float)
+    lo = np.zeros(n_groups, dtype=float)
+    if len(values) == 0:
+        return hi, lo
+    order = np.argsort(groups, kind="stable")
+    sorted_vals = values[order]
+    bounds = np.flatnonzero(np.diff(groups[order])) + 1
+    starts = np.concatenate([[0], bounds])
+    ends = np.concatenate([bounds, [len(values)]])
+    for gid, a, b in zip(groups[order][starts].tolist(), starts.tolist(), ends.tolist()):
+        part = sorted_vals[a:b].tolist()
+        h = math.fsum(part)
+        hi[gid] = h
+        lo[gid] = math.fsum(part + [-h])
+    return hi, lo
+
+
+def _combine(finite: np.ndarray, pinf: np.ndarray, ninf: np.ndarray, keep_inf: bool) -> np.ndarray:
+    """keep_inf=False: inf를 0으로 본 합계 / True: fillna(0).sum()과 같은 inf/nan 전파"""
+    out = finite.astype(float, copy=True)
+    if keep_inf:
+        out[pinf > 0] = np.inf
+        out[ninf > 0] = -np.inf
+        out[(pinf > 0) & (ninf > 0)] = np.nan
+    return out
+
+
+class MetricsCube:
+    """희소 셀 큐브 + 차원별 가맹점 월 비트맵"""
+
+    def __init__(self):
+        self.n_rows = 0
+        self.months = np.zeros(0, dtype=np.int32)
+        self.dims: Tuple[str, ...] = ()
+        self.measures: Tuple[str, ...] = ()
+        self.labels: Dict[str, List[str]] = {}
+        self.cell_month = np.zeros(0, dtype=np.int64)
+        self.cell_dims: Dict[str, np.ndarray] = {}
+        self.count = np.zeros(0, dtype=np.int64)
+        self.finite: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self.pinf: Dict[str, np.ndarray] = {}
+        self.ninf: Dict[str, np.ndarray] = {}
+        self.n_merchants = 0
+        # dim(None=전체) -> (pair 그룹 코드, (P, W) uint64 월 비트맵)
+        self.presence: Dict[Optional[str], Tuple[np.ndarray, np.ndarray]] = {}
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, dims: Sequence[str] = CUBE_DIMS, measures: Sequence[str] = CUBE_MEASURES) -> "MetricsCube":
+        cube = cls()
+        if df is None or len(df) == 0:
+            return cube
+        n = len(df)
+        cube.n_rows = n
+        cube.dims = tuple(d for d in dims if d in df.columns)
+        cube.measures = tuple(m for m in measures if m in df.columns)
+
+        if "txn_month_dt" in df.columns:
+            mcodes = month_codes(df["txn_month_dt"].to_numpy())
+        else:
+            mcodes = month_codes(np.full(n, np.datetime64("NaT"), dtype="datetime64[ns]"))
+        cube.months, month_idx = np.unique(mcodes, return_inverse=True)
+        month_idx = month_idx.astype(np.int64)
+
+        # 셀 키 (월, 차원...) -> 희소 셀
+        key = month_idx.copy()
+        dim_codes: Dict[str, np.ndarray] = {}
+        for d in cube.dims:
+            codes, labels = _factorize_str(df[d])
+            dim_codes[d] = codes
+            cube.labels[d] = labels
+            key = key * max(len(labels), 1) + codes
+        cells, inv = np.unique(key, return_inverse=True)
+        k = len(cells)
+
+        rest = cells.copy()
+        for d in reversed(cube.dims):
+            size = max(len(cube.labels[d]), 1)
+            cube.cell_dims[d] = rest % size
+            rest //= size
+        cube.cell_month = rest
+        cube.count = np.bincount(inv, minlength=k).astype(np.int64)
+
+        for m in cube.measures:
+            v = pd.to_numeric(df[m], errors="coerce").astype(float).to_numpy()
+            pinf = np.isposinf(v)
+            ninf = np.isneginf(v)
+            clean = np.where(np.isfinite(v), v, 0.0)
+            cube.finite[m] = _exact_sums(clean, inv, k)
+            cube.pinf[m] = np.bincount(inv, weights=pinf, minlength=k).astype(np.int64)
+            cube.ninf[m] = np.bincount(inv, weights=ninf, minlength=k).astype(np.int64)
+
+        if "merchant_id" in df.columns:
+            mid_codes, mid_labels = _factorize_str(df["merchant_id"])
+            cube.n_merchants = len(mid_labels)
+            n_words = (len(cube.months) + 63) // 64
+            word = month_idx // 64
+            bit = np.left_shift(np.uint64(1), (month_idx % 64).astype(np.uint64))
+            for d in (None,) + cube.dims:
+                g = dim_codes[d] if d is not None else np.zeros(n, dtype=np.int64)
+                pairs, pinv = np.unique(g * cube.n_merchants + mid_codes, return_inverse=True)
+                words = np.zeros((len(pairs), n_words), dtype=np.uint64)
+                np.bitwise_or.at(words, (pinv, word), bit)
+                cube.presence[d] = (pairs // cube.n_merchants, words)
+        return cube
+
+    # ------------------------------------------------------------
+    # 셀 선택
+    # ------------------------------------------------------------
+    def _month_selected(self, month_range: Optional[Tuple[int, int]]) -> Optional[np.ndarray]:
+        if month_range is None:
+            return None
+        lo, hi = month_range
+        return (self.months >= lo) & (self.months <= hi)
+
+    def _cell_mask(self, month_range: Optional[Tuple[int, int]], filters: Optional[Dict[str, str]]) -> Optional[np.ndarray]:
+        sel = self._month_selected(month_range)
+        mask = None if sel is None else sel[self.cell_month]
+        for d, label in (filters or {}).items():
+            code = self._label_code(d, label)
+            m = self.cell_dims[d] == code if code is not None else np.zeros(len(self.count), dtype=bool)
+            mask = m if mask is None else (mask & m)
+        return mask
+
+    def _label_code(self, dim: str, label: str) -> Optional[int]:
+        labels = self.labels.get(dim, [])
+        try:
+            return labels.index(label)
+        except ValueError:
+            return None
+
+    # ------------------------------------------------------------
+    # 집계
+    # ------------------------------------------------------------
+    def aggregate(
+        self,
+        dim: Optional[str],
+        month_range: Optional[Tuple[int, int]] = None,
+        filters: Optional[Dict[str, str]] = None,
+        keep_inf: bool = False,
+    ) -> Dict[str, object]:
+        """
+        dim별 (행 수, 지표 합계). dim=None이면 전체 1그룹.
+        반환: {"codes", "labels", "count", "sum": {measure: ndarray}} - 행이 있는 그룹만, 라벨 문자열 순
+        """
+        mask = self._cell_mask(month_range, filters)
+        idx = np.arange(len(self.count)) if mask is None else np.flatnonzero(mask)
+        if dim is None:
+            g, n_groups, labels = np.zeros(len(idx), dtype=np.int64), 1, ["__all__"]
+        else:
+            g, labels = self.cell_dims[dim][idx], self.labels[dim]
+            n_groups = len(labels)
+
+        count = np.bincount(g, weights=self.count[idx], minlength=n_groups).astype(np.int64)
+        sums = {}
+        for m in self.measures:
+            hi, lo = self.finite[m]
+            finite = _exact_sums(np.concatenate([hi[idx], lo[idx]]), np.concatenate([g, g]), n_groups)[0]
+            pinf = np.bincount(g, weights=self.pinf[m][idx], minlength=n_groups)
+            ninf = np.bincount(g, weights=self.ninf[m][idx], minlength=n_groups)
+            sums[m] = _combine(finite, pinf, ninf, keep_inf)
+
+        keep = np.flatnonzero(count > 0) if dim is not None else np.arange(1)
+        keep = keep[np.argsort(np.asarray([labels[i] for i in keep], dtype=object), kind="stable")] if len(keep) else keep
+        return {
+            "codes": keep,
+            "labels": [labels[i] for i in keep],
+            "count": count[keep],
+            "sum": {m: s[keep] for m, s in sums.items()},
+        }
+
+    def distinct_merchants(
+        self,
+        dim: Optional[str],
+        month_range: Optional[Tuple[int, int]] = None,
+        label: Optional[str] = None,
+    ) -> np.ndarray:
+        """그룹별 distinct 가맹점 수 (labels 인덱스 순, dim=None이면 길이 1). label을 주면 해당 그룹만"""
+        pair_g, words = self.presence.get(dim, (np.zeros(0, dtype=np.int64), np.zeros((0, 0), dtype=np.uint64)))
+        n_groups = 1 if dim is None else len(self.labels.get(dim, []))
+        sel = self._month_selected(month_range)
+        if sel is None:
+            present = np.ones(len(pair_g), dtype=bool)
+        else:
+            bits = np.flatnonzero(sel)
+            mask = np.zeros(words.shape[1], dtype=np.uint64)
+            np.bitwise_or.at(mask, bits // 64, np.left_shift(np.uint64(1), (bits % 64).astype(np.uint64)))
+            present = ((words & mask) != 0).any(axis=1)
+        if label is not None and dim is not None:
+            code = self._label_code(dim, label)
+            present = present & (pair_g == (code if code is not None else -1))
+        return np.bincount(pair_g[present], minlength=n_groups).astype(np.int64)
@@ -0,0 +1,132 @@
+"""
+data/history_index.py - 가맹점별 월간 이력 인덱스 (CSR 방식)
+merchant_id로 정렬된 metrics 테이블 하나와 가맹점별 start/end 오프셋만 보관합니다.
+이력 조회는 오프셋 구간 슬라이스로 처리하여 가맹점마다 DataFrame을 만들지 않습니다.
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from core.utils import safe_str
+from ml.features import group_offsets
+
+
+def _tail_span(sp: Tuple[int, int], tail: Optional[int]) -> Tuple[int, int]:
+    """DataFrame.tail(n)과 같은 구간 (음수 n은 앞에서 |n|개 제외)"""
+    s, e = sp
+    if tail is None:
+        return s, e
+    t = int(tail)
+    return (max(s, e - t), e) if t >= 0 else (min(e, s - t), e)
+
+
+class MerchantHistoryIndex:
+    """merchant_id → [start, end) 행 구간"""
+
+    def __init__(self, table: pd.DataFrame, ids: List[str], offsets: np.ndarray):
+        self.table = table
+        self.offsets = offsets
+        self.ids = np.asarray(ids, dtype=object)
+        self.index: Dict[str, int] = {mid: i for i, mid in enumerate(ids)}
+        self._arrays: Dict[str, np.ndarray] = {}
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, id_col: str = "merchant_id") -> "MerchantHistoryIndex":
+        if df is None or len(df) == 0 or id_col not in df.columns:
+            return cls(pd.DataFrame(), [], np.zeros(1, dtype=np.int64))
+
+        col = df[id_col]
+        if isinstance(col.dtype, pd.CategoricalDtype) and col.cat.categories.is_monotonic_increasing:
+            # 카테고리가 정렬되어 있으면 코드 순서 = 문자열 순서 (행 단위 문자열 생성 없음)
+            codes = col.cat.codes.to_numpy()
+            if len(codes) > 1 and not bool(np.all(codes[1:] >= codes[:-1])):
+                order = np.argsort(codes, kind="stable")
+                df = df.iloc[order].reset_index(drop=True)
+                codes = codes[order]
+            offsets = group_offsets(codes)
+            cats = col.cat.categories
+            ids = [str(cats[c]) if c >= 0 else "nan" for c in codes[offsets[:-1]]]
+            return cls(df, ids, offsets)
+
+        keys = col.astype(str).to_numpy()
+        # load_dataframes 결과는 이미 (merchant_id, 월) 정렬 -> 재정렬 생략
+        if len(keys) > 1 and not bool(np.all(keys[1:] >= keys[:-1])):
+            order = np.argsort(keys, kind="stable")
+            df = df.iloc[order].reset_index(drop=True)
+            keys = keys[order]
+
+        offsets = group_offsets(keys)
+        ids = [str(k) for k in keys[offsets[:-1]]]
+        return cls(df, ids, offsets)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def __contains__(self, merchant_id: str) -> bool:
+        return merchant_id in self.index
+
+    def span(self, merchant_id: str) -> Optional[Tuple[int, int]]:
+        g = self.index.get(safe_str(merchant_id, "").strip())
+        if g is None:
+            return None
+        return int(self.offsets[g]), int(self.offsets[g + 1])
+
+    def insert_positions(self, merchant_ids: np.ndarray) -> np.ndarray:
+        """정렬 순서를 유지하며 각 가맹점의 새 행이 들어갈 위치 (기존 가맹점은 이력 끝)"""
+        g = np.searchsorted(self.ids, np.asarray(merchant_ids, dtype=object), side="right")
+        return self.offsets[g]
+
+    def tail_positions(self, merchant_ids: List[str], n: int) -> np.ndarray:
+        """가맹점별 마지막 n개 행의 테이블 위치"""
+        parts = []
+        for mid in merchant_ids:
+            sp = self.span(mid)
+            if sp is not None:
+                s, e = _tail_span(sp, n)
+                parts.append(np.arange(s, e, dtype=np.int64))
+        return np.concatenate(parts) if parts else np.zeros(0, dtype=np.int64)
+
+    def _column(self, col: str) -> Optional[np.ndarray]:
+        arr = self._arrays.get(col)
+        if arr is None and col in self.table.columns:
+            arr = self.table[col].to_numpy()
+            self._arrays[col] = arr
+        return arr
+
+    def frame(self, merchant_id: str, tail: Optional[int] = None) -> Optional[pd.DataFrame]:
+        """가맹점 이력 DataFrame (복사 없는 iloc 슬라이스, 읽기 전용으로 사용)"""
+        sp = self.span(merchant_id)
+        if sp is None:
+            return None
+        s, e = _tail_span(sp, tail)
+        return self.table.iloc[s:e]
+
+    def records(
+        self,
+        merchant_id: str,
+        cols: Optional[List[str]] = None,
+        tail: Optional[int] = None,
+        str_cols: Tuple[str, ...] = (),
+    ) -> Optional[List[Dict[str, Any]]]:
+        """컬럼 배열 슬라이스로 레코드 생성 (DataFrame.to_dict('records') 대체)"""
+        sp = self.span(merchant_id)
+        if sp is None:
+            return None
+        s, e = _tail_span(sp, tail)
+
+        names = list(self.table.columns) if cols is None else list(cols)
+        values: Dict[str, list] = {}
+        for c in names:
+            arr = self._column(c)
+            if arr is None:
+                values[c] = [None] * (e - s)
+                continue
+            part = arr[s:e]
+            if c in str_cols:
+                values[c] = [str(x) for x in part]
+            elif part.dtype.kind == "M":
+                values[c] = list(pd.DatetimeIndex(part))
+            else:
+                values[c] = part.tolist()
+        return [dict(zip(names, row)) for row in zip(*(values[c] for c in names))]
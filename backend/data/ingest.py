@@ -0,0 +1,186 @@
+"""
+data/ingest.py - 대용량 metrics.csv 청크 단위 적재
+CSV를 청크로 읽어 청크마다 merchant_id/txn_month를 정규화하고, 컬럼별 스필 파일(raw 배열)에 바로 덧붙입니다.
+문자열은 전역 사전 코드(int32), 날짜는 int64(ns), 숫자는 float64로 저장하므로
+피크 메모리는 입력 크기와 무관하게 "청크 1개 + 최종 프레임 + 컬럼 1개" 수준으로 유지됩니다.
+결과 프레임은 load_dataframes()의 일반 경로와 같은 값/정렬/컬럼 순서를 가집니다.
+"""
+import os
+import shutil
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from core.utils import safe_str
+import state as st
+
+# 청크마다 dtype 추론이 달라지지 않도록 문자열로 고정할 컬럼
+METRICS_TEXT_COLS = ("merchant_id", "merchant_name", "industry", "region", "growth_type", "txn_month", "anomaly_type")
+
+_NAT_I8 = np.iinfo(np.int64).min
+
+
+class _TextDictionary:
+    """문자열 → 전역 코드 사전 (청크 로컬 factorize 결과를 전역 코드로 변환)"""
+
+    def __init__(self):
+        self.lookup: Dict[str, int] = {}
+        self.values: List[str] = []
+
+    def encode(self, s: pd.Series) -> np.ndarray:
+        codes, uniques = pd.factorize(s, use_na_sentinel=True)
+        if len(uniques) == 0:
+            return np.full(len(s), -1, dtype=np.int32)
+        glob = np.empty(len(uniques), dtype=np.int32)
+        for i, u in enumerate(uniques):
+            g = self.lookup.get(u)
+            if g is None:
+                g = len(self.values)
+                self.lookup[u] = g
+                self.values.append(u)
+            glob[i] = g
+        return np.where(codes < 0, -1, glob[np.maximum(codes, 0)]).astype(np.int32)
+
+    def sorted_categories(self):
+        """(정렬된 카테고리, 전역 코드 → 정렬 코드 변환표)"""
+        cats = np.asarray(self.values, dtype=object)
+        order = np.argsort(cats, kind="stable") if len(cats) else np.zeros(0, dtype=np.int64)
+        rank = np.empty(len(cats), dtype=np.int32)
+        rank[order] = np.arange(len(cats), dtype=np.int32)
+        return pd.Index(cats[order], dtype=object), rank
+
+
+class _SpillColumn:
+    """청크별 배열을 파일에 덧붙이는 컬럼 저장소"""
+
+    def __init__(self, path: str, kind: str):
+        self.path = path
+        self.kind = kind  # text | datetime | numeric | bool
+        self.all_int = True
+        self.text: Optional[_TextDictionary] = _TextDictionary() if kind == "text" else None
+        self._f = open(path, "wb")
+
+    @property
+    def dtype(self):
+        return {"text": np.int32, "datetime": np.int64, "bool": np.bool_}.get(self.kind, np.float64)
+
+    def append(self, s: pd.Series) -> None:
+        if self.kind == "text":
+            arr = self.text.encode(s)
+        elif self.kind == "datetime":
+            arr = s.to_numpy(dtype="datetime64[ns]").view(np.int64)
+        elif self.kind == "bool":
+            arr = s.to_numpy(dtype=np.bool_)
+        else:
+            if not pd.api.types.is_integer_dtype(s.dtype):
+                self.all_int = False
+            arr = s.to_numpy(dtype=np.float64)
+        self._f.write(np.ascontiguousarray(arr).tobytes())
+
+    def close(self) -> None:
+        if not self._f.closed:
+            self._f.close()
+
+    def open_array(self, n: int) -> np.ndarray:
+        if n == 0:
+            return np.zeros(0, dtype=self.dtype)
+        return np.memmap(self.path, dtype=self.dtype, mode="r", shape=(n,))
+
+
+def _column_kind(s: pd.Series) -> str:
+    if pd.api.types.is_datetime64_any_dtype(s.dtype):
+        return "datetime"
+    if pd.api.types.is_bool_dtype(s.dtype):
+        return "bool"
+    if pd.api.types.is_numeric_dtype(s.dtype):
+        return "numeric"
+    return "text"
+
+
+def ingest_metrics_csv(csv_path: str, chunk_rows: Optional[int] = None, work_dir: Optional[str] = None) -> pd.DataFrame:
+    """
+    metrics.csv를 청크 단위로 읽어 (merchant_id, txn_month_dt) 정렬된 DataFrame을 만듭니다.
+    문자열 컬럼은 should_categorize 규칙에 해당하면 category로 반환합니다 (피처 계산 전 단계).
+    """
+    from data.loader import normalize_metrics_rows, should_categorize
+
+    chunk_rows = int(chunk_rows or st.DATA_CSV_CHUNK_ROWS)
+    base = work_dir or st.DATA_SNAPSHOT_DIR
+    os.makedirs(base, exist_ok=True)
+    spill_dir = os.path.join(base, f".ingest.{os.getpid()}")
+    shutil.rmtree(spill_dir, ignore_errors=True)
+    os.makedirs(spill_dir)
+
+    header = pd.read_csv(csv_path, nrows=0).columns.tolist()
+    if "merchant_id" not in header:
+        raise RuntimeError("metrics.csv에 merchant_id 컬럼이 없습니다.")
+    dtypes = {c: str for c in header if c in METRICS_TEXT_COLS}
+
+    cols: Dict[str, _SpillColumn] = {}
+    order: List[str] = []
+    n = 0
+    try:
+        for chunk in pd.read_csv(csv_path, chunksize=chunk_rows, dtype=dtypes):
+            chunk = normalize_metrics_rows(chunk)
+            if not order:
+                order = list(chunk.columns)
+                for i, c in enumerate(order):
+                    cols[c] = _SpillColumn(os.path.join(spill_dir, f"c{i:03d}.bin"), _column_kind(chunk[c]))
+            for c in order:
+                sc = cols[c]
+                s = chunk[c]
+                kind = _column_kind(s)
+                if kind != sc.kind and not (sc.kind == "numeric" and kind == "bool"):
+                    raise RuntimeError(f"청크 간 컬럼 타입 불일치: {c} ({sc.kind} vs {kind})")
+                sc.append(s)
+            n += len(chunk)
+            st.logger.info("DATA_INGEST_CHUNK rows=%s total=%s", len(chunk), n)
+
+        for sc in cols.values():
+            sc.close()
+
+        if n == 0:
+            return pd.DataFrame(columns=order)
+
+        # 정렬 순서: merchant_id(문자열 순) → txn_month_dt (NaT는 뒤로), 안정 정렬
+        mid = cols["merchant_id"]
+        mid_cats, mid_rank = mid.text.sorted_categories()
+        mid_key = mid_rank[mid.open_array(n)]
+        month_key = np.array(cols["txn_month_dt"].open_array(n))
+        month_key[month_key == _NAT_I8] = np.iinfo(np.int64).max
+        perm = np.lexsort((month_key, mid_key))
+        del month_key, mid_key
+
+        data = {}
+        for c in order:
+            sc = cols[c]
+            arr = sc.open_array(n)
+            if sc.kind == "text":
+                cats, rank = sc.text.sorted_categories()
+                codes = arr[perm]
+                if should_categorize(c, len(cats) + int((codes < 0).any()), n):
+                    codes = np.where(codes < 0, -1, rank[np.maximum(codes, 0)]).astype(np.int32)
+                    data[c] = pd.Categorical.from_codes(codes, dtype=pd.CategoricalDtype(cats))
+                else:
+                    lookup = np.empty(len(sc.text.values) + 1, dtype=object)
+                    lookup[:-1] = sc.text.values
+                    lookup[-1] = np.nan
+                    data[c] = lookup[np.where(codes < 0, len(sc.text.values), codes)]
+            elif sc.kind == "datetime":
+                data[c] = np.asarray(arr[perm]).view("datetime64[ns]")
+            elif sc.kind == "bool":
+                data[c] = np.asarray(arr[perm])
+            else:
+                vals = np.asarray(arr[perm])
+                if sc.all_int and not np.isnan(vals).any():
+                    vals = vals.astype(np.int64)
+                data[c] = vals
+            del arr
+
+        return pd.DataFrame(data, index=pd.RangeIndex(n), copy=False)
+    finally:
+        for sc in cols.values():
+            sc.close()
+        shutil.rmtree(spill_dir, ignore_errors=True)
+        st.logger.info("DATA_INGEST_DONE rows=%s cols=%s path=%s", n, len(order), safe_str(csv_path))
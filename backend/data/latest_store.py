@@ -0,0 +1,153 @@
+"""
+data/latest_store.py - 가맹점별 최신 행 저장소 (struct-of-arrays)
+merchant_id → 행 인덱스 dict + 메트릭별 연속 NumPy 컬럼으로 최신 월 데이터를 보관합니다.
+pd.Series를 가맹점마다 만들지 않고 O(1) 조회/다건 gather를 제공합니다.
+"""
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from core.utils import safe_str, safe_float, safe_int
+
+
+class LatestRow:
+    """저장소의 한 행에 대한 가벼운 뷰 (Series.get 호환)"""
+
+    __slots__ = ("_store", "_pos", "merchant_id")
+
+    def __init__(self, store: "LatestMetricsStore", pos: int, merchant_id: str):
+        self._store = store
+        self._pos = pos
+        self.merchant_id = merchant_id
+
+    def get(self, col: str, default: Any = None) -> Any:
+        arr = self._store.columns.get(col)
+        if arr is None:
+            return default
+        return arr[self._pos]
+
+    def get_float(self, col: str, default: float = 0.0) -> float:
+        return safe_float(self.get(col), default)
+
+    def get_int(self, col: str, default: int = 0) -> int:
+        return safe_int(self.get(col), default)
+
+    def get_str(self, col: str, default: str = "") -> str:
+        v = self.get(col)
+        return default if v is None else safe_str(v, default)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {c: arr[self._pos] for c, arr in self._store.columns.items()}
+
+    def feature_frame(self, feature_cols: List[str]) -> pd.DataFrame:
+        """모델 입력용 1행 DataFrame (to_numeric_df와 동일 규칙)"""
+        return self._store.feature_frame([self._pos], feature_cols)
+
+
+class LatestMetricsStore:
+    """가맹점별 최신 메트릭 (행 순서는 입력 DataFrame 순서 유지)"""
+
+    def __init__(self, ids: np.ndarray, columns: Dict[str, np.ndarray]):
+        self.ids = ids
+        self.columns = columns
+        self.index: Dict[str, int] = {mid: i for i, mid in enumerate(ids.tolist())}
+        self._numeric: Dict[str, np.ndarray] = {}
+
+    @classmethod
+    def empty(cls) -> "LatestMetricsStore":
+        return cls(np.empty(0, dtype=object), {})
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, id_col: str = "merchant_id") -> "LatestMetricsStore":
+        if df is None or len(df) == 0 or id_col not in df.columns:
+            return cls.empty()
+        ids = np.asarray([safe_str(x) for x in df[id_col].tolist()], dtype=object)
+        columns = {str(c): df[c].to_numpy(copy=True) for c in df.columns}
+        return cls(ids, columns)
+
+    def upsert(self, df: pd.DataFrame, id_col: str = "merchant_id") -> "LatestMetricsStore":
+        """df의 행으로 갱신/추가한 새 저장소 반환 (기존 객체는 그대로 두어 조회 중인 요청에 안전)"""
+        if df is None or len(df) == 0:
+            return self
+        merged = pd.concat([self.frame(), df], ignore_index=True)
+        merged[id_col] = merged[id_col].astype(str)
+        merged = merged.drop_duplicates(subset=[id_col], keep="last")
+        merged = merged.sort_values(id_col, kind="stable").reset_index(drop=True)
+        return LatestMetricsStore.from_frame(merged, id_col=id_col)
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def __bool__(self) -> bool:
+        return len(self.ids) > 0
+
+    def __contains__(self, merchant_id: str) -> bool:
+        return merchant_id in self.index
+
+    # ------------------------------------------------------------
+    # 단건 조회
+    # ------------------------------------------------------------
+    def position(self, merchant_id: str) -> Optional[int]:
+        return self.index.get(safe_str(merchant_id, "").strip())
+
+    def row(self, merchant_id: str) -> Optional[LatestRow]:
+        key = safe_str(merchant_id, "").strip()
+        pos = self.index.get(key)
+        if pos is None:
+            return None
+        return LatestRow(self, pos, key)
+
+    def get_float(self, merchant_id: str, col: str, default: float = 0.0) -> float:
+        r = self.row(merchant_id)
+        return default if r is None else r.get_float(col, default)
+
+    def get_int(self, merchant_id: str, col: str, default: int = 0) -> int:
+        r = self.row(merchant_id)
+        return default if r is None else r.get_int(col, default)
+
+    def get_str(self, merchant_id: str, col: str, default: str = "") -> str:
+        r = self.row(merchant_id)
+        return default if r is None else r.get_str(col, default)
+
+    # ------------------------------------------------------------
+    # 다건 조회
+    # ------------------------------------------------------------
+    def numeric_column(self, col: str) -> np.ndarray:
+        """float64 컬럼 (숫자 변환 실패/결측은 NaN, 없는 컬럼은 0)"""
+        arr = self._numeric.get(col)
+        if arr is None:
+            src = self.columns.get(col)
+            if src is None:
+                arr = np.zeros(len(self.ids), dtype=float)
+            elif src.dtype.kind in "biuf":
+                arr = src.astype(float, copy=False)
+            else:
+                arr = pd.to_numeric(pd.Series(src), errors="coerce").to_numpy(dtype=float)
+            self._numeric[col] = arr
+        return arr
+
+    def positions(self, merchant_ids: Iterable[str]) -> np.ndarray:
+        """merchant_id 목록 → 행 인덱스 (없는 가맹점은 -1)"""
+        idx = self.index
+        return np.fromiter(
+            (idx.get(safe_str(m, "").strip(), -1) for m in merchant_ids), dtype=np.int64
+        )
+
+    def gather(self, positions: np.ndarray, cols: List[str]) -> np.ndarray:
+        """(len(positions), len(cols)) float64 행렬, NaN은 0으로 채움 (positions에 -1 불가)"""
+        pos = np.asarray(positions, dtype=np.int64)
+        out = np.empty((len(pos), len(cols)), dtype=float)
+        for j, c in enumerate(cols):
+            out[:, j] = self.numeric_column(c)[pos]
+        np.nan_to_num(out, copy=False, nan=0.0, posinf=np.inf, neginf=-np.inf)
+        return out
+
+    def feature_frame(self, positions: Iterable[int], feature_cols: List[str]) -> pd.DataFrame:
+        pos = np.asarray(list(positions), dtype=np.int64)
+        return pd.DataFrame(self.gather(pos, feature_cols), columns=list(feature_cols))
+
+    def frame(self, cols: Optional[List[str]] = None) -> pd.DataFrame:
+        """지정 컬럼만 DataFrame으로 (목록/집계용)"""
+        names = list(self.columns.keys()) if cols is None else [c for c in cols if c in self.columns]
+        return pd.DataFrame({c: self.columns[c] for c in names})
@@ -3,38 +3,94 @@ data/loader.py - 데이터/모델 로드 및 초기화
 CSV 데이터 로드, ML 모델 로드, 캐시 구성
 """
 import os
-from typing import Tuple
+import time
+from typing import Any, Dict, List, Optional, Tuple
 
 import joblib
+import numpy as np
 import pandas as pd
 
 from core.utils import safe_str
 from core.parsers import _norm_key
+from core.readiness import set_status
+from ml.features import add_group_features
+from data.latest_store import LatestMetricsStore
+from data.history_index import MerchantHistoryIndex
+from data.cube import MetricsCube
+from data.rank_index import MerchantRankIndex
+from data.ingest import ingest_metrics_csv
+from data.snapshot import load_snapshot, read_current_version, save_snapshot, snapshot_key, source_fingerprint
+from ml.forest import prepare_flat_forests
+from ml.scores import bump_model_version, get_score_table
+from ml.sar_serving import prepare_sar_scorer, reco_ready
 import state as st
 
 
 def safe_label_encode(le, series: pd.Series) -> pd.Series:
     classes = [str(x) for x in getattr(le, "classes_", [])]
     mapping = {c: i for i, c in enumerate(classes)}
+    if isinstance(series.dtype, pd.CategoricalDtype):
+        # 카테고리 단위로 매핑 후 코드로 펼침 (행 단위 문자열 변환 없음, 결측은 "nan"으로 취급)
+        cat_map = np.asarray(
+            [mapping.get(str(c), -1) for c in series.cat.categories] + [mapping.get("nan", -1)], dtype=np.int64
+        )
+        vals = cat_map[series.cat.codes.to_numpy()]
+        vals[vals < 0] = 0
+        return pd.Series(vals, index=series.index)
     return series.astype(str).map(mapping).fillna(0).astype(int)
 
 
-def load_dataframes() -> Tuple[pd.DataFrame, pd.DataFrame]:
-    merchants_df = pd.read_csv(os.path.join(st.BASE_DIR, "merchants.csv"))
-    metrics_df = pd.read_csv(os.path.join(st.BASE_DIR, "metrics.csv"))
+# ============================================================
+# 메모리 최적화 (categorical + 무손실 다운캐스트)
+# ============================================================
+METRICS_CATEGORY_COLS = ("merchant_id", "merchant_name", "industry", "region", "growth_type", "txn_month")
+CATEGORY_MAX_UNIQUE_RATIO = 0.5
 
-    if "merchant_id" not in metrics_df.columns:
-        raise RuntimeError("metrics.csv에 merchant_id 컬럼이 없습니다.")
 
-    if "merchant_id" in merchants_df.columns:
-        merchants_df["merchant_id"] = merchants_df["merchant_id"].astype(str).str.strip()
+def _frame_bytes(df: pd.DataFrame) -> int:
+    return int(df.memory_usage(deep=True, index=True).sum()) if df is not None else 0
+
+
+def should_categorize(col: str, nunique: int, n_rows: int, category_cols=METRICS_CATEGORY_COLS) -> bool:
+    return col in category_cols or nunique <= n_rows * CATEGORY_MAX_UNIQUE_RATIO
+
+
+def optimize_frame_dtypes(df: pd.DataFrame, category_cols=METRICS_CATEGORY_COLS) -> pd.DataFrame:
+    """
+    문자열 컬럼은 category로, 정수는 최소 정수형으로, 실수는 float32 왕복이 정확할 때만 float32로 변환.
+    값은 바뀌지 않으므로 모델 입력/응답 결과는 동일합니다.
+    """
+    if df is None or len(df) == 0:
+        return df
+
+    n = len(df)
+    for col in df.columns:
+        s = df[col]
+        if isinstance(s.dtype, pd.CategoricalDtype) or pd.api.types.is_bool_dtype(s.dtype):
+            continue
+        if s.dtype == object or pd.api.types.is_string_dtype(s.dtype):
+            if should_categorize(col, s.nunique(dropna=False), n, category_cols):
+                df[col] = s.astype("category")
+        elif pd.api.types.is_integer_dtype(s.dtype):
+            df[col] = pd.to_numeric(s, downcast="integer")
+        elif pd.api.types.is_float_dtype(s.dtype) and s.dtype != np.float32:
+            arr = s.to_numpy()
+            f32 = arr.astype(np.float32)
+            with np.errstate(over="ignore", invalid="ignore"):
+                exact = np.array_equal(f32.astype(arr.dtype), arr, equal_nan=True)
+            if exact:
+                df[col] = f32
+    return df
+
+
+def normalize_metrics_rows(metrics_df: pd.DataFrame) -> pd.DataFrame:
+    """merchant_id 정리, txn_month 파싱(txn_month_dt, month_num), 필수 수치 컬럼 보정"""
     metrics_df["merchant_id"] = metrics_df["merchant_id"].astype(str).str.strip()
 
     if "txn_month" in metrics_df.columns:
         raw = metrics_df["txn_month"].astype(str).str.strip()
         dt1 = pd.to_datetime(raw, errors="coerce")
 
-        import re
         raw2 = raw.str.replace(r"[^0-9]", "", regex=True)
         dt2 = pd.to_datetime(raw2, format="%Y%m", errors="coerce")
 
@@ -45,28 +101,106 @@ def load_dataframes() -> Tuple[pd.DataFrame, pd.DataFrame]:
         metrics_df["txn_month_dt"] = pd.NaT
         metrics_df["month_num"] = 0
 
-    metrics_df = metrics_df.sort_values(["merchant_id", "txn_month_dt"], na_position="last").reset_index(drop=True)
+    for col in ("total_revenue", "txn_count"):
+        if col not in metrics_df.columns:
+            metrics_df[col] = 0.0
+    return metrics_df
 
-    if "total_revenue" not in metrics_df.columns:
-        metrics_df["total_revenue"] = 0.0
 
-    for lag in (1, 2, 3):
-        metrics_df[f"revenue_lag_{lag}"] = metrics_df.groupby("merchant_id")["total_revenue"].shift(lag)
-
-    metrics_df["revenue_rolling_mean_3"] = metrics_df.groupby("merchant_id")["total_revenue"].transform(
-        lambda s: s.rolling(3, min_periods=1).mean()
-    )
+def load_dataframes() -> Tuple[pd.DataFrame, pd.DataFrame]:
+    merchants_df = pd.read_csv(os.path.join(st.BASE_DIR, "merchants.csv"))
+    if "merchant_id" in merchants_df.columns:
+        merchants_df["merchant_id"] = merchants_df["merchant_id"].astype(str).str.strip()
 
-    if "txn_count" not in metrics_df.columns:
-        metrics_df["txn_count"] = 0.0
+    metrics_path = os.path.join(st.BASE_DIR, "metrics.csv")
+    if os.path.getsize(metrics_path) >= st.DATA_CHUNKED_MIN_BYTES:
+        # 대용량: 청크 적재 + 컬럼 스필 후 정렬 (전체 문자열 테이블을 한 번에 만들지 않음)
+        metrics_df = ingest_metrics_csv(metrics_path)
+    else:
+        metrics_df = pd.read_csv(metrics_path)
+        if "merchant_id" not in metrics_df.columns:
+            raise RuntimeError("metrics.csv에 merchant_id 컬럼이 없습니다.")
+        metrics_df = normalize_metrics_rows(metrics_df)
+        metrics_df = metrics_df.sort_values(["merchant_id", "txn_month_dt"], na_position="last").reset_index(drop=True)
 
-    metrics_df["txn_rolling_mean_3"] = metrics_df.groupby("merchant_id")["txn_count"].transform(
-        lambda s: s.rolling(3, min_periods=1).mean()
-    )
+    # lag/rolling 피처: 그룹 경계 오프셋 기반 벡터화 계산 (ml/features.py)
+    metrics_df = add_group_features(metrics_df, group_col="merchant_id")
 
     return merchants_df, metrics_df
 
 
+def _data_source_paths() -> Dict[str, str]:
+    # 라벨 인코더는 *_encoded 컬럼을 결정하므로 스냅샷 지문에 포함
+    return {
+        "merchants": os.path.join(st.BASE_DIR, "merchants.csv"),
+        "metrics": os.path.join(st.BASE_DIR, "metrics.csv"),
+        "le_industry": os.path.join(st.BASE_DIR, "le_industry.pkl"),
+        "le_region": os.path.join(st.BASE_DIR, "le_region.pkl"),
+        "le_growth": os.path.join(st.BASE_DIR, "le_growth.pkl"),
+    }
+
+
+def prepare_metrics_frame(metrics_df: pd.DataFrame, le_industry, le_region, le_growth) -> Tuple[pd.DataFrame, Dict[str, int]]:
+    """라벨 인코딩 + dtype 최적화. 반환: (metrics_df, {mem_before, mem_after})"""
+    for col, enc_col, le in (
+        ("industry", "industry_encoded", le_industry),
+        ("region", "region_encoded", le_region),
+        ("growth_type", "growth_encoded", le_growth),
+    ):
+        if col in metrics_df.columns and le is not None:
+            metrics_df[enc_col] = safe_label_encode(le, metrics_df[col])
+        else:
+            metrics_df[enc_col] = 0
+
+    mem_before = _frame_bytes(metrics_df)
+    metrics_df = optimize_frame_dtypes(metrics_df)
+    return metrics_df, {"mem_before": mem_before, "mem_after": _frame_bytes(metrics_df)}
+
+
+def load_dataframes_cached(encoders: Tuple = (None, None, None)) -> Tuple[pd.DataFrame, pd.DataFrame, str, Dict[str, int]]:
+    """
+    스냅샷이 원본(CSV+인코더)과 일치하면 스냅샷 로드, 아니면 CSV 전처리 후 스냅샷 저장.
+    반환: (merchants, metrics, version, mem_stats)
+    """
+    paths = _data_source_paths()
+    t0 = time.time()
+
+    if st.DATA_SNAPSHOT_ENABLED:
+        try:
+            snap = load_snapshot(paths, mmap=st.DATA_MMAP_ENABLED)
+        except Exception as e:
+            st.logger.warning("DATA_SNAPSHOT_LOAD_FAIL err=%s", safe_str(e))
+            snap = None
+        if snap is not None:
+            frames, version, extra = snap
+            st.logger.info(
+                "DATA_SNAPSHOT_HIT version=%s mmap=%s elapsed=%.3fs",
+                version, st.DATA_MMAP_ENABLED, time.time() - t0,
+            )
+            return frames["merchants"], frames["metrics"], version, extra.get("mem") or {}
+
+    merchants_df, metrics_df = load_dataframes()
+    metrics_df, mem = prepare_metrics_frame(metrics_df, *encoders)
+    version = ""
+    try:
+        sources = source_fingerprint(paths)
+        if st.DATA_SNAPSHOT_ENABLED:
+            version = save_snapshot({"merchants": merchants_df, "metrics": metrics_df}, sources, extra={"mem": mem})
+            st.logger.info("DATA_SNAPSHOT_SAVED version=%s dir=%s", version, st.DATA_SNAPSHOT_DIR)
+            if st.DATA_MMAP_ENABLED:
+                # 게시한 스냅샷을 다시 mmap으로 열어 다른 워커와 같은 페이지를 사용
+                snap = load_snapshot(paths, mmap=True)
+                if snap is not None:
+                    merchants_df, metrics_df = snap[0]["merchants"], snap[0]["metrics"]
+        else:
+            version = snapshot_key(sources)
+    except Exception as e:
+        st.logger.warning("DATA_SNAPSHOT_SAVE_FAIL err=%s", safe_str(e))
+
+    st.logger.info("DATA_CSV_LOADED elapsed=%.3fs", time.time() - t0)
+    return merchants_df, metrics_df, version, mem
+
+
 def load_models_bundle():
     rf_reg_m = joblib.load(os.path.join(st.BASE_DIR, "model_revenue.pkl"))
     iso_forest_m = joblib.load(os.path.join(st.BASE_DIR, "model_anomaly.pkl"))
@@ -90,24 +224,33 @@ def load_models_bundle():
 
 def _ensure_popular_merchants(top_k: int = 50):
     """콜드스타트 폴백: 인기 가맹점 캐시 구성"""
-    import numpy as np
-    from core.utils import json_sanitize
-
     k = max(1, int(top_k))
     if st.POPULAR_MERCHANTS and len(st.POPULAR_MERCHANTS) >= k:
         return st.POPULAR_MERCHANTS[:k]
 
-    if st.metrics_clean is None or len(st.metrics_clean) == 0 or "merchant_id" not in st.metrics_clean.columns:
-        st.POPULAR_MERCHANTS = []
+    st.POPULAR_MERCHANTS = build_popular_merchants(st.metrics_clean, st.LATEST_STORE, st.merchants, top_k=k)
+    return st.POPULAR_MERCHANTS[:k]
+
+
+def build_popular_merchants(
+    metrics: Optional[pd.DataFrame], latest_store: Optional[LatestMetricsStore],
+    merchants: Optional[pd.DataFrame], top_k: int = 50,
+) -> List[Dict[str, Any]]:
+    """인기 가맹점 목록 계산 (전역 상태를 읽거나 쓰지 않음 → 게시 전 새 데이터로 미리 구성 가능)"""
+    import numpy as np
+    from core.utils import json_sanitize
+
+    k = max(1, int(top_k))
+    if metrics is None or len(metrics) == 0 or "merchant_id" not in metrics.columns:
         return []
 
     try:
-        latest_df = pd.DataFrame(list(st.LATEST_METRICS_MAP.values())) if st.LATEST_METRICS_MAP else st.metrics_clean.copy()
+        latest_df = latest_store.frame(["merchant_id", "total_revenue"]) if latest_store else metrics.copy()
     except Exception:
-        latest_df = st.metrics_clean.copy()
+        latest_df = metrics.copy()
 
     if "total_revenue" in latest_df.columns:
-        s = pd.to_numeric(latest_df["total_revenue"], errors="coerce").replace([np.inf, -np.inf], np.nan).fillna(0.0)
+        s = pd.to_numeric(latest_df["total_revenue"], errors="coerce").astype(float).replace([np.inf, -np.inf], np.nan).fillna(0.0)
         tmp = latest_df.assign(_rev=s).groupby(latest_df["merchant_id"].astype(str))["_rev"].mean().sort_values(ascending=False).head(max(50, k))
         pop_ids = [str(x) for x in tmp.index.tolist()]
         df = pd.DataFrame({"merchant_id": pop_ids, "score": tmp.values.astype(float)})
@@ -116,73 +259,159 @@ def _ensure_popular_merchants(top_k: int = 50):
         df = pd.DataFrame({"merchant_id": pop_ids, "score": np.linspace(1.0, 0.5, num=len(pop_ids))})
 
     df["merchant_id"] = df["merchant_id"].astype(str)
-    df = _merge_merchant_meta(df)
+    df = _merge_merchant_meta(df, merchants)
 
     cols = ["merchant_id", "merchant_name", "industry", "region", "growth_type", "score"]
     cols = [c for c in cols if c in df.columns]
-    st.POPULAR_MERCHANTS = json_sanitize(df[cols].head(max(50, k)).to_dict("records")) or []
-    return st.POPULAR_MERCHANTS[:k]
+    return json_sanitize(df[cols].head(max(50, k)).to_dict("records")) or []
 
 
-def _merge_merchant_meta(df: pd.DataFrame) -> pd.DataFrame:
+def _merge_merchant_meta(df: pd.DataFrame, merchants: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    merchants = st.merchants if merchants is None else merchants
     if df is None or len(df) == 0:
         return df
-    if st.merchants is None or len(st.merchants) == 0:
+    if merchants is None or len(merchants) == 0:
         return df
-    if "merchant_id" not in df.columns or "merchant_id" not in st.merchants.columns:
+    if "merchant_id" not in df.columns or "merchant_id" not in merchants.columns:
         return df
 
     meta_cols = ["merchant_id", "merchant_name", "industry", "region", "growth_type"]
-    keep = [c for c in meta_cols if c in st.merchants.columns]
+    keep = [c for c in meta_cols if c in merchants.columns]
     if not keep:
         return df
 
-    mm = st.merchants[keep].drop_duplicates()
+    mm = merchants[keep].drop_duplicates()
     return df.merge(mm, on="merchant_id", how="left")
 
 
+def _build_data_caches(merchants: pd.DataFrame, metrics: pd.DataFrame) -> Dict[str, Any]:
+    """
+    metrics 기반 파생 캐시 구성 (이력 인덱스, 집계 큐브, 랭킹 인덱스, 최신 행, 업종 정규화, 인기 가맹점).
+    전역 상태는 바꾸지 않고 {state 속성명: 값}을 반환 → _publish_data()가 한 번에 교체
+    """
+    latest_df = metrics.groupby("merchant_id", observed=True).tail(1)
+    latest = LatestMetricsStore.from_frame(latest_df, id_col="merchant_id")
+
+    norm_map: Dict[str, str] = {}
+    if metrics is not None and len(metrics) and "industry" in metrics.columns:
+        inds = metrics["industry"].astype(str).fillna("").unique().tolist()
+        norm_map = {_norm_key(x): safe_str(x).strip() for x in inds if safe_str(x).strip()}
+
+    return {
+        "METRICS_HISTORY": MerchantHistoryIndex.from_frame(metrics, id_col="merchant_id"),
+        "METRICS_CUBE": MetricsCube.from_frame(metrics),
+        "RANK_INDEX": MerchantRankIndex.from_frame(metrics),
+        "LATEST_STORE": latest,
+        "INDUSTRY_NORM_MAP": norm_map,
+        "POPULAR_MERCHANTS": build_popular_merchants(metrics, latest, merchants, top_k=100),
+    }
+
+
+def _publish_data(merchants: pd.DataFrame, metrics: pd.DataFrame, version: str, caches: Dict[str, Any]) -> None:
+    """
+    미리 만든 프레임/캐시 참조를 교체하고 DATA_VERSION은 마지막에 바꿈 (호출자가 DATA_LOCK 보유).
+    요청 스레드는 새 버전과 이전 캐시, 또는 비어 있는 중간 값을 보지 않습니다.
+    """
+    st.merchants = merchants
+    st.metrics_clean = metrics
+    for name, value in caches.items():
+        setattr(st, name, value)
+    st.DATA_VERSION = version
+
+
+def _load_data() -> Dict[str, int]:
+    encoders = (st.le_industry, st.le_region, st.le_growth)
+    merchants, metrics, version, mem = load_dataframes_cached(encoders)
+    caches = _build_data_caches(merchants, metrics)
+    with st.DATA_LOCK:
+        _publish_data(merchants, metrics, version, caches)
+        mark_current_seen()
+    return mem
+
+
 def init_data_models() -> None:
     """데이터 로드 및 모델 초기화 (startup 시 호출)"""
-    st.merchants, st.metrics_clean = load_dataframes()
     st.rf_reg, st.iso_forest, st.rf_clf, st.scaler, st.le_industry, st.le_region, st.le_growth, st.sar_model = load_models_bundle()
+    bump_model_version()
+    prepare_flat_forests()
+    st.SAR_SCORER = prepare_sar_scorer(st.sar_model)
+    mem = _load_data()
+    # 전체 가맹점 점수 테이블 선계산 (이후 데이터/모델 버전 변경 시 조회 시점에 재계산)
+    get_score_table(force=True)
 
-    if "industry" in st.metrics_clean.columns and st.le_industry is not None:
-        st.metrics_clean["industry_encoded"] = safe_label_encode(st.le_industry, st.metrics_clean["industry"])
-    else:
-        st.metrics_clean["industry_encoded"] = 0
+    st.logger.info(
+        "DATA_MODELS_READY version=%s merchants=%s metrics=%s cached=%s industries=%s reco_ready=%s popular=%s mem_bytes=%s->%s mmap=%s",
+        st.DATA_VERSION,
+        len(st.merchants),
+        len(st.metrics_clean),
+        len(st.LATEST_STORE),
+        len(st.INDUSTRY_NORM_MAP),
+        reco_ready(),
+        len(st.POPULAR_MERCHANTS),
+        mem.get("mem_before"),
+        mem.get("mem_after"),
+        st.DATA_MMAP_ENABLED,
+    )
+    set_status("data", "ready")
 
-    if "region" in st.metrics_clean.columns and st.le_region is not None:
-        st.metrics_clean["region_encoded"] = safe_label_encode(st.le_region, st.metrics_clean["region"])
-    else:
-        st.metrics_clean["region_encoded"] = 0
 
-    if "growth_type" in st.metrics_clean.columns and st.le_growth is not None:
-        st.metrics_clean["growth_encoded"] = safe_label_encode(st.le_growth, st.metrics_clean["growth_type"])
-    else:
-        st.metrics_clean["growth_encoded"] = 0
+# ============================================================
+# 데이터 버전 확인 (다른 워커가 게시한 스냅샷 반영)
+# ============================================================
+_LAST_VERSION_CHECK_TS = 0.0
+_LAST_SEEN_CURRENT = ""
 
-    st.METRICS_BY_MERCHANT = {}
-    for mid, group in st.metrics_clean.groupby("merchant_id"):
-        st.METRICS_BY_MERCHANT[str(mid)] = group
 
-    st.LATEST_METRICS_MAP = {}
-    latest_df = st.metrics_clean.groupby("merchant_id").tail(1)
-    for _, row in latest_df.iterrows():
-        st.LATEST_METRICS_MAP[str(row["merchant_id"])] = row
+def mark_current_seen() -> None:
+    """
+    지금의 CURRENT 값을 확인한 것으로 기록 (로드/append 직후 호출).
+    persist=False append는 DATA_VERSION만 바꾸고 CURRENT는 그대로 두므로,
+    이 값을 기록하지 않으면 다음 확인에서 이전 스냅샷을 다시 로드해 추가한 행이 사라집니다.
+    """
+    global _LAST_SEEN_CURRENT
+    try:
+        _LAST_SEEN_CURRENT = read_current_version()
+    except Exception:
+        pass
 
-    st.INDUSTRY_NORM_MAP = {}
-    if st.metrics_clean is not None and len(st.metrics_clean) and "industry" in st.metrics_clean.columns:
-        inds = st.metrics_clean["industry"].astype(str).fillna("").unique().tolist()
-        st.INDUSTRY_NORM_MAP = {_norm_key(x): safe_str(x).strip() for x in inds if safe_str(x).strip()}
 
-    st.POPULAR_MERCHANTS = _ensure_popular_merchants(top_k=100)
+def reload_data_if_stale(force: bool = False) -> bool:
+    """
+    CURRENT가 마지막 확인 이후 바뀌었고(다른 워커가 새 스냅샷 게시) 현재 DATA_VERSION과 다르면 다시 로드합니다.
+    DATA_VERSION_CHECK_SEC 간격으로만 확인하며, 같은 CURRENT 값은 한 번만 시도합니다.
+    """
+    global _LAST_VERSION_CHECK_TS, _LAST_SEEN_CURRENT
 
-    st.logger.info(
-        "DATA_MODELS_READY merchants=%s metrics=%s cached=%s industries=%s reco_ready=%s popular=%s",
-        len(st.merchants),
-        len(st.metrics_clean),
-        len(st.LATEST_METRICS_MAP),
-        len(st.INDUSTRY_NORM_MAP),
-        bool(st.sar_model is not None),
-        len(st.POPULAR_MERCHANTS),
-    )
+    if not st.DATA_SNAPSHOT_ENABLED or st.DATA_VERSION_CHECK_SEC <= 0 or not st.DATA_VERSION:
+        return False
+
+    now = time.time()
+    if not force and now - _LAST_VERSION_CHECK_TS < st.DATA_VERSION_CHECK_SEC:
+        return False
+    # 갱신(append) 중이면 다음 확인 주기로 미룸
+    if not st.DATA_LOCK.acquire(blocking=False):
+        return False
+    try:
+        _LAST_VERSION_CHECK_TS = now
+        current = read_current_version()
+        if not current or current == st.DATA_VERSION or current == _LAST_SEEN_CURRENT:
+            return False
+        _LAST_SEEN_CURRENT = current
+
+        snap = load_snapshot(_data_source_paths(), mmap=st.DATA_MMAP_ENABLED)
+        if snap is None:
+            st.logger.warning("DATA_VERSION_SKIP current=%s loaded=%s reason=source_mismatch", current, st.DATA_VERSION)
+            return False
+
+        frames, version, _ = snap
+        prev = st.DATA_VERSION
+        # 새 프레임 기준 캐시를 지역 변수로 모두 만든 뒤 한 번에 교체 (재구성 중에는 이전 버전 그대로 서빙)
+        caches = _build_data_caches(frames["merchants"], frames["metrics"])
+        _publish_data(frames["merchants"], frames["metrics"], version, caches)
+        st.logger.info("DATA_RELOADED version=%s prev=%s mmap=%s", version, prev, st.DATA_MMAP_ENABLED)
+        return True
+    except Exception as e:
+        st.logger.warning("DATA_VERSION_CHECK_FAIL err=%s", safe_str(e))
+        return False
+    finally:
+        st.DATA_LOCK.release()
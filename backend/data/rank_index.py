@@ -0,0 +1,237 @@
+"""
+data/rank_index.py - 가맹점 랭킹 인덱스
+tool_rank_merchants의 그룹 (merchant_id, merchant_name, industry, region, growth_type)마다
+전체 기간 지표 합계/행 수와 (그룹, 월) 셀 합계를 미리 계산해 둡니다.
+- 전체 기간: 그룹 평균 배열에서 argpartition으로 상위 N만 정렬
+- 월 범위: (그룹, 월) 셀 중 범위 안의 셀만 그룹별로 더함 (행 재스캔/문자열 비교 없음)
+- 증분 갱신: append()가 새 행의 셀만 계산해 기존 합계에 더한 새 인덱스를 반환
+"""
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from core.parsers import month_codes
+from data.cube import _exact_sums
+
+RANK_METRICS = ("total_revenue", "revenue_growth_rate", "repeat_purchase_rate")
+RANK_KEYS = ("merchant_id", "merchant_name", "industry", "region", "growth_type")
+
+
+def _rank_values(df: pd.DataFrame, metric: str) -> np.ndarray:
+    """to_numeric → inf/결측은 0 (기존 랭킹 계산과 같은 규칙)"""
+    if metric not in df.columns:
+        return np.zeros(len(df), dtype=float)
+    v = pd.to_numeric(df[metric], errors="coerce").astype(float).to_numpy()
+    return np.where(np.isfinite(v), v, 0.0)
+
+
+def _key_labels(df: pd.DataFrame, keys: Tuple[str, ...]) -> Tuple[np.ndarray, List[np.ndarray]]:
+    """(groupby가 남기는 행 = 키 결측 없는 행 마스크, 키별 문자열 라벨 배열)"""
+    valid = np.ones(len(df), dtype=bool)
+    labels = []
+    for k in keys:
+        s = df[k]
+        valid &= s.notna().to_numpy()
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            codes, uniq = s.cat.codes.to_numpy(), s.cat.categories
+        else:
+            codes, uniq = pd.factorize(s.to_numpy(), use_na_sentinel=True)
+        cats = np.asarray([str(c) for c in uniq] + [None], dtype=object)
+        labels.append(cats[np.where(codes >= 0, codes, len(cats) - 1)])
+    return valid, labels
+
+
+def _merge_sums(
+    old: Tuple[np.ndarray, np.ndarray], old_pos: np.ndarray, values: np.ndarray, new_pos: np.ndarray, size: int
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    기존 (hi, lo) 합계를 새 위치로 옮기고, 새 값이 들어온 위치만 정확 합계를 다시 계산.
+    증분 갱신 시 영향받은 셀/그룹만 fsum 하므로 비용이 새 행 수에 비례합니다.
+    """
+    hi = np.zeros(size, dtype=float)
+    lo = np.zeros(size, dtype=float)
+    hi[old_pos] = old[0]
+    lo[old_pos] = old[1]
+    if len(new_pos) == 0:
+        return hi, lo
+    touched, tinv = np.unique(new_pos, return_inverse=True)
+    om = np.flatnonzero(np.isin(old_pos, touched))
+    oc = np.searchsorted(touched, old_pos[om])
+    th, tl = _exact_sums(
+        np.concatenate([old[0][om], old[1][om], values]),
+        np.concatenate([oc, oc, tinv]).astype(np.int64),
+        len(touched),
+    )
+    hi[touched] = th
+    lo[touched] = tl
+    return hi, lo
+
+
+class MerchantRankIndex:
+    """그룹별 전체 기간 합계 + (그룹, 월) 셀 합계"""
+
+    def __init__(self):
+        self.keys: Tuple[str, ...] = ()
+        self.group_keys: List[Tuple[str, ...]] = []
+        self.lookup: Dict[Tuple[str, ...], int] = {}
+        self.order_rank = np.zeros(0, dtype=np.int64)  # groupby 키 정렬 순위 (동점 순서)
+        self.dim_codes: Dict[str, np.ndarray] = {}
+        self.dim_lookup: Dict[str, Dict[str, int]] = {}
+        # 셀 (그룹, 월)
+        self.cell_group = np.zeros(0, dtype=np.int64)
+        self.cell_month = np.zeros(0, dtype=np.int32)
+        self.cell_count = np.zeros(0, dtype=np.int64)
+        self.cell_sums: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        # 전체 기간
+        self.count = np.zeros(0, dtype=np.int64)
+        self.sums: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+
+    @property
+    def n_groups(self) -> int:
+        return len(self.group_keys)
+
+    # ------------------------------------------------------------
+    # 구성 / 증분 갱신
+    # ------------------------------------------------------------
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame) -> "MerchantRankIndex":
+        idx = cls()
+        idx.sums = {m: (np.zeros(0), np.zeros(0)) for m in RANK_METRICS}
+        idx.cell_sums = {m: (np.zeros(0), np.zeros(0)) for m in RANK_METRICS}
+        if df is None or "merchant_id" not in df.columns:
+            return idx
+        idx.keys = tuple(k for k in RANK_KEYS if k in df.columns)
+        return idx.append(df)
+
+    def append(self, rows: pd.DataFrame) -> "MerchantRankIndex":
+        """rows(새 metrics 행)를 반영한 새 인덱스 (self는 변경하지 않음)"""
+        out = MerchantRankIndex()
+        out.keys = self.keys
+        out.group_keys = list(self.group_keys)
+        out.lookup = dict(self.lookup)
+
+        valid, labels = _key_labels(rows, self.keys)
+        rows_idx = np.flatnonzero(valid)
+
+        # 키 조합 factorize (행 단위 튜플 생성 없이 고유 조합만 그룹 ID로 변환)
+        if len(rows_idx):
+            codes = np.column_stack([pd.factorize(lab[rows_idx])[0] for lab in labels])
+            combos, first, cinv = np.unique(codes, axis=0, return_index=True, return_inverse=True)
+            combo_gid = np.empty(len(combos), dtype=np.int64)
+            for c, r in enumerate(rows_idx[first].tolist()):
+                key = tuple(lab[r] for lab in labels)
+                g = out.lookup.get(key)
+                if g is None:
+                    g = len(out.group_keys)
+                    out.lookup[key] = g
+                    out.group_keys.append(key)
+                combo_gid[c] = g
+            gid = combo_gid[np.asarray(cinv).reshape(-1)]
+        else:
+            gid = np.zeros(0, dtype=np.int64)
+        n_groups = len(out.group_keys)
+
+        if "txn_month_dt" in rows.columns:
+            mon = month_codes(rows["txn_month_dt"].to_numpy())[rows_idx]
+        else:
+            mon = month_codes(np.full(len(rows_idx), np.datetime64("NaT"), dtype="datetime64[ns]"))
+
+        # 셀 키 = 그룹 * 2^32 + (월 코드 - int32 최소값)
+        shift = np.int64(2 ** 32)
+        base = np.int64(np.iinfo(np.int32).min)
+        old_key = self.cell_group * shift + (self.cell_month.astype(np.int64) - base)
+        new_key = gid * shift + (mon.astype(np.int64) - base)
+        cells, inv = np.unique(np.concatenate([old_key, new_key]), return_inverse=True)
+        inv = np.asarray(inv).reshape(-1)
+        n_old = len(old_key)
+        old_pos, new_pos = inv[:n_old], inv[n_old:]
+        out.cell_group = cells // shift
+        out.cell_month = ((cells % shift) + base).astype(np.int32)
+        out.cell_count = np.zeros(len(cells), dtype=np.int64)
+        out.cell_count[old_pos] = self.cell_count
+        np.add.at(out.cell_count, new_pos, 1)
+
+        out.count = np.zeros(n_groups, dtype=np.int64)
+        out.count[:len(self.count)] = self.count
+        np.add.at(out.count, gid, 1)
+
+        g_old = np.arange(len(self.count), dtype=np.int64)
+        for m in RANK_METRICS:
+            v = _rank_values(rows, m)[rows_idx]
+            out.cell_sums[m] = _merge_sums(self.cell_sums[m], old_pos, v, new_pos, len(cells))
+            out.sums[m] = _merge_sums(self.sums[m], g_old, v, gid, n_groups)
+
+        out._build_group_meta()
+        return out
+
+    def _build_group_meta(self) -> None:
+        order = sorted(range(self.n_groups), key=lambda g: self.group_keys[g])
+        self.order_rank = np.empty(self.n_groups, dtype=np.int64)
+        self.order_rank[np.asarray(order, dtype=np.int64)] = np.arange(self.n_groups, dtype=np.int64)
+        for dim in ("industry", "region"):
+            if dim not in self.keys:
+                continue
+            j = self.keys.index(dim)
+            stripped = [str(k[j]).strip() for k in self.group_keys]
+            codes, uniq = pd.factorize(np.asarray(stripped, dtype=object))
+            self.dim_codes[dim] = codes.astype(np.int64)
+            self.dim_lookup[dim] = {str(u): i for i, u in enumerate(uniq)}
+
+    # ------------------------------------------------------------
+    # 조회
+    # ------------------------------------------------------------
+    def dim_mask(self, dim: str, value: str) -> np.ndarray:
+        """그룹 라벨 strip 비교 마스크"""
+        code = self.dim_lookup.get(dim, {}).get(value)
+        if code is None:
+            return np.zeros(self.n_groups, dtype=bool)
+        return self.dim_codes[dim] == code
+
+    def group_stats(
+        self, metric: str, month_range: Optional[Tuple[int, int]] = None, decimals: int = 2
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (그룹별 행 수, 그룹별 평균). 행이 없는 그룹의 평균은 NaN.
+        월 범위 합계는 bincount 근사 후, decimals 자리 반올림 경계에 가까운 그룹만 정확 합계로 다시 계산
+        """
+        if month_range is None:
+            count = self.count
+            total = self.sums[metric][0]
+        else:
+            lo, hi = month_range
+            sel = np.flatnonzero((self.cell_month >= lo) & (self.cell_month <= hi))
+            g = self.cell_group[sel]
+            count = np.bincount(g, weights=self.cell_count[sel], minlength=self.n_groups).astype(np.int64)
+            chi, clo = self.cell_sums[metric]
+            total = np.bincount(g, weights=chi[sel], minlength=self.n_groups) + np.bincount(g, weights=clo[sel], minlength=self.n_groups)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                scaled = total / np.maximum(count, 1) * (10.0 ** decimals)
+            near = (count > 0) & (np.abs(np.abs(scaled - np.trunc(scaled)) - 0.5) < 1e-6)
+            if near.any():
+                pick = np.flatnonzero(near[g])
+                exact_g, exact_inv = np.unique(g[pick], return_inverse=True)
+                exact_inv = np.asarray(exact_inv).reshape(-1)
+                cells = sel[pick]
+                total = total.copy()
+                total[exact_g] = _exact_sums(
+                    np.concatenate([chi[cells], clo[cells]]), np.concatenate([exact_inv, exact_inv]), len(exact_g)
+                )[0]
+        with np.errstate(divide="ignore", invalid="ignore"):
+            mean = np.where(count > 0, total / np.maximum(count, 1), np.nan)
+        return count, mean
+
+    def top(self, values: np.ndarray, candidates: np.ndarray, n: int) -> np.ndarray:
+        """candidates 중 values 내림차순 상위 n (동점은 groupby 키 순), argpartition 사용"""
+        if len(candidates) == 0 or n <= 0:
+            return candidates[:0]
+        v = values[candidates]
+        if len(candidates) > n:
+            part = np.argpartition(-v, n - 1)
+            keep = v >= v[part[n - 1]]  # n번째 값과 같은 경계 동점 포함
+            candidates, v = candidates[keep], v[keep]
+        order = np.lexsort((self.order_rank[candidates], -v))
+        return candidates[order[:n]]
+
+    def records(self, groups: np.ndarray) -> List[Dict[str, str]]:
+        return [dict(zip(self.keys, self.group_keys[g])) for g in groups.tolist()]
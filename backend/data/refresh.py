@@ -0,0 +1,245 @@
+"""
+data/refresh.py - 월간 데이터 증분 갱신 (재시작 없이 metrics 행 추가)
+새 월 행에 대해 영향받는 가맹점의 tail만으로 lag/rolling 피처를 계산하고,
+파생 캐시(이력 인덱스, 최신 행, 업종 정규화, 인기 가맹점)를 갱신한 뒤 새 데이터 버전을 게시합니다.
+"""
+import os
+import time
+import shutil
+from io import StringIO
+from typing import Dict, List
+
+import numpy as np
+import pandas as pd
+
+from core.utils import safe_str
+from core.parsers import _norm_key
+from ml.features import add_group_features, max_lookback
+from data.loader import (
+    _data_source_paths, build_popular_merchants, normalize_metrics_rows,
+    optimize_frame_dtypes, safe_label_encode, _frame_bytes, mark_current_seen,
+)
+from data.history_index import MerchantHistoryIndex
+from data.cube import MetricsCube
+from data.rank_index import MerchantRankIndex
+from data.latest_store import LatestMetricsStore
+from data.snapshot import load_snapshot, save_snapshot, snapshot_key, source_fingerprint
+import state as st
+
+
+# ============================================================
+# 입력 검증/전처리
+# ============================================================
+def _validate_new_rows(new_df: pd.DataFrame) -> List[str]:
+    """기존 최신 월 이후의 행만 허용 (중간 삽입/중복 월은 거부)"""
+    errors: List[str] = []
+    if new_df["txn_month_dt"].isna().any():
+        bad = new_df.loc[new_df["txn_month_dt"].isna(), "txn_month"].astype(str).head(5).tolist()
+        errors.append(f"txn_month 형식 오류: {bad}")
+
+    dup = new_df.duplicated(subset=["merchant_id", "txn_month_dt"], keep=False)
+    if dup.any():
+        bad = new_df.loc[dup, "merchant_id"].astype(str).unique()[:5].tolist()
+        errors.append(f"같은 가맹점/월 중복 행: {bad}")
+
+    store = st.LATEST_STORE
+    if store and "txn_month_dt" in store.columns:
+        pos = store.positions(new_df["merchant_id"].tolist())
+        known = pos >= 0
+        if known.any():
+            last = store.columns["txn_month_dt"][pos[known]]
+            cur = new_df["txn_month_dt"].to_numpy()[known]
+            stale = cur <= last
+            if stale.any():
+                bad = new_df["merchant_id"].to_numpy()[known][stale][:5].tolist()
+                errors.append(f"기존 최신 월 이전/동일 월 행: {bad}")
+    return errors
+
+
+def _fill_merchant_meta(new_df: pd.DataFrame) -> pd.DataFrame:
+    """가맹점명/업종/지역/성장유형이 비어 있으면 merchants 테이블 값으로 채움"""
+    if st.merchants is None or len(st.merchants) == 0 or "merchant_id" not in st.merchants.columns:
+        return new_df
+    m = st.merchants.drop_duplicates("merchant_id")
+    meta = m.set_index(m["merchant_id"].astype(str))
+    keys = new_df["merchant_id"].astype(str).str.strip()
+    for col in ("merchant_name", "industry", "region", "growth_type"):
+        if col not in meta.columns:
+            continue
+        fill = keys.map(meta[col])
+        new_df[col] = new_df[col].where(new_df[col].notna(), fill) if col in new_df.columns else fill
+    return new_df
+
+
+def _encode_new_rows(new_df: pd.DataFrame) -> pd.DataFrame:
+    for col, enc_col, le in (
+        ("industry", "industry_encoded", st.le_industry),
+        ("region", "region_encoded", st.le_region),
+        ("growth_type", "growth_encoded", st.le_growth),
+    ):
+        if col in new_df.columns and le is not None:
+            new_df[enc_col] = safe_label_encode(le, new_df[col])
+        else:
+            new_df[enc_col] = 0
+    return new_df
+
+
+def _compute_tail_features(new_df: pd.DataFrame) -> pd.DataFrame:
+    """영향받는 가맹점의 마지막 lookback개 행 + 새 행만으로 피처 계산"""
+    hist = st.METRICS_HISTORY
+    mids = new_df["merchant_id"].unique().tolist()
+    ctx_pos = hist.tail_positions(mids, max_lookback()) if hist is not None else np.zeros(0, dtype=np.int64)
+
+    ctx = st.metrics_clean.iloc[ctx_pos]
+    work = pd.concat(
+        [ctx.assign(_new=False), new_df.assign(_new=True)],
+        ignore_index=True,
+    )
+    work["merchant_id"] = work["merchant_id"].astype(str)
+    work = work.sort_values(["merchant_id", "txn_month_dt"], kind="stable").reset_index(drop=True)
+    work = add_group_features(work, group_col="merchant_id")
+    return work[work["_new"].to_numpy(dtype=bool)].drop(columns=["_new"]).reset_index(drop=True)
+
+
+def _merge_into_table(new_rows: pd.DataFrame) -> pd.DataFrame:
+    """merchant_id 정렬 순서를 유지하며 새 행을 기존 테이블에 끼워 넣음"""
+    old = st.metrics_clean
+    hist = st.METRICS_HISTORY
+    n_old = len(old)
+
+    pos = hist.insert_positions(new_rows["merchant_id"].to_numpy()) if hist is not None else np.full(len(new_rows), n_old)
+    take = np.insert(np.arange(n_old, dtype=np.int64), pos, n_old + np.arange(len(new_rows), dtype=np.int64))
+
+    combined = pd.concat([old, new_rows], ignore_index=True)
+    return combined.iloc[take].reset_index(drop=True)
+
+
+# ============================================================
+# CSV 반영 (재시작 시에도 유지)
+# ============================================================
+def _append_metrics_csv(body: str, csv_path: str) -> None:
+    """기존 파일 복사본에 행(CSV 본문)을 덧붙인 뒤 원자적으로 교체"""
+    tmp = f"{csv_path}.{os.getpid()}.tmp"
+    shutil.copyfile(csv_path, tmp)
+    try:
+        with open(tmp, "rb+") as f:
+            f.seek(0, os.SEEK_END)
+            if f.tell() > 0:
+                f.seek(-1, os.SEEK_END)
+                if f.read(1) != b"\n":
+                    f.write(b"\n")
+            f.write(body.encode("utf-8"))
+        os.replace(tmp, csv_path)
+    except Exception:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+
+# ============================================================
+# 공개 API
+# ============================================================
+def append_metrics_rows(rows: pd.DataFrame, persist: bool = True) -> Dict:
+    """
+    새 월 metrics 행을 추가하고 파생 캐시/데이터 버전을 갱신합니다.
+    persist=True면 metrics.csv에 행을 덧붙이고 스냅샷을 게시하여 다른 워커도 반영합니다.
+    """
+    if rows is None or len(rows) == 0:
+        return {"status": "FAILED", "error": "추가할 행이 없습니다."}
+    if "merchant_id" not in rows.columns or "txn_month" not in rows.columns:
+        return {"status": "FAILED", "error": "merchant_id, txn_month 컬럼이 필요합니다."}
+    if st.metrics_clean is None or len(st.metrics_clean) == 0:
+        return {"status": "FAILED", "error": "기존 metrics 데이터가 로드되지 않았습니다."}
+
+    t0 = time.time()
+    with st.DATA_LOCK:
+        paths = _data_source_paths()
+        new_df = _fill_merchant_meta(rows.copy())
+        csv_body = ""
+        if persist:
+            # CSV 헤더 기준으로 직렬화한 텍스트를 다시 파싱해 사용:
+            # 재시작 시 CSV 전체 로드와 메모리 값이 비트 단위로 같아짐 (CSV에 없는 컬럼은 제외)
+            header = pd.read_csv(paths["metrics"], nrows=0).columns.tolist()
+            csv_text = new_df.reindex(columns=header).to_csv(index=False, lineterminator="\n")
+            csv_body = csv_text.split("\n", 1)[1]
+            new_df = pd.read_csv(StringIO(csv_text))
+
+        new_df = normalize_metrics_rows(new_df)
+        errors = _validate_new_rows(new_df)
+        if errors:
+            return {"status": "FAILED", "error": "; ".join(errors)}
+
+        new_df = _encode_new_rows(new_df)
+        new_df = new_df.sort_values(["merchant_id", "txn_month_dt"], kind="stable").reset_index(drop=True)
+        new_rows = _compute_tail_features(new_df)
+
+        table = _merge_into_table(new_rows)
+        mem = {"mem_before": _frame_bytes(table)}
+        table = optimize_frame_dtypes(table)
+        mem["mem_after"] = _frame_bytes(table)
+
+        version = ""
+        if persist:
+            try:
+                _append_metrics_csv(csv_body, paths["metrics"])
+            except Exception as e:
+                st.logger.exception("DATA_APPEND_CSV_FAIL")
+                return {"status": "FAILED", "error": f"metrics.csv 반영 실패: {safe_str(e)}"}
+            try:
+                sources = source_fingerprint(paths)
+                version = snapshot_key(sources)
+                if st.DATA_SNAPSHOT_ENABLED:
+                    version = save_snapshot(
+                        {"merchants": st.merchants, "metrics": table}, sources,
+                        extra={"mem": mem},
+                    )
+                    if st.DATA_MMAP_ENABLED:
+                        snap = load_snapshot(paths, mmap=True)
+                        if snap is not None:
+                            table = snap[0]["metrics"]
+            except Exception as e:
+                st.logger.warning("DATA_SNAPSHOT_SAVE_FAIL err=%s", safe_str(e))
+        if not version:
+            version = f"{st.DATA_VERSION}+{int(time.time())}"
+
+        # 파생 캐시: 새 객체를 만든 뒤 참조만 교체
+        history = MerchantHistoryIndex.from_frame(table, id_col="merchant_id")
+        cube = MetricsCube.from_frame(table)
+        # 랭킹 인덱스는 새 행의 셀/그룹만 갱신
+        rank_index = (st.RANK_INDEX or MerchantRankIndex.from_frame(st.metrics_clean)).append(new_rows)
+        latest_new = new_rows.groupby("merchant_id", sort=False).tail(1)
+        latest = (st.LATEST_STORE or LatestMetricsStore.empty()).upsert(latest_new, id_col="merchant_id")
+
+        norm_map = dict(st.INDUSTRY_NORM_MAP)
+        if "industry" in new_rows.columns:
+            for x in new_rows["industry"].astype(str).unique().tolist():
+                if safe_str(x).strip():
+                    norm_map.setdefault(_norm_key(x), safe_str(x).strip())
+        popular = build_popular_merchants(table, latest, st.merchants, top_k=100)
+
+        prev = st.DATA_VERSION
+        st.metrics_clean = table
+        st.METRICS_HISTORY = history
+        st.METRICS_CUBE = cube
+        st.RANK_INDEX = rank_index
+        st.LATEST_STORE = latest
+        st.INDUSTRY_NORM_MAP = norm_map
+        st.POPULAR_MERCHANTS = popular
+        st.DATA_VERSION = version
+        # 이 시점의 CURRENT를 확인한 것으로 기록 (persist=False면 CURRENT가 이전 스냅샷을 가리켜도 다시 로드하지 않음)
+        mark_current_seen()
+
+    merchants = sorted(set(new_rows["merchant_id"].astype(str).tolist()))
+    st.logger.info(
+        "DATA_APPENDED rows=%s merchants=%s version=%s prev=%s persist=%s elapsed=%.3fs",
+        len(new_rows), len(merchants), version, prev, persist, time.time() - t0,
+    )
+    return {
+        "status": "SUCCESS",
+        "appended": int(len(new_rows)),
+        "merchants": merchants[:100],
+        "merchant_count": len(merchants),
+        "version": version,
+        "previous_version": prev,
+        "rows_total": int(len(table)),
+    }
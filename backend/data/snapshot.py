@@ -0,0 +1,252 @@
+"""
+data/snapshot.py - 전처리 데이터 컬럼형 스냅샷 캐시
+CSV(크기+mtime+sha1) 지문으로 키를 만들고, 전처리된 DataFrame을 컬럼별 .npy로 저장/로드
+mmap 모드에서는 컬럼 배열을 읽기 전용 memory-map으로 열어 워커 간 물리 페이지를 공유합니다.
+
+디렉토리 구조:
+    DATA_SNAPSHOT_DIR/
+    ├── CURRENT                 # 현재 게시된 스냅샷 버전 (원자적 교체)
+    └── <version>/
+        ├── meta.json           # 원본 지문, 프레임/컬럼 메타
+        ├── merchants/c000.npy  # 컬럼별 배열
+        └── metrics/c000.npy
+"""
+import os
+import json
+import time
+import shutil
+import hashlib
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from core.utils import safe_str
+import state as st
+
+# 전처리 로직이 바뀌면 올려서 기존 스냅샷을 무효화
+SNAPSHOT_FORMAT_VERSION = 3
+SNAPSHOT_KEEP = 2
+CURRENT_FILE = "CURRENT"
+META_FILE = "meta.json"
+
+
+# ============================================================
+# 원본 지문
+# ============================================================
+def _file_sha1(path: str, block_size: int = 1 << 20) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        while True:
+            b = f.read(block_size)
+            if not b:
+                break
+            h.update(b)
+    return h.hexdigest()
+
+
+def source_fingerprint(paths: Dict[str, str]) -> Dict[str, dict]:
+    """원본 파일별 {size, mtime_ns, sha1}"""
+    out: Dict[str, dict] = {}
+    for name, p in sorted(paths.items()):
+        s = os.stat(p)
+        out[name] = {"size": int(s.st_size), "mtime_ns": int(s.st_mtime_ns), "sha1": _file_sha1(p)}
+    return out
+
+
+def _sources_match(saved: Dict[str, dict], paths: Dict[str, str]) -> bool:
+    """size+mtime이 같으면 해시 생략, mtime만 다르면(재배포 복사 등) sha1로 재확인"""
+    if not isinstance(saved, dict) or set(saved.keys()) != set(paths.keys()):
+        return False
+    for name, p in paths.items():
+        try:
+            s = os.stat(p)
+        except OSError:
+            return False
+        meta = saved.get(name) or {}
+        if int(meta.get("size", -1)) != int(s.st_size):
+            return False
+        if int(meta.get("mtime_ns", -1)) == int(s.st_mtime_ns):
+            continue
+        if safe_str(meta.get("sha1")) != _file_sha1(p):
+            return False
+    return True
+
+
+def snapshot_key(sources: Dict[str, dict]) -> str:
+    parts = [f"v{SNAPSHOT_FORMAT_VERSION}"]
+    for name in sorted(sources.keys()):
+        parts.append(f"{name}:{sources[name].get('sha1', '')}")
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()[:16]
+
+
+# ============================================================
+# 컬럼 인코딩
+# ============================================================
+def _is_text_column(s: pd.Series) -> bool:
+    return s.dtype == object or pd.api.types.is_string_dtype(s.dtype)
+
+
+def _save_frame(df: pd.DataFrame, out_dir: str) -> List[dict]:
+    """컬럼별 .npy 저장. 문자열은 코드(int32)+사전(unicode)으로 저장해 pickle 없이 로드 가능."""
+    os.makedirs(out_dir, exist_ok=True)
+    cols_meta: List[dict] = []
+    for i, col in enumerate(df.columns):
+        s = df[col]
+        fname = f"c{i:03d}"
+        meta = {"name": str(col), "file": fname}
+
+        if isinstance(s.dtype, pd.CategoricalDtype):
+            codes = s.cat.codes.to_numpy()
+            cats = np.asarray([safe_str(x) for x in s.cat.categories], dtype=str)
+            meta.update({"kind": "category", "ordered": bool(s.cat.ordered)})
+            np.save(os.path.join(out_dir, fname + ".npy"), codes)
+            np.save(os.path.join(out_dir, fname + ".cats.npy"), cats)
+        elif pd.api.types.is_datetime64_any_dtype(s.dtype):
+            arr = s.to_numpy()
+            meta.update({"kind": "datetime", "dtype": str(arr.dtype)})
+            np.save(os.path.join(out_dir, fname + ".npy"), arr.view("i8"))
+        elif _is_text_column(s):
+            codes, uniques = pd.factorize(s, use_na_sentinel=True)
+            cats = np.asarray([safe_str(x) for x in uniques], dtype=str)
+            meta.update({"kind": "text"})
+            np.save(os.path.join(out_dir, fname + ".npy"), codes.astype(np.int32))
+            np.save(os.path.join(out_dir, fname + ".cats.npy"), cats)
+        else:
+            arr = s.to_numpy()
+            if arr.dtype == object:
+                arr = pd.to_numeric(s, errors="coerce").to_numpy(dtype=float)
+            meta.update({"kind": "numeric", "dtype": str(arr.dtype)})
+            np.save(os.path.join(out_dir, fname + ".npy"), arr)
+        cols_meta.append(meta)
+    return cols_meta
+
+
+def _load_frame(in_dir: str, cols_meta: List[dict], n_rows: int, mmap: bool = False) -> pd.DataFrame:
+    """mmap=True면 숫자/날짜/category 코드 배열을 복사 없이 memory-map으로 사용 (읽기 전용)"""
+    data = {}
+    for meta in cols_meta:
+        path = os.path.join(in_dir, meta["file"] + ".npy")
+        kind = meta.get("kind")
+        arr = np.load(path, mmap_mode="r" if mmap else None, allow_pickle=False)
+        if kind == "category":
+            cats = np.load(os.path.join(in_dir, meta["file"] + ".cats.npy"), allow_pickle=False)
+            dtype = pd.CategoricalDtype(pd.Index(cats.astype(object)), ordered=bool(meta.get("ordered")))
+            data[meta["name"]] = pd.Categorical.from_codes(arr, dtype=dtype)
+        elif kind == "datetime":
+            data[meta["name"]] = arr.view(meta.get("dtype") or "datetime64[ns]")
+        elif kind == "text":
+            cats = np.load(os.path.join(in_dir, meta["file"] + ".cats.npy"), allow_pickle=False)
+            lookup = np.empty(len(cats) + 1, dtype=object)
+            lookup[:-1] = cats.astype(object)
+            lookup[-1] = np.nan
+            data[meta["name"]] = lookup[np.where(arr < 0, len(cats), arr)]
+        else:
+            data[meta["name"]] = arr
+    # copy=False: dict 입력 시 블록 통합(복사)을 하지 않아 컬럼이 원본 배열을 그대로 참조
+    return pd.DataFrame(data, index=pd.RangeIndex(n_rows), copy=False)
+
+
+# ============================================================
+# 게시/조회
+# ============================================================
+def read_current_version(base_dir: Optional[str] = None) -> str:
+    d = base_dir or st.DATA_SNAPSHOT_DIR
+    try:
+        with open(os.path.join(d, CURRENT_FILE), "r", encoding="utf-8") as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+
+def _write_current(version: str, base_dir: str) -> None:
+    tmp = os.path.join(base_dir, f".{CURRENT_FILE}.{os.getpid()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(version)
+    os.replace(tmp, os.path.join(base_dir, CURRENT_FILE))
+
+
+def _prune_old_snapshots(base_dir: str, keep_version: str) -> None:
+    try:
+        entries = []
+        for name in os.listdir(base_dir):
+            p = os.path.join(base_dir, name)
+            if name.startswith(".") or not os.path.isdir(p):
+                continue
+            if name != keep_version:
+                entries.append((os.path.getmtime(p), p))
+        entries.sort(reverse=True)
+        for _, p in entries[max(0, SNAPSHOT_KEEP - 1):]:
+            shutil.rmtree(p, ignore_errors=True)
+    except Exception as e:
+        st.logger.warning("DATA_SNAPSHOT_PRUNE_FAIL err=%s", safe_str(e))
+
+
+def save_snapshot(
+    frames: Dict[str, pd.DataFrame],
+    sources: Dict[str, dict],
+    base_dir: Optional[str] = None,
+    extra: Optional[dict] = None,
+) -> str:
+    """스냅샷 저장 후 CURRENT를 원자적으로 교체. 반환: 버전 키"""
+    d = base_dir or st.DATA_SNAPSHOT_DIR
+    os.makedirs(d, exist_ok=True)
+    version = snapshot_key(sources)
+    final_dir = os.path.join(d, version)
+
+    if not os.path.exists(os.path.join(final_dir, META_FILE)):
+        tmp_dir = os.path.join(d, f".{version}.{os.getpid()}.tmp")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        meta = {
+            "format_version": SNAPSHOT_FORMAT_VERSION,
+            "version": version,
+            "created_ts": time.time(),
+            "sources": sources,
+            "extra": extra or {},
+            "frames": {},
+        }
+        for name, df in frames.items():
+            meta["frames"][name] = {
+                "rows": int(len(df)),
+                "columns": _save_frame(df, os.path.join(tmp_dir, name)),
+            }
+        with open(os.path.join(tmp_dir, META_FILE), "w", encoding="utf-8") as f:
+            json.dump(meta, f, ensure_ascii=False, indent=2)
+        try:
+            os.replace(tmp_dir, final_dir)
+        except OSError:
+            # 다른 워커가 같은 버전을 먼저 게시한 경우
+            shutil.rmtree(tmp_dir, ignore_errors=True)
+
+    _write_current(version, d)
+    _prune_old_snapshots(d, version)
+    return version
+
+
+def load_snapshot(
+    paths: Dict[str, str],
+    base_dir: Optional[str] = None,
+    mmap: bool = False,
+) -> Optional[Tuple[Dict[str, pd.DataFrame], str, dict]]:
+    """CURRENT 스냅샷이 원본 CSV와 일치하면 (frames, version, extra) 반환, 아니면 None"""
+    d = base_dir or st.DATA_SNAPSHOT_DIR
+    version = read_current_version(d)
+    if not version:
+        return None
+
+    snap_dir = os.path.join(d, version)
+    try:
+        with open(os.path.join(snap_dir, META_FILE), "r", encoding="utf-8") as f:
+            meta = json.load(f) or {}
+    except (OSError, ValueError):
+        return None
+
+    if int(meta.get("format_version", -1)) != SNAPSHOT_FORMAT_VERSION:
+        return None
+    if not _sources_match(meta.get("sources") or {}, paths):
+        return None
+
+    frames: Dict[str, pd.DataFrame] = {}
+    for name, fm in (meta.get("frames") or {}).items():
+        frames[name] = _load_frame(os.path.join(snap_dir, name), fm.get("columns") or [], int(fm.get("rows") or 0), mmap=mmap)
+    return frames, version, meta.get("extra") or {}
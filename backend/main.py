@@ -18,11 +18,15 @@ if not hasattr(np, "NaN"):
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.responses import JSONResponse
+from fastapi.concurrency import run_in_threadpool
 
 import state as st
-from api.routes import router as api_router
-from data.loader import init_data_models
-from rag.service import rag_build_or_load_index
+from api.routes import router as api_router, load_ocr_reader, OCR_AVAILABLE
+from core.readiness import set_status, start_background
+from core.utils import safe_str
+from data.loader import init_data_models, reload_data_if_stale
+from rag.service import rag_build_or_load_index, _get_reranker, RERANKER_AVAILABLE
+from rag.embeddings import embedding_backend_requires_key
 
 # ============================================================
 # 앱 생성
@@ -54,6 +58,15 @@ async def log_requests(request: Request, call_next):
         st.logger.exception("UNHANDLED %s %s", request.method, request.url.path)
         raise
 
+# ============================================================
+# 데이터 버전 확인 미들웨어 (다른 워커가 게시한 스냅샷 반영, 주기 제한)
+# ============================================================
+@app.middleware("http")
+async def check_data_version(request: Request, call_next):
+    # 새 스냅샷 로드 + 파생 캐시 재구성은 스레드풀에서 실행 (이벤트 루프의 다른 요청을 막지 않음)
+    await run_in_threadpool(reload_data_if_stale)
+    return await call_next(request)
+
 # ============================================================
 # 전역 예외 핸들러
 # ============================================================
@@ -75,6 +88,50 @@ async def global_exception_handler(request: Request, exc: Exception):
 # ============================================================
 app.include_router(api_router)
 
+# ============================================================
+# 백그라운드 워밍업 (서브시스템별 준비 상태는 /api/ready)
+# ============================================================
+def _warm_rag():
+    rag_build_or_load_index(api_key=st.OPENAI_API_KEY, force_rebuild=False)
+    with st.RAG_LOCK:
+        if not st.RAG_STORE.get("ready"):
+            raise RuntimeError(safe_str(st.RAG_STORE.get("error")) or "RAG 인덱스 준비 실패")
+
+
+def _warm_reranker():
+    if _get_reranker() is None:
+        raise RuntimeError("Reranker 로드 실패")
+
+
+def _warm_ocr():
+    if load_ocr_reader() is None:
+        raise RuntimeError("OCR Reader 로드 실패")
+
+
+def start_warmup():
+    """데이터/모델, RAG 인덱스, Reranker, OCR을 각각 백그라운드에서 로드 (서로 기다리지 않음)"""
+    start_background("data", init_data_models)
+
+    if not st.OPENAI_API_KEY and embedding_backend_requires_key():
+        set_status("rag", "skipped", "no_env_api_key")
+        st.logger.info("RAG_SKIP_STARTUP no_env_api_key docs_dir=%s", st.RAG_DOCS_DIR)
+    elif "rag" in st.WARMUP_SKIP:
+        set_status("rag", "skipped", "WARMUP_SKIP")
+    else:
+        start_background("rag", _warm_rag)
+
+    for name, available, fn in (
+        ("reranker", RERANKER_AVAILABLE, _warm_reranker),
+        ("ocr", OCR_AVAILABLE, _warm_ocr),
+    ):
+        if not available:
+            set_status(name, "skipped", "library_not_installed")
+        elif name in st.WARMUP_SKIP:
+            set_status(name, "skipped", "WARMUP_SKIP")
+        else:
+            start_background(name, fn)
+
+
 # ============================================================
 # Startup 이벤트
 # ============================================================
@@ -84,16 +141,7 @@ def on_startup():
     st.logger.info("BASE_DIR=%s", st.BASE_DIR)
     st.logger.info("LOG_FILE=%s", st.LOG_FILE)
     st.logger.info("PID=%s", os.getpid())
-    try:
-        init_data_models()
-        _k = st.OPENAI_API_KEY
-        if _k:
-            rag_build_or_load_index(api_key=_k, force_rebuild=False)
-        else:
-            st.logger.info("RAG_SKIP_STARTUP no_env_api_key docs_dir=%s", st.RAG_DOCS_DIR)
-    except Exception as e:
-        st.logger.exception("BOOTSTRAP_FAIL: %s", e)
-        raise
+    start_warmup()
 
 # ============================================================
 # 직접 실행
@@ -0,0 +1,173 @@
+"""
+ml/anomaly_scan.py - 전체 가맹점-월 이상 탐지 스캔
+metrics_clean 전 행을 청크 단위로 scaler/IsolationForest에 통과시켜 점수를 한 번만 계산하고,
+(데이터 버전, 모델 버전)이 같으면 캐시된 점수로 월 범위/업종/지역 필터와 페이지 조회만 수행합니다.
+"""
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+
+from core.constants import FEATURE_COLS_ANOMALY, DEFAULT_SCAN_PAGE_SIZE, MAX_SCAN_PAGE_SIZE
+from core.parsers import frame_month_codes, month_code_range
+from core.utils import safe_str
+import state as st
+
+
+class AnomalyScan:
+    """metrics_clean 행 순서의 이상 점수/판정 + 점수 오름차순(이상한 순) 정렬"""
+
+    def __init__(self, frame_id: int, data_version: str, model_version: int,
+                 scores: np.ndarray, labels: np.ndarray, months: np.ndarray):
+        self.frame_id = frame_id
+        self.data_version = data_version
+        self.model_version = model_version
+        self.scores = scores
+        self.labels = labels
+        self.months = months
+        self.order = np.argsort(scores, kind="stable")
+
+    def is_current(self) -> bool:
+        return (
+            self.frame_id == id(st.metrics_clean)
+            and self.data_version == st.DATA_VERSION
+            and self.model_version == st.MODEL_VERSION
+        )
+
+    def __len__(self) -> int:
+        return len(self.scores)
+
+
+def _feature_matrix(df: pd.DataFrame) -> np.ndarray:
+    """(n, F) float64 피처 행렬 (to_numeric_df와 같은 규칙: 숫자 변환 실패/결측은 0)"""
+    x = np.zeros((len(df), len(FEATURE_COLS_ANOMALY)), dtype=float)
+    for j, c in enumerate(FEATURE_COLS_ANOMALY):
+        if c in df.columns:
+            x[:, j] = pd.to_numeric(df[c], errors="coerce").to_numpy(dtype=float)
+    np.nan_to_num(x, copy=False, nan=0.0, posinf=np.inf, neginf=-np.inf)
+    return x
+
+
+def compute_anomaly_scan(chunk_rows: Optional[int] = None) -> AnomalyScan:
+    df = st.metrics_clean
+    data_version, model_version = st.DATA_VERSION, st.MODEL_VERSION
+    n = 0 if df is None else len(df)
+    chunk_rows = max(1, int(chunk_rows or st.ANOMALY_SCAN_CHUNK_ROWS))
+
+    t0 = time.time()
+    x = _feature_matrix(df) if n else np.zeros((0, len(FEATURE_COLS_ANOMALY)), dtype=float)
+    scores = np.empty(n, dtype=float)
+    labels = np.empty(n, dtype=np.int8)
+    for a in range(0, n, chunk_rows):
+        b = min(n, a + chunk_rows)
+        x_scaled = st.scaler.transform(pd.DataFrame(x[a:b], columns=FEATURE_COLS_ANOMALY))
+        # predict()는 decision_function < 0 을 -1로 판정 -> 한 번만 계산
+        scores[a:b] = st.iso_forest.decision_function(x_scaled)
+        labels[a:b] = np.where(scores[a:b] < 0, -1, 1)
+    del x
+
+    months = frame_month_codes(df)
+
+    st.logger.info(
+        "ANOMALY_SCAN_BUILT rows=%s chunk_rows=%s anomalies=%s data_version=%s model_version=%s elapsed=%.3fs",
+        n, chunk_rows, int((labels == -1).sum()), data_version, model_version, time.time() - t0,
+    )
+    return AnomalyScan(id(df), data_version, model_version, scores, labels, months)
+
+
+def get_anomaly_scan(force: bool = False) -> Optional[AnomalyScan]:
+    """버전이 일치하는 스캔 결과 (없거나 오래됐으면 다시 계산해 게시)"""
+    if st.iso_forest is None or st.scaler is None or st.metrics_clean is None:
+        return None
+    scan = st.ANOMALY_SCAN
+    if not force and scan is not None and scan.is_current():
+        return scan
+    with st.ANOMALY_SCAN_LOCK:
+        scan = st.ANOMALY_SCAN
+        if not force and scan is not None and scan.is_current():
+            return scan
+        st.ANOMALY_SCAN = compute_anomaly_scan()
+        return st.ANOMALY_SCAN
+
+
+def _equals_mask(s: pd.Series, value: str) -> np.ndarray:
+    """s.astype(str).str.strip() == value (category는 카테고리 단위로 비교)"""
+    v = safe_str(value).strip()
+    if isinstance(s.dtype, pd.CategoricalDtype):
+        cats = np.asarray([safe_str(c).strip() for c in s.cat.categories], dtype=object)
+        return np.isin(s.cat.codes.to_numpy(), np.flatnonzero(cats == v))
+    return np.asarray([str(x).strip() for x in s.to_numpy()], dtype=object) == v
+
+
+def _cell(df: pd.DataFrame, col: str, rows: np.ndarray) -> List[str]:
+    if col not in df.columns:
+        return [""] * len(rows)
+    return [safe_str(x) for x in df[col].iloc[rows].tolist()]
+
+
+def scan_anomalies(
+    start_month: Optional[str] = None,
+    end_month: Optional[str] = None,
+    industry: Optional[str] = None,
+    region: Optional[str] = None,
+    only_anomalies: bool = True,
+    offset: int = 0,
+    limit: int = DEFAULT_SCAN_PAGE_SIZE,
+) -> dict:
+    """
+    가맹점-월 단위 이상 점수 상위(낮은 점수 순) 페이지.
+    월 범위는 month_code_range 규칙 (범위가 있으면 월 결측 행 제외).
+    """
+    if st.iso_forest is None or st.scaler is None:
+        return {"status": "FAILED", "error": "이상 탐지 모델이 로드되지 않았습니다."}
+    df = st.metrics_clean
+    if df is None or len(df) == 0:
+        return {"status": "FAILED", "error": "metrics 데이터가 없습니다."}
+
+    scan = get_anomaly_scan()
+    if scan is None or len(scan) != len(df):
+        return {"status": "FAILED", "error": "이상 탐지 스캔 결과가 없습니다."}
+
+    in_period = np.ones(len(scan), dtype=bool)
+    month_range = month_code_range(start_month, end_month)
+    if month_range is not None:
+        lo, hi = month_range
+        in_period = (scan.months >= lo) & (scan.months <= hi)
+    mask = in_period.copy()
+    for col, val in (("industry", industry), ("region", region)):
+        if val and col in df.columns:
+            mask &= _equals_mask(df[col], val)
+    if only_anomalies:
+        mask &= scan.labels == -1
+
+    ranked = scan.order[mask[scan.order]]
+    offset = max(0, int(offset))
+    limit = max(1, min(int(limit), MAX_SCAN_PAGE_SIZE))
+    rows = ranked[offset:offset + limit]
+
+    items: List[Dict[str, Any]] = []
+    cols = {c: _cell(df, c, rows) for c in ("merchant_id", "merchant_name", "industry", "region", "txn_month")}
+    for i, r in enumerate(rows.tolist()):
+        items.append({
+            "rank": offset + i + 1,
+            "가맹점ID": cols["merchant_id"][i],
+            "가맹점명": cols["merchant_name"][i],
+            "업종": cols["industry"][i],
+            "지역": cols["region"][i],
+            "월": cols["txn_month"][i],
+            "결과": "이상" if int(scan.labels[r]) == -1 else "정상",
+            "점수": round(float(scan.scores[r]), 4),
+        })
+
+    return {
+        "status": "SUCCESS",
+        "period": {"start": start_month or "", "end": end_month or ""},
+        "filter": {"industry": industry or "", "region": region or "", "only_anomalies": bool(only_anomalies)},
+        "scanned_rows": int(in_period.sum()),
+        "total": int(len(ranked)),
+        "offset": offset,
+        "limit": limit,
+        "has_more": bool(offset + limit < len(ranked)),
+        "results": items,
+    }
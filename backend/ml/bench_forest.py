@@ -0,0 +1,80 @@
+"""
+ml/bench_forest.py - 평탄화 트리 예측 vs sklearn 예측 지연시간 벤치마크
+최신 행 저장소의 가맹점 행을 한 건씩 예측하여 p50/p99 지연시간과 결과 일치 여부를 출력합니다.
+
+실행 (backend 디렉터리에서):
+    python -m ml.bench_forest [반복 횟수]
+"""
+import sys
+import time
+import warnings
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from core.constants import FEATURE_COLS_REG, FEATURE_COLS_CLF
+from ml.forest import get_flat_forest
+import state as st
+
+warnings.filterwarnings("ignore")
+
+
+def _latency(fn: Callable[[np.ndarray], object], rows: np.ndarray, repeat: int) -> Dict[str, float]:
+    """행 단위 호출 지연시간 (ms)"""
+    fn(rows[:1])  # 워밍업
+    times: List[float] = []
+    for _ in range(repeat):
+        for i in range(len(rows)):
+            t0 = time.perf_counter()
+            fn(rows[i:i + 1])
+            times.append((time.perf_counter() - t0) * 1000.0)
+    arr = np.asarray(times)
+    return {
+        "p50": float(np.percentile(arr, 50)),
+        "p99": float(np.percentile(arr, 99)),
+        "mean": float(arr.mean()),
+        "calls": len(arr),
+    }
+
+
+def bench_model(name: str, feature_cols: List[str], rows: np.ndarray, repeat: int) -> None:
+    model = getattr(st, name)
+    forest = get_flat_forest(name)
+    if model is None or forest is None:
+        print(f"[{name}] 모델 없음 또는 평탄화 실패 - 건너뜀")
+        return
+
+    if forest.is_classifier:
+        sk = lambda x: model.predict_proba(pd.DataFrame(x, columns=feature_cols))
+        flat = lambda x: forest.predict_value(x)
+    else:
+        sk = lambda x: model.predict(pd.DataFrame(x, columns=feature_cols))
+        flat = lambda x: forest.predict_value(x)[:, 0]
+
+    diff = float(np.max(np.abs(np.asarray(sk(rows), dtype=float) - flat(rows)))) if len(rows) else 0.0
+    r_sk = _latency(sk, rows, repeat)
+    r_flat = _latency(flat, rows, repeat)
+
+    print(f"\n[{name}] trees={forest.n_trees} nodes={len(forest.feature)} depth={forest.max_depth} rows={len(rows)} max_abs_diff={diff:.3g}")
+    print(f"  {'mode':<10}{'p50(ms)':>10}{'p99(ms)':>10}{'mean(ms)':>10}")
+    for label, r in (("sklearn", r_sk), ("compiled", r_flat)):
+        print(f"  {label:<10}{r['p50']:>10.3f}{r['p99']:>10.3f}{r['mean']:>10.3f}")
+    print(f"  speedup p50 x{r_sk['p50'] / max(r_flat['p50'], 1e-9):.1f}, p99 x{r_sk['p99'] / max(r_flat['p99'], 1e-9):.1f}")
+
+
+def main(repeat: int = 3) -> None:
+    from data.loader import init_data_models
+
+    init_data_models()
+    store = st.LATEST_STORE
+    pos = np.arange(len(store), dtype=np.int64)
+    bench_model("rf_reg", FEATURE_COLS_REG, store.gather(pos, FEATURE_COLS_REG), repeat)
+    bench_model("rf_clf", FEATURE_COLS_CLF, store.gather(pos, FEATURE_COLS_CLF), repeat)
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 3)
@@ -0,0 +1,110 @@
+"""
+ml/features.py - 가맹점별 lag/rolling/diff 피처 (벡터화)
+merchant 정렬 배열 위에서 그룹 경계 오프셋으로 모든 피처를 한 번에 계산합니다.
+학습(ml/train_models.py)과 서빙(data/loader.py)이 같은 구현을 공유합니다.
+"""
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from core.constants import LAG_FEATURE_SPEC
+
+
+def group_offsets(keys: np.ndarray) -> np.ndarray:
+    """정렬된 키 배열의 그룹 시작 오프셋 (마지막 원소는 전체 길이)"""
+    keys = np.asarray(keys)
+    n = len(keys)
+    if n == 0:
+        return np.zeros(1, dtype=np.int64)
+    starts = np.flatnonzero(keys[1:] != keys[:-1]) + 1
+    return np.concatenate(([0], starts, [n])).astype(np.int64)
+
+
+def group_positions(offsets: np.ndarray) -> np.ndarray:
+    """각 행의 그룹 내 위치 (0부터)"""
+    sizes = np.diff(offsets)
+    n = int(offsets[-1])
+    return np.arange(n, dtype=np.int64) - np.repeat(offsets[:-1], sizes)
+
+
+def shift_in_group(values: np.ndarray, pos: np.ndarray, k: int) -> np.ndarray:
+    """그룹 내 k칸 shift (그룹 앞쪽 k개는 NaN)"""
+    out = np.full(len(values), np.nan, dtype=float)
+    if k <= 0:
+        out[:] = values
+        return out
+    if k < len(values):
+        out[k:] = values[:-k]
+    out[pos < k] = np.nan
+    return out
+
+
+def rolling_mean_in_group(values: np.ndarray, pos: np.ndarray, window: int, min_periods: int = 1) -> np.ndarray:
+    """그룹 내 rolling mean (NaN 제외 평균, 유효 개수 < min_periods면 NaN)"""
+    total = np.zeros(len(values), dtype=float)
+    count = np.zeros(len(values), dtype=np.int64)
+    for k in range(int(window)):
+        v = shift_in_group(values, pos, k)
+        ok = ~np.isnan(v)
+        total[ok] += v[ok]
+        count += ok
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out = total / count
+    out[count < int(min_periods)] = np.nan
+    return out
+
+
+def max_lookback(spec: Optional[Dict[str, Dict[str, Any]]] = None) -> int:
+    """피처 계산에 필요한 과거 행 수 (증분 갱신 시 가맹점별 tail 길이)"""
+    spec = LAG_FEATURE_SPEC if spec is None else spec
+    n = 0
+    for cfg in spec.values():
+        for k in list(cfg.get("lags", [])) + list(cfg.get("diffs", [])):
+            n = max(n, int(k))
+        for w in cfg.get("rolling", []):
+            n = max(n, int(w) - 1)
+    return n
+
+
+def add_group_features(
+    df: pd.DataFrame,
+    group_col: str = "merchant_id",
+    spec: Optional[Dict[str, Dict[str, Any]]] = None,
+) -> pd.DataFrame:
+    """
+    spec에 정의된 lag/rolling/diff 피처를 df에 추가합니다.
+    df는 group_col, 시간 순으로 정렬되어 있어야 합니다.
+    """
+    spec = LAG_FEATURE_SPEC if spec is None else spec
+    if df is None or len(df) == 0:
+        for col, cfg in spec.items():
+            prefix = cfg.get("prefix", col)
+            names = [f"{prefix}_lag_{k}" for k in cfg.get("lags", [])]
+            names += [f"{prefix}_rolling_mean_{w}" for w in cfg.get("rolling", [])]
+            names += [f"{prefix}_diff_{k}" for k in cfg.get("diffs", [])]
+            for name in names:
+                df[name] = pd.Series(dtype=float)
+        return df
+
+    keys = df[group_col]
+    # category는 코드로 경계 판정 (행 단위 문자열 배열 생성 없음)
+    keys = keys.cat.codes.to_numpy() if isinstance(keys.dtype, pd.CategoricalDtype) else keys.to_numpy()
+    offsets = group_offsets(keys)
+    pos = group_positions(offsets)
+
+    new_cols: Dict[str, np.ndarray] = {}
+    for col, cfg in spec.items():
+        prefix = cfg.get("prefix", col)
+        values = pd.to_numeric(df[col], errors="coerce").to_numpy(dtype=float)
+
+        for k in cfg.get("lags", []):
+            new_cols[f"{prefix}_lag_{int(k)}"] = shift_in_group(values, pos, int(k))
+        for w in cfg.get("rolling", []):
+            new_cols[f"{prefix}_rolling_mean_{int(w)}"] = rolling_mean_in_group(values, pos, int(w), min_periods=1)
+        for k in cfg.get("diffs", []):
+            new_cols[f"{prefix}_diff_{int(k)}"] = values - shift_in_group(values, pos, int(k))
+
+    for name, arr in new_cols.items():
+        df[name] = arr
+    return df
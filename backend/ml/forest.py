@@ -0,0 +1,263 @@
+"""
+ml/forest.py - 평탄화된 RandomForest 노드 배열 + 경로 기여도(Saabas) 설명
+sklearn 트리들의 feature/threshold/children/value를 하나의 연속 배열로 합치고,
+모든 트리를 동시에 한 단계씩 내려가며 부모→자식 값 변화를 분기 피처에 누적합니다.
+예측 = bias(루트 값 평균) + 피처별 기여도 합 (트리 평균 기준으로 정확히 분해됨)
+"""
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from core.utils import safe_str
+import state as st
+
+# sklearn 트리 리프의 feature 값 (_tree.TREE_UNDEFINED)
+_LEAF = -2
+
+
+class FlatForest:
+    """트리 앙상블의 노드 배열 (노드 인덱스는 전체 트리에서 연속)"""
+
+    def __init__(
+        self,
+        feature: np.ndarray,
+        threshold: np.ndarray,
+        left: np.ndarray,
+        right: np.ndarray,
+        missing_left: np.ndarray,
+        value: np.ndarray,
+        roots: np.ndarray,
+        max_depth: int,
+        n_features: int,
+        classes: Optional[np.ndarray] = None,
+    ):
+        self.feature = feature
+        self.threshold = threshold
+        self.left = left
+        self.right = right
+        self.missing_left = missing_left
+        self.value = value  # (노드, K) - 회귀는 K=1, 분류는 클래스별 확률
+        self.roots = roots
+        self.max_depth = max_depth
+        self.n_features = n_features
+        self.classes = classes
+
+    @property
+    def n_trees(self) -> int:
+        return len(self.roots)
+
+    @property
+    def is_classifier(self) -> bool:
+        return self.classes is not None
+
+    @classmethod
+    def from_sklearn(cls, model: Any) -> "FlatForest":
+        """RandomForestRegressor/Classifier (단일 출력) → FlatForest. 지원하지 않으면 ValueError"""
+        estimators = getattr(model, "estimators_", None)
+        if not estimators:
+            raise ValueError("estimators_가 없는 모델입니다.")
+        classes = getattr(model, "classes_", None)
+        if getattr(model, "n_outputs_", 1) != 1 or (classes is not None and np.ndim(classes) != 1):
+            raise ValueError("다중 출력 모델은 지원하지 않습니다.")
+
+        parts = {k: [] for k in ("feature", "threshold", "left", "right", "missing_left", "value")}
+        roots = []
+        offset = 0
+        max_depth = 0
+        for est in estimators:
+            t = est.tree_
+            n = int(t.node_count)
+            leaf = t.children_left < 0
+            roots.append(offset)
+            parts["feature"].append(np.where(leaf, _LEAF, t.feature).astype(np.int32))
+            parts["threshold"].append(t.threshold.astype(np.float64))
+            # 리프는 자기 자신을 가리키게 하여 순회 중 제자리에 머무름
+            parts["left"].append(np.where(leaf, np.arange(n), t.children_left).astype(np.int64) + offset)
+            parts["right"].append(np.where(leaf, np.arange(n), t.children_right).astype(np.int64) + offset)
+            ml = getattr(t, "missing_go_to_left", None)
+            parts["missing_left"].append(np.zeros(n, dtype=bool) if ml is None else np.asarray(ml, dtype=bool))
+
+            v = np.asarray(t.value, dtype=np.float64)[:, 0, :]
+            if classes is not None:
+                # predict_proba와 같은 정규화 (노드별 클래스 비율)
+                norm = v.sum(axis=1, keepdims=True)
+                norm[norm == 0.0] = 1.0
+                v = v / norm
+                if v.shape[1] != len(classes):
+                    raise ValueError("트리 클래스 수가 모델과 다릅니다.")
+            parts["value"].append(v)
+            max_depth = max(max_depth, int(t.max_depth))
+            offset += n
+
+        return cls(
+            feature=np.concatenate(parts["feature"]),
+            threshold=np.concatenate(parts["threshold"]),
+            left=np.concatenate(parts["left"]),
+            right=np.concatenate(parts["right"]),
+            missing_left=np.concatenate(parts["missing_left"]),
+            value=np.concatenate(parts["value"]),
+            roots=np.asarray(roots, dtype=np.int64),
+            max_depth=max_depth,
+            n_features=int(getattr(model, "n_features_in_", 0) or 0),
+            classes=None if classes is None else np.asarray(classes),
+        )
+
+    # ------------------------------------------------------------
+    # 순회
+    # ------------------------------------------------------------
+    def _input(self, X: Any) -> np.ndarray:
+        """sklearn 트리와 같은 비교를 위해 float32로 변환 후 float64로 보관"""
+        x = np.asarray(X, dtype=np.float32)
+        if x.ndim == 1:
+            x = x.reshape(1, -1)
+        if self.n_features and x.shape[1] != self.n_features:
+            raise ValueError(f"피처 수 불일치: {x.shape[1]} != {self.n_features}")
+        return x.astype(np.float64)
+
+    def _walk(self, x: np.ndarray, contrib: Optional[np.ndarray] = None) -> np.ndarray:
+        """(n, T) 리프 노드. contrib (n, F, K)가 주어지면 경로 기여도를 누적"""
+        n = len(x)
+        node = np.broadcast_to(self.roots, (n, self.n_trees)).copy()
+        rows = np.broadcast_to(np.arange(n)[:, None], node.shape)
+        for _ in range(self.max_depth):
+            f = self.feature[node]
+            active = f != _LEAF
+            if not active.any():
+                break
+            fi = np.maximum(f, 0)
+            xv = x[rows, fi]
+            go_left = np.where(np.isnan(xv), self.missing_left[node], xv <= self.threshold[node])
+            child = np.where(go_left, self.left[node], self.right[node])
+            if contrib is not None:
+                r, t = np.nonzero(active)
+                delta = self.value[child[r, t]] - self.value[node[r, t]]
+                np.add.at(contrib, (r, fi[r, t]), delta)
+            node = child
+        return node
+
+    def _leaf_mean(self, leaves: np.ndarray) -> np.ndarray:
+        """
+        (n, K) 리프 값의 트리 평균. 트리 순서대로 (n, K) 버퍼에 누적 후 나눔 ((n, T, K) 중간 배열 없음).
+        회귀는 sklearn predict와 비트 단위 동일, 분류 확률은 sklearn이 트리별 정규화/스레드 순서로
+        누적하므로 ~1e-16 수준 반올림 차이가 날 수 있음
+        """
+        out = np.zeros((leaves.shape[0], self.value.shape[1]), dtype=np.float64)
+        for t in range(self.n_trees):
+            out += self.value[leaves[:, t]]
+        out /= self.n_trees
+        return out
+
+    def predict_value(self, X: Any) -> np.ndarray:
+        """(n, K) 트리 평균"""
+        return self._leaf_mean(self._walk(self._input(X)))
+
+    def contributions(self, X: Any) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        (bias (K,), contrib (n, F, K), pred (n, K)).
+        pred = bias + contrib.sum(axis=1) (부동소수 오차 범위 내)
+        """
+        x = self._input(X)
+        n_feat = x.shape[1]
+        contrib = np.zeros((len(x), n_feat, self.value.shape[1]), dtype=np.float64)
+        leaves = self._walk(x, contrib)
+        contrib /= self.n_trees
+        bias = self.value[self.roots].mean(axis=0)
+        pred = self._leaf_mean(leaves)
+        return bias, contrib, pred
+
+
+# ============================================================
+# 모델별 캐시
+# ============================================================
+def get_flat_forest(name: str) -> Optional[FlatForest]:
+    """st.<name> 모델의 FlatForest (MODEL_VERSION별 1회 평탄화, 실패 시 None)"""
+    cached = st.FLAT_FORESTS
+    if cached is None or cached[0] != st.MODEL_VERSION:
+        cached = (st.MODEL_VERSION, {})
+        st.FLAT_FORESTS = cached
+    forests: Dict[str, Optional[FlatForest]] = cached[1]
+    if name not in forests:
+        model = getattr(st, name, None)
+        try:
+            forests[name] = FlatForest.from_sklearn(model) if model is not None else None
+            if forests[name] is not None:
+                st.logger.info(
+                    "FLAT_FOREST_READY model=%s trees=%s nodes=%s depth=%s",
+                    name, forests[name].n_trees, len(forests[name].feature), forests[name].max_depth,
+                )
+        except Exception as e:
+            st.logger.warning("FLAT_FOREST_FAIL model=%s err=%s", name, safe_str(e))
+            forests[name] = None
+    return forests[name]
+
+
+def prepare_flat_forests() -> None:
+    """모델 로드 직후 호출 - 요청 경로에서 평탄화 비용이 발생하지 않도록 미리 변환"""
+    if not st.FOREST_COMPILED:
+        return
+    for name in ("rf_reg", "rf_clf"):
+        get_flat_forest(name)
+
+
+def _compiled(name: str) -> Optional[FlatForest]:
+    return get_flat_forest(name) if st.FOREST_COMPILED else None
+
+
+def _as_matrix(X: Any, feature_cols: List[str]) -> np.ndarray:
+    if isinstance(X, pd.DataFrame):
+        return X[feature_cols].to_numpy(dtype=float)
+    return np.asarray(X, dtype=float).reshape(-1, len(feature_cols))
+
+
+def _as_frame(X: Any, feature_cols: List[str]) -> pd.DataFrame:
+    return X if isinstance(X, pd.DataFrame) else pd.DataFrame(_as_matrix(X, feature_cols), columns=list(feature_cols))
+
+
+def predict_regression(name: str, X: Any, feature_cols: List[str]) -> np.ndarray:
+    """(n,) 회귀 예측 - 평탄화 배열 순회 우선, 실패 시 sklearn predict"""
+    forest = _compiled(name)
+    if forest is not None and not forest.is_classifier:
+        try:
+            return forest.predict_value(_as_matrix(X, feature_cols))[:, 0]
+        except Exception as e:
+            st.logger.warning("FLAT_FOREST_PREDICT_FAIL model=%s err=%s", name, safe_str(e))
+    return np.asarray(getattr(st, name).predict(_as_frame(X, feature_cols)), dtype=float)
+
+
+def predict_classes(name: str, X: Any, feature_cols: List[str]) -> Tuple[np.ndarray, np.ndarray]:
+    """((n,) 예측 클래스, (n, K) 클래스 확률) - predict/predict_proba를 한 번의 순회로 계산 (확률은 sklearn과 부동소수 반올림 범위 내 일치)"""
+    forest = _compiled(name)
+    if forest is not None and forest.is_classifier:
+        try:
+            proba = forest.predict_value(_as_matrix(X, feature_cols))
+            return forest.classes.take(np.argmax(proba, axis=1)), proba
+        except Exception as e:
+            st.logger.warning("FLAT_FOREST_PREDICT_FAIL model=%s err=%s", name, safe_str(e))
+    model = getattr(st, name)
+    proba = np.asarray(model.predict_proba(_as_frame(X, feature_cols)), dtype=float)
+    return model.classes_.take(np.argmax(proba, axis=1)), proba
+
+
+def merchant_contributions(name: str, merchant_id: str, x_row: np.ndarray) -> Optional[Dict[str, np.ndarray]]:
+    """
+    가맹점 1행의 기여도 분해 (가맹점, 입력 행 값)별 캐시, DATA_VERSION/MODEL_VERSION이 바뀌면 비움.
+    행 값을 키에 포함하므로 재로드 중 이전 최신 행으로 계산한 결과가 새 버전에서 재사용되지 않습니다.
+    반환: {"bias": (K,), "contrib": (F, K), "pred": (K,)} / 평탄화 불가 시 None
+    """
+    forest = get_flat_forest(name)
+    if forest is None:
+        return None
+    versions = (st.DATA_VERSION, st.MODEL_VERSION)
+    cache = st.CONTRIB_CACHE
+    if cache is None or cache[0] != versions:
+        cache = (versions, {})
+        st.CONTRIB_CACHE = cache
+    x = forest._input(x_row)
+    key = (name, safe_str(merchant_id).strip(), x.tobytes())
+    hit = cache[1].get(key)
+    if hit is None:
+        bias, contrib, pred = forest.contributions(x)
+        hit = {"bias": bias, "contrib": contrib[0], "pred": pred[0]}
+        cache[1][key] = hit
+    return hit
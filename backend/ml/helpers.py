@@ -51,3 +51,28 @@ def topk_importance(
         )
     rows.sort(key=lambda r: r["importance"], reverse=True)
     return rows[: int(top_k)]
+
+
+def contribution_factors(
+    feature_cols: List[str], values: np.ndarray, contrib: np.ndarray, top_k: int, label_map: Dict[str, str]
+) -> List[dict]:
+    """가맹점별 피처 기여도 상위 k개 (|기여도| 순, 부호는 예측을 올리면 +)"""
+    vals = np.array(values, dtype=float).reshape(-1)
+    c = np.array(contrib, dtype=float).reshape(-1)
+    mag = np.abs(c)
+    norm = normalize_importance(mag)
+    rows = []
+    for i, f in enumerate(feature_cols):
+        rows.append(
+            {
+                "feature": f,
+                "feature_label": label_map.get(f, f),
+                "value": float(vals[i]),
+                "contribution": float(c[i]),
+                "direction": "+" if c[i] > 0 else ("-" if c[i] < 0 else "0"),
+                "importance": float(mag[i]),
+                "importance_pct": round(float(norm[i]) * 100, 4),
+            }
+        )
+    rows.sort(key=lambda r: r["importance"], reverse=True)
+    return rows[: int(top_k)]
@@ -0,0 +1,342 @@
+"""
+ml/sar_serving.py - SAR 추천 서빙 (요청 경로에서 recommenders 미사용)
+model_reco.pkl(SARSingleNode)의 사용자 친화도(희소)·아이템 유사도·ID 매핑을 한 번 추출해 .npz로 캐시하고,
+요청마다 희소 행 × 유사도 행렬 곱 + argpartition으로 상위 K를 고릅니다.
+점수/순서/본 아이템 제외 규칙은 recommend_k_items / get_item_based_topk와 같으므로
+_normalize_reco_output 결과가 기존과 동일합니다.
+캐시는 model_reco.pkl 지문이 같을 때만 사용 → recommenders가 없는 서버에서도 추천 가능
+"""
+import os
+import json
+import importlib.util
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from scipy import sparse
+
+from core.constants import RECO_COL_USER, RECO_COL_ITEM, SAR_NEIGHBOR_K
+from core.utils import safe_str
+from data.snapshot import _sources_match, source_fingerprint
+import state as st
+
+# 추출 규칙이 바뀌면 올려서 기존 캐시를 무효화
+SAR_CACHE_FORMAT_VERSION = 1
+SAR_PREDICTION_COL = "prediction"
+
+
+def sar_package_available() -> bool:
+    """recommenders 설치 여부 (import 없이 확인)"""
+    try:
+        return importlib.util.find_spec("recommenders") is not None
+    except Exception:
+        return False
+
+
+def _id_array(ids: list) -> np.ndarray:
+    arr = np.asarray(ids)
+    return arr.astype(str) if arr.dtype == object else arr
+
+
+def _top_k_rows(scores: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """(m, n) 점수 → 행별 상위 K (아이템, 점수). recommenders get_top_k_scored_items와 같은 argpartition + argsort"""
+    top_k = min(int(top_k), scores.shape[1])
+    rows = np.arange(scores.shape[0])[:, None]
+    top_items = np.argpartition(scores, -top_k, axis=1)[:, -top_k:]
+    top_scores = scores[rows, top_items]
+    sort_ind = np.argsort(-top_scores)
+    return top_items[rows, sort_ind], top_scores[rows, sort_ind]
+
+
+def _ranked_top_k(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """(m, n) 점수 → 행별 상위 k, 점수 내림차순 + 동점은 아이템 인덱스 순 (결정적 순서)"""
+    m = scores.shape[0]
+    if k <= 0:
+        return np.zeros((m, 0), dtype=np.int64), np.zeros((m, 0), dtype=float)
+    neg = -scores
+    kth = np.partition(neg, k - 1, axis=1)[:, k - 1:k]
+    strict = neg < kth
+    tie = neg == kth
+    # 경계 동점은 앞쪽 인덱스부터 필요한 개수만 선택 -> 행마다 정확히 k개
+    need = k - strict.sum(axis=1, keepdims=True)
+    pick = strict | (tie & (np.cumsum(tie, axis=1) <= need))
+    cols = np.nonzero(pick)[1].reshape(m, k)
+    vals = np.take_along_axis(scores, cols, axis=1)
+    order = np.lexsort((cols, -vals))
+    return np.take_along_axis(cols, order, axis=1), np.take_along_axis(vals, order, axis=1)
+
+
+class SarScorer:
+    """SAR 행렬 (사용자 × 아이템 친화도 CSR, 아이템 × 아이템 유사도) + 인덱스 ↔ ID"""
+
+    def __init__(self, user_affinity: sparse.csr_matrix, item_similarity: Any, user_ids: np.ndarray, item_ids: np.ndarray):
+        self.user_affinity = user_affinity
+        self.item_similarity = item_similarity  # ndarray 또는 CSR (모델과 같은 형식 유지)
+        self.user_ids = user_ids
+        self.item_ids = item_ids
+        self.user2index: Dict[Any, int] = {u: i for i, u in enumerate(user_ids.tolist())}
+        self.item2index: Dict[Any, int] = {m: i for i, m in enumerate(item_ids.tolist())}
+        # 아이템별 유사 아이템 상위 K (build_neighbors)
+        self.neighbors = np.zeros((len(item_ids), 0), dtype=np.int64)
+        self.neighbor_scores = np.zeros((len(item_ids), 0), dtype=float)
+        self.neighbor_counts = np.zeros(len(item_ids), dtype=np.int64)
+
+    @property
+    def n_items(self) -> int:
+        return len(self.item_ids)
+
+    def has_user(self, user_id: Any) -> bool:
+        return user_id in self.user2index
+
+    # ------------------------------------------------------------
+    # 추출 / 캐시
+    # ------------------------------------------------------------
+    @classmethod
+    def from_model(cls, model: Any) -> "SarScorer":
+        """SARSingleNode → SarScorer. normalize=True 모델(점수 재스케일)은 지원하지 않아 ValueError"""
+        if getattr(model, "normalize", False):
+            raise ValueError("normalize=True SAR 모델은 지원하지 않습니다.")
+        ua = getattr(model, "user_affinity", None)
+        sim = getattr(model, "item_similarity", None)
+        user2index = getattr(model, "user2index", None)
+        index2item = getattr(model, "index2item", None)
+        if ua is None or sim is None or not isinstance(user2index, dict) or not isinstance(index2item, dict):
+            raise ValueError("SAR 행렬/ID 매핑이 없는 모델입니다.")
+
+        users = [None] * len(user2index)
+        for u, i in user2index.items():
+            users[int(i)] = u
+        items = [index2item[i] for i in range(len(index2item))]
+        sim = sim.tocsr() if sparse.issparse(sim) else np.asarray(sim)
+        return cls(sparse.csr_matrix(ua), sim, _id_array(users), _id_array(items))
+
+    def save(self, path: str, sources: Dict[str, dict]) -> None:
+        """.npz 원자적 저장 (meta에 원본 pkl 지문)"""
+        arrays = {
+            "ua_data": self.user_affinity.data, "ua_indices": self.user_affinity.indices,
+            "ua_indptr": self.user_affinity.indptr, "ua_shape": np.asarray(self.user_affinity.shape),
+            "user_ids": self.user_ids, "item_ids": self.item_ids,
+        }
+        if sparse.issparse(self.item_similarity):
+            arrays.update({
+                "sim_data": self.item_similarity.data, "sim_indices": self.item_similarity.indices,
+                "sim_indptr": self.item_similarity.indptr, "sim_shape": np.asarray(self.item_similarity.shape),
+            })
+        else:
+            arrays["sim"] = self.item_similarity
+        meta = {"format": SAR_CACHE_FORMAT_VERSION, "sources": sources}
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.{os.getpid()}.tmp.npz"
+        try:
+            np.savez(tmp, meta=np.asarray(json.dumps(meta)), **arrays)
+            os.replace(tmp, path)
+        finally:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+
+    @classmethod
+    def load(cls, path: str, source_paths: Dict[str, str]) -> Optional["SarScorer"]:
+        """원본 지문이 일치하는 캐시만 로드 (없거나 불일치면 None)"""
+        if not os.path.exists(path):
+            return None
+        with np.load(path, allow_pickle=False) as z:
+            meta = json.loads(str(z["meta"]))
+            if meta.get("format") != SAR_CACHE_FORMAT_VERSION or not _sources_match(meta.get("sources"), source_paths):
+                return None
+            ua = sparse.csr_matrix((z["ua_data"], z["ua_indices"], z["ua_indptr"]), shape=tuple(z["ua_shape"]))
+            if "sim" in z.files:
+                sim = z["sim"]
+            else:
+                sim = sparse.csr_matrix((z["sim_data"], z["sim_indices"], z["sim_indptr"]), shape=tuple(z["sim_shape"]))
+            return cls(ua, sim, z["user_ids"], z["item_ids"])
+
+    # ------------------------------------------------------------
+    # 점수
+    # ------------------------------------------------------------
+    def _dense(self, scores: Any) -> np.ndarray:
+        return scores.toarray() if sparse.issparse(scores) else np.asarray(scores)
+
+    def _top_k(self, scores: np.ndarray, top_k: int) -> pd.DataFrame:
+        """(1, n) 점수 → 상위 K (argpartition 후 내림차순), 제외된(-inf/NaN) 아이템은 버림"""
+        top_items, top_scores = _top_k_rows(scores, top_k)
+        top_items, top_scores = top_items.ravel(), top_scores.ravel()
+        keep = ~(np.isneginf(top_scores) | np.isnan(top_scores))
+        return pd.DataFrame({
+            RECO_COL_ITEM: self.item_ids[top_items[keep]].tolist(),
+            SAR_PREDICTION_COL: top_scores[keep],
+        })
+
+    def _user_scores(self, user_rows: np.ndarray, remove_seen: bool) -> np.ndarray:
+        """(m, n) 사용자 행 점수 (remove_seen이면 친화도가 있는 아이템에 친화도 × -inf)"""
+        rows = self.user_affinity[user_rows, :]
+        scores = np.array(self._dense(rows.dot(self.item_similarity)), dtype=float)
+        if remove_seen and rows.nnz:
+            seen = rows.tocoo()
+            scores[seen.row, seen.col] += seen.data * -np.inf
+        return scores
+
+    def recommend_k_items(self, user_id: Any, top_k: int, remove_seen: bool = True) -> pd.DataFrame:
+        """사용자 친화도 행 × 유사도 (remove_seen이면 친화도가 있는 아이템 제외)"""
+        u = self.user2index.get(user_id)
+        if u is None:
+            raise ValueError("SAR cannot score users that are not in the training set")
+        return self._top_k(self._user_scores(np.asarray([u]), remove_seen), top_k)
+
+    def recommend_batch(
+        self, user_rows: np.ndarray, top_k: int, remove_seen: bool = True, chunk_users: int = 2048
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        (m, K) 아이템 인덱스/점수 - 사용자 청크마다 희소 행렬 × 유사도 1회.
+        행별 결과는 recommend_k_items와 같고, 제외된 아이템은 점수 -inf/NaN으로 남습니다.
+        """
+        user_rows = np.asarray(user_rows, dtype=np.int64)
+        k = min(int(top_k), self.n_items)
+        items = np.zeros((len(user_rows), k), dtype=np.int64)
+        scores = np.zeros((len(user_rows), k), dtype=float)
+        chunk_users = max(1, int(chunk_users))
+        for a in range(0, len(user_rows), chunk_users):
+            b = min(len(user_rows), a + chunk_users)
+            items[a:b], scores[a:b] = _top_k_rows(self._user_scores(user_rows[a:b], remove_seen), k)
+        return items, scores
+
+    def get_item_based_topk(self, item_id: Any, top_k: int) -> pd.DataFrame:
+        """시드 아이템 유사도 행 (시드 자신은 제외). 학습에 없는 아이템이면 ValueError (SARSingleNode와 동일)"""
+        i = self.item2index.get(item_id)
+        if i is None:
+            raise ValueError(f"학습 데이터에 없는 아이템입니다: {item_id}")
+        seed = sparse.csr_matrix((np.ones(1), (np.zeros(1, dtype=np.int64), np.asarray([i]))), shape=(1, self.n_items))
+        scores = self._dense(seed.dot(self.item_similarity)).astype(float, copy=True)
+        scores[seed.nonzero()] = -np.inf
+        return self._top_k(scores, top_k)
+
+    def build_neighbors(self, k: int, chunk_rows: int = 1024) -> None:
+        """
+        아이템별 유사 아이템 상위 k 테이블 (시드 자신/NaN 제외, 점수 내림차순, 동점은 아이템 인덱스 순).
+        유사도 행렬은 모델이 바뀔 때만 바뀌므로 모델 로드 시 한 번 계산합니다.
+        """
+        n = self.n_items
+        k = max(0, min(int(k), n))
+        nbr = np.zeros((n, k), dtype=np.int64)
+        nbr_scores = np.zeros((n, k), dtype=float)
+        for a in range(0, n, max(1, int(chunk_rows))):
+            b = min(n, a + max(1, int(chunk_rows)))
+            s = np.array(self._dense(self.item_similarity[a:b]), dtype=float)
+            s[np.isnan(s)] = -np.inf
+            s[np.arange(b - a), np.arange(a, b)] = -np.inf
+            nbr[a:b], nbr_scores[a:b] = _ranked_top_k(s, k)
+        self.neighbors = nbr
+        self.neighbor_scores = nbr_scores
+        self.neighbor_counts = (~np.isneginf(nbr_scores)).sum(axis=1)
+
+    def neighbor_topk(self, item_id: Any, top_k: int) -> Optional[pd.DataFrame]:
+        """테이블에서 상위 top_k (학습에 없는 아이템이거나 top_k가 테이블 K보다 크면 None, K = 전체 아이템 수면 항상 조회)"""
+        i = self.item2index.get(item_id)
+        width = self.neighbors.shape[1]
+        if i is None or (top_k > width and width < self.n_items):
+            return None
+        n = min(int(top_k), int(self.neighbor_counts[i]))
+        return pd.DataFrame({
+            RECO_COL_ITEM: self.item_ids[self.neighbors[i, :n]].tolist(),
+            SAR_PREDICTION_COL: self.neighbor_scores[i, :n],
+        })
+
+
+# ============================================================
+# 로드 / 조회
+# ============================================================
+def _reco_paths() -> Dict[str, str]:
+    return {"reco": os.path.join(st.BASE_DIR, "model_reco.pkl")}
+
+
+def prepare_sar_scorer(model: Any = None) -> Optional[SarScorer]:
+    """
+    모델 로드 직후 호출.
+    - 모델이 있으면 행렬을 추출하고, 캐시가 오래됐으면 .npz로 저장
+    - 모델이 없으면(recommenders 미설치 등) pkl 지문이 같은 캐시를 로드
+    """
+    if not st.SAR_NATIVE:
+        return None
+    paths = _reco_paths()
+    if not os.path.exists(paths["reco"]):
+        return None
+    cache_path = st.SAR_SERVING_CACHE
+    try:
+        scorer = SarScorer.load(cache_path, paths)
+        if scorer is None and model is not None:
+            scorer = SarScorer.from_model(model)
+            try:
+                scorer.save(cache_path, source_fingerprint(paths))
+            except Exception as e:
+                st.logger.warning("SAR_SERVING_CACHE_SAVE_FAIL path=%s err=%s", cache_path, safe_str(e))
+        if scorer is not None:
+            scorer.build_neighbors(SAR_NEIGHBOR_K)
+            st.logger.info(
+                "SAR_SERVING_READY users=%s items=%s nnz=%s sim=%s neighbors_k=%s",
+                len(scorer.user_ids), scorer.n_items, scorer.user_affinity.nnz,
+                "sparse" if sparse.issparse(scorer.item_similarity) else "dense", scorer.neighbors.shape[1],
+            )
+        return scorer
+    except Exception as e:
+        st.logger.warning("SAR_SERVING_PREPARE_FAIL err=%s", safe_str(e))
+        return None
+
+
+def get_sar_scorer() -> Optional[SarScorer]:
+    return st.SAR_SCORER if st.SAR_NATIVE else None
+
+
+def reco_ready() -> bool:
+    return get_sar_scorer() is not None or st.sar_model is not None
+
+
+def recommend_for_user(user_id: str, top_k: int) -> pd.DataFrame:
+    """네이티브 점수 우선, 없으면 SARSingleNode.recommend_k_items"""
+    scorer = get_sar_scorer()
+    if scorer is not None:
+        return scorer.recommend_k_items(user_id, top_k=top_k, remove_seen=True)
+    user_df = pd.DataFrame({RECO_COL_USER: [user_id]})
+    return st.sar_model.recommend_k_items(user_df, top_k=top_k, sort_top_k=True, remove_seen=True)
+
+
+def similar_items(item_id: str, top_k: int) -> pd.DataFrame:
+    """유사 아이템 테이블 우선 (K 초과/미등록 아이템은 행렬 계산, 네이티브 비활성 시 SARSingleNode)"""
+    scorer = get_sar_scorer()
+    if scorer is not None:
+        table = scorer.neighbor_topk(item_id, top_k)
+        return table if table is not None else scorer.get_item_based_topk(item_id, top_k=top_k)
+    seed_df = pd.DataFrame({RECO_COL_ITEM: [item_id]})
+    return st.sar_model.get_item_based_topk(seed_df, top_k=top_k, sort_top_k=True)
+
+
+def recommend_for_users(user_ids: List[str], top_k: int) -> pd.DataFrame:
+    """
+    여러 사용자(학습된 사용자만) 추천 (customer_id, merchant_id, prediction) - 사용자 순서 + 점수 내림차순.
+    네이티브는 SAR_BATCH_CHUNK_USERS명씩 희소 행렬 곱 1회, 아니면 사용자별 recommend_k_items
+    """
+    scorer = get_sar_scorer()
+    if scorer is None:
+        frames = [recommend_for_user(u, top_k).assign(**{RECO_COL_USER: u}) for u in user_ids]
+        if not frames:
+            return pd.DataFrame(columns=[RECO_COL_USER, RECO_COL_ITEM, SAR_PREDICTION_COL])
+        return pd.concat(frames, ignore_index=True)[[RECO_COL_USER, RECO_COL_ITEM, SAR_PREDICTION_COL]]
+
+    rows = np.asarray([scorer.user2index[u] for u in user_ids], dtype=np.int64)
+    items, scores = scorer.recommend_batch(rows, top_k, remove_seen=True, chunk_users=st.SAR_BATCH_CHUNK_USERS)
+    flat = scores.ravel()
+    keep = ~(np.isneginf(flat) | np.isnan(flat))
+    return pd.DataFrame({
+        RECO_COL_USER: np.repeat(np.asarray(user_ids, dtype=object), items.shape[1])[keep],
+        RECO_COL_ITEM: scorer.item_ids[items.ravel()[keep]].tolist(),
+        SAR_PREDICTION_COL: flat[keep],
+    })
+
+
+def has_user(user_id: str) -> bool:
+    scorer = get_sar_scorer()
+    if scorer is not None:
+        return scorer.has_user(user_id)
+    try:
+        user_map = getattr(st.sar_model, "user2index", None)
+        return isinstance(user_map, dict) and user_id in user_map
+    except Exception:
+        return False
@@ -0,0 +1,114 @@
+"""
+ml/scores.py - 가맹점별 최신 월 점수 테이블
+매출 예측/변화율, 이상 점수/판정, 성장 유형/신뢰도는 (데이터 버전, 모델 버전)에만 의존하므로
+최신 행 저장소 전체를 한 번에 예측해 두고 도구는 O(1)로 조회합니다.
+DATA_VERSION 또는 MODEL_VERSION이 바뀌면 다음 조회 시 다시 계산합니다.
+"""
+import time
+from typing import Any, Dict, Optional
+
+import numpy as np
+
+from core.constants import FEATURE_COLS_REG, FEATURE_COLS_ANOMALY, FEATURE_COLS_CLF
+from core.utils import safe_str
+from ml.forest import predict_classes, predict_regression
+import state as st
+
+
+class ScoreTable:
+    """최신 행 저장소와 같은 행 순서의 점수 컬럼"""
+
+    def __init__(self, store: Any, data_version: str, model_version: int, columns: Dict[str, np.ndarray]):
+        self.store = store
+        self.data_version = data_version
+        self.model_version = model_version
+        self.columns = columns
+
+    def is_current(self) -> bool:
+        return (
+            self.store is st.LATEST_STORE
+            and self.data_version == st.DATA_VERSION
+            and self.model_version == st.MODEL_VERSION
+        )
+
+    def has(self, *cols: str) -> bool:
+        return all(c in self.columns for c in cols)
+
+    def row(self, merchant_id: str) -> Optional[Dict[str, Any]]:
+        pos = self.store.position(merchant_id) if self.store is not None else None
+        if pos is None:
+            return None
+        return {c: arr[pos] for c, arr in self.columns.items()}
+
+    def take(self, positions: np.ndarray, col: str) -> np.ndarray:
+        return self.columns[col][positions]
+
+
+def bump_model_version() -> int:
+    """모델 교체 시 호출 (점수 테이블 무효화)"""
+    st.MODEL_VERSION += 1
+    return st.MODEL_VERSION
+
+
+def compute_score_table() -> ScoreTable:
+    """최신 행 전체를 모델별 predict 1회로 점수화 (로드되지 않은 모델의 컬럼은 생략, RF는 평탄화 배열 순회)"""
+    store = st.LATEST_STORE
+    data_version, model_version = st.DATA_VERSION, st.MODEL_VERSION
+    cols: Dict[str, np.ndarray] = {}
+    if not store:
+        return ScoreTable(store, data_version, model_version, cols)
+
+    t0 = time.time()
+    pos = np.arange(len(store), dtype=np.int64)
+
+    if st.rf_reg is not None:
+        pred = predict_regression("rf_reg", store.gather(pos, FEATURE_COLS_REG), FEATURE_COLS_REG)
+        cur = store.numeric_column("total_revenue")
+        cur = np.where(np.isfinite(cur), cur, 0.0)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            change = np.where(cur != 0, (pred - cur) / np.where(cur != 0, cur, 1.0) * 100, 0.0)
+        cols["revenue_current"] = cur
+        cols["revenue_pred"] = pred
+        cols["revenue_change_pct"] = change
+
+    if st.iso_forest is not None and st.scaler is not None:
+        x_scaled = st.scaler.transform(store.feature_frame(pos, FEATURE_COLS_ANOMALY))
+        cols["anomaly_label"] = np.asarray(st.iso_forest.predict(x_scaled)).astype(int)
+        cols["anomaly_score"] = np.asarray(st.iso_forest.decision_function(x_scaled), dtype=float)
+
+    if st.rf_clf is not None and st.le_growth is not None:
+        pred_cls, proba = predict_classes("rf_clf", store.gather(pos, FEATURE_COLS_CLF), FEATURE_COLS_CLF)
+        cols["growth_class"] = np.asarray([safe_str(x) for x in st.le_growth.inverse_transform(pred_cls)], dtype=object)
+        cols["growth_confidence"] = np.asarray(proba, dtype=float).max(axis=1)
+
+    st.logger.info(
+        "SCORE_TABLE_BUILT merchants=%s cols=%s data_version=%s model_version=%s elapsed=%.3fs",
+        len(store), len(cols), data_version, model_version, time.time() - t0,
+    )
+    return ScoreTable(store, data_version, model_version, cols)
+
+
+def get_score_table(force: bool = False) -> Optional[ScoreTable]:
+    """
+    버전이 일치하는 점수 테이블 (버전이 바뀌었거나 force면 다시 계산해 게시).
+    계산 실패 시 컬럼 없는 테이블 -> 도구는 단건 계산으로 폴백
+    """
+    table = st.SCORE_TABLE
+    if not force and table is not None and table.is_current():
+        return table
+    with st.SCORE_LOCK:
+        table = st.SCORE_TABLE
+        if not force and table is not None and table.is_current():
+            return table
+        try:
+            st.SCORE_TABLE = compute_score_table()
+        except Exception as e:
+            # 같은 버전에서 재시도하지 않도록 빈 테이블 게시
+            st.logger.warning("SCORE_TABLE_BUILD_FAIL err=%s", safe_str(e))
+            st.SCORE_TABLE = ScoreTable(st.LATEST_STORE, st.DATA_VERSION, st.MODEL_VERSION, {})
+        return st.SCORE_TABLE
+
+
+def lookup_scores(merchant_id: str) -> Optional[Dict[str, Any]]:
+    table = get_score_table()
+    return table.row(merchant_id) if table is not None else None
@@ -1,4 +1,5 @@
 import os
+import sys
 from pathlib import Path
 from datetime import datetime, timedelta
 
@@ -20,6 +21,11 @@ from sklearn.metrics import (
 import joblib
 import warnings
 
+# 서빙과 같은 피처 구현 사용 (backend 루트를 import 경로에 추가)
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from ml.features import add_group_features
+
+
 warnings.filterwarnings("ignore")
 
 # ========================================
@@ -353,15 +359,9 @@ metrics["txn_month_dt"] = pd.to_datetime(metrics["txn_month"], errors="coerce")
 metrics["month_num"] = metrics["txn_month_dt"].dt.month
 metrics["year"] = metrics["txn_month_dt"].dt.year
 
-for lag in [1, 2, 3]:
-    metrics[f"revenue_lag_{lag}"] = metrics.groupby("merchant_id")["total_revenue"].shift(lag)
-
-metrics["revenue_rolling_mean_3"] = metrics.groupby("merchant_id")["total_revenue"].transform(
-    lambda x: x.rolling(3, min_periods=1).mean()
-)
-metrics["txn_rolling_mean_3"] = metrics.groupby("merchant_id")["txn_count"].transform(
-    lambda x: x.rolling(3, min_periods=1).mean()
-)
+# revenue_lag_1~3, revenue_rolling_mean_3, txn_rolling_mean_3 (LAG_FEATURE_SPEC)
+metrics = metrics.sort_values(["merchant_id", "txn_month_dt"], kind="mergesort").reset_index(drop=True)
+metrics = add_group_features(metrics, group_col="merchant_id")
 
 le_industry = LabelEncoder()
 le_region = LabelEncoder()
@@ -0,0 +1,383 @@
+"""
+rag/embeddings.py - 임베딩 백엔드 + 디스크 캐시
+
+[백엔드] RAG_EMBED_BACKEND로 선택 (openai: OpenAIEmbeddings / local: LocalHashEmbeddings)
+- register_embedding_backend()로 (팩토리, API 키 필요 여부, 디스크 캐시 사용 여부)를 등록
+- local은 문자 n-gram 해싱 투영을 NumPy로 배치 계산 → API 키/네트워크 없이 인덱싱·검색 가능
+
+[디스크 캐시]
+(임베딩 모델, 종류(doc/query), 텍스트 sha1) 키로 벡터(float32)를 SQLite에 저장하고
+embed_documents / embed_query 호출 시 캐시에 없는 텍스트만 실제 임베딩 객체로 보냅니다.
+- 재빌드 시 바뀌지 않은 청크, 파일 간 중복 청크는 다시 임베딩하지 않음
+- 행 수가 RAG_EMBED_CACHE_MAX_ROWS를 넘으면 마지막 사용 시각이 오래된 행부터 삭제
+- 캐시 읽기/쓰기 실패는 임베딩 결과에 영향을 주지 않음 (실제 임베딩으로 폴백)
+OpenAIEmbeddings뿐 아니라 embed_documents/embed_query를 가진 어떤 객체(로컬 대체 구현 포함)도 감쌀 수 있습니다.
+"""
+import os
+import sqlite3
+import hashlib
+import time
+from threading import Lock
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from core.utils import safe_str
+import state as st
+
+try:
+    from langchain_core.embeddings import Embeddings
+except Exception:
+    Embeddings = object
+
+# splitmix64 상수 (n-gram 해시 섞기)
+_MIX1 = np.uint64(0xFF51AFD7ED558CCD)
+_MIX2 = np.uint64(0xC4CEB9FE1A85EC53)
+_NGRAM_BASE = np.uint64(0x100000001B3)
+
+# SQLite IN (...) 파라미터 수 제한 대비 조회 배치 크기
+_SQL_BATCH = 500
+# 상한 초과 시 한 번에 상한의 이 비율까지 줄여 매 쓰기마다 삭제하지 않도록 함
+_EVICT_TO_RATIO = 0.9
+
+
+def _text_key(text: str) -> str:
+    return hashlib.sha1(safe_str(text).encode("utf-8", errors="ignore")).hexdigest()
+
+
+class EmbeddingCache:
+    """SQLite 벡터 저장소 + 적중 통계 (프로세스 내 공유)"""
+
+    def __init__(self, path: str, max_rows: int):
+        self.path = path
+        self.max_rows = max(1, int(max_rows))
+        self._lock = Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.errors = 0
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                " model TEXT NOT NULL, kind TEXT NOT NULL, key TEXT NOT NULL,"
+                " dim INTEGER NOT NULL, vec BLOB NOT NULL, last_used REAL NOT NULL,"
+                " PRIMARY KEY (model, kind, key))"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used)")
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def get_many(self, model: str, kind: str, keys: List[str]) -> Dict[str, List[float]]:
+        """keys 중 캐시에 있는 벡터 (적중 행은 last_used 갱신)"""
+        found: Dict[str, List[float]] = {}
+        uniq = list(dict.fromkeys(keys))
+        try:
+            with self._lock:
+                conn = self._connect()
+                for i in range(0, len(uniq), _SQL_BATCH):
+                    part = uniq[i:i + _SQL_BATCH]
+                    rows = conn.execute(
+                        f"SELECT key, dim, vec FROM embeddings WHERE model=? AND kind=? AND key IN ({','.join('?' * len(part))})",
+                        [model, kind, *part],
+                    ).fetchall()
+                    for key, dim, blob in rows:
+                        vec = np.frombuffer(blob, dtype=np.float32)
+                        if len(vec) == dim:
+                            found[key] = vec.tolist()
+                if found:
+                    now = time.time()
+                    conn.executemany(
+                        "UPDATE embeddings SET last_used=? WHERE model=? AND kind=? AND key=?",
+                        [(now, model, kind, k) for k in found],
+                    )
+                    conn.commit()
+        except Exception as e:
+            self.record(errors=1)
+            st.logger.warning("EMBED_CACHE_READ_FAIL err=%s", safe_str(e))
+            return {}
+        return found
+
+    def put_many(self, model: str, kind: str, items: Dict[str, List[float]]) -> None:
+        if not items:
+            return
+        try:
+            now = time.time()
+            rows = []
+            for key, vec in items.items():
+                arr = np.asarray(vec, dtype=np.float32)
+                rows.append((model, kind, key, int(arr.size), arr.tobytes(), now))
+            with self._lock:
+                conn = self._connect()
+                conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (model, kind, key, dim, vec, last_used) VALUES (?, ?, ?, ?, ?, ?)",
+                    rows,
+                )
+                self._evict(conn)
+                conn.commit()
+        except Exception as e:
+            self.record(errors=1)
+            st.logger.warning("EMBED_CACHE_WRITE_FAIL err=%s", safe_str(e))
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """행 수가 max_rows를 넘으면 last_used가 오래된 행부터 max_rows * 0.9까지 삭제"""
+        n = int(conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0])
+        if n <= self.max_rows:
+            return
+        drop = n - int(self.max_rows * _EVICT_TO_RATIO)
+        conn.execute(
+            "DELETE FROM embeddings WHERE rowid IN (SELECT rowid FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+            (drop,),
+        )
+        self.evictions += drop
+
+    def record(self, hits: int = 0, misses: int = 0, errors: int = 0) -> None:
+        """적중/미스/오류 카운터 누적 (요청 스레드풀에서 동시에 호출되므로 잠금 안에서 갱신)"""
+        with self._lock:
+            self.hits += hits
+            self.misses += misses
+            self.errors += errors
+
+    def row_count(self) -> int:
+        try:
+            with self._lock:
+                return int(self._connect().execute("SELECT COUNT(*) FROM embeddings").fetchone()[0])
+        except Exception:
+            return 0
+
+    def stats(self) -> Dict[str, Any]:
+        rows = self.row_count()
+        with self._lock:
+            hits, misses, evictions, errors = self.hits, self.misses, self.evictions, self.errors
+        total = hits + misses
+        return {
+            "path": self.path,
+            "rows": rows,
+            "max_rows": self.max_rows,
+            "hits": hits,
+            "misses": misses,
+            "hit_rate": round(hits / total, 4) if total else 0.0,
+            "evictions": evictions,
+            "errors": errors,
+        }
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class CachedEmbeddings(Embeddings):
+    """embeddings 객체를 감싸 캐시에 없는 텍스트만 임베딩 (반환 순서/개수는 입력과 동일)"""
+
+    def __init__(self, inner: Any, model: str, cache: EmbeddingCache):
+        self.inner = inner
+        self.model = model
+        self.cache = cache
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        texts = list(texts)
+        if not texts:
+            return []
+        keys = [_text_key(t) for t in texts]
+        found = self.cache.get_many(self.model, "doc", keys)
+        # 적중/미스는 고유 텍스트 기준 (같은 호출 안의 중복은 방금 임베딩한 것이므로 적중이 아님)
+        hits = len(found)
+
+        # 같은 텍스트가 여러 번 나와도 한 번만 임베딩
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        if missing:
+            vecs = self.inner.embed_documents(list(missing.values()))
+            fresh = dict(zip(missing.keys(), [list(v) for v in vecs]))
+            self.cache.put_many(self.model, "doc", fresh)
+            found.update(fresh)
+
+        self.cache.record(hits=hits, misses=len(missing))
+        st.logger.info("EMBED_CACHE docs=%d hits=%d embedded=%d", len(texts), hits, len(missing))
+        return [found[k] for k in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = _text_key(text)
+        hit = self.cache.get_many(self.model, "query", [key]).get(key)
+        if hit is not None:
+            self.cache.record(hits=1)
+            return hit
+        vec = list(self.inner.embed_query(text))
+        self.cache.record(misses=1)
+        self.cache.put_many(self.model, "query", {key: vec})
+        return vec
+
+
+# ============================================================
+# 로컬 임베딩 (문자 n-gram 해싱 투영)
+# ============================================================
+def _mix64(h: np.ndarray) -> np.ndarray:
+    """splitmix64 최종 섞기 (uint64 곱셈은 2^64에서 순환)"""
+    h = h ^ (h >> np.uint64(33))
+    h = h * _MIX1
+    h = h ^ (h >> np.uint64(33))
+    h = h * _MIX2
+    return h ^ (h >> np.uint64(33))
+
+
+class LocalHashEmbeddings(Embeddings):
+    """
+    CPU 로컬 임베딩: 소문자/공백 정리 → 유니코드 코드포인트 배열 → 문자 n-gram 롤링 해시 →
+    dim 버킷에 부호(+1/-1) 누적 → log 스케일 + L2 정규화.
+    같은 텍스트는 실행/프로세스와 무관하게 같은 벡터이고, 공유 n-gram이 많을수록 코사인 유사도가 높습니다.
+    배치 전체를 한 배열로 이어 붙여 n-gram 해시/버킷 누적을 벡터 연산으로 계산합니다.
+    """
+
+    def __init__(self, dim: int = 768, ngram_min: int = 2, ngram_max: int = 4, batch_size: int = 256, max_chars: int = 8000):
+        self.dim = max(8, int(dim))
+        self.ngram_min = max(1, int(ngram_min))
+        self.ngram_max = max(self.ngram_min, int(ngram_max))
+        self.batch_size = max(1, int(batch_size))
+        self.max_chars = max(1, int(max_chars))
+
+    def _normalize(self, text: str) -> str:
+        # 앞뒤 공백을 붙여 단어 경계 n-gram도 만들어지도록 함
+        return " " + " ".join(safe_str(text).lower().split())[:self.max_chars] + " "
+
+    def encode(self, texts: List[str]) -> np.ndarray:
+        """(len(texts), dim) float32 행렬"""
+        n_docs = len(texts)
+        if n_docs == 0:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        norm = [self._normalize(t) for t in texts]
+        lens = np.fromiter((len(t) for t in norm), dtype=np.int64, count=n_docs)
+        cp = np.frombuffer("".join(norm).encode("utf-32-le"), dtype=np.uint32).astype(np.uint64)
+        doc = np.repeat(np.arange(n_docs, dtype=np.int64), lens)
+
+        acc = np.zeros(n_docs * self.dim, dtype=np.float64)
+        dim = np.uint64(self.dim)
+        for n in range(self.ngram_min, self.ngram_max + 1):
+            m = len(cp) - n + 1
+            if m <= 0:
+                continue
+            # n-gram 롤링 해시 (n마다 다른 시작값)
+            h = np.full(m, n, dtype=np.uint64) * _MIX2
+            for j in range(n):
+                h = h * _NGRAM_BASE + cp[j:j + m]
+            same_doc = doc[:m] == doc[n - 1:n - 1 + m]  # 문서 경계를 넘는 n-gram 제외
+            h = _mix64(h[same_doc])
+            rows = doc[:m][same_doc]
+            bucket = (h % dim).astype(np.int64)
+            sign = np.where((h >> np.uint64(63)) == 1, -1.0, 1.0)
+            acc += np.bincount(rows * self.dim + bucket, weights=sign, minlength=n_docs * self.dim)
+
+        mat = acc.reshape(n_docs, self.dim)
+        mat = np.sign(mat) * np.log1p(np.abs(mat))
+        norms = np.linalg.norm(mat, axis=1, keepdims=True)
+        mat = mat / np.where(norms > 0, norms, 1.0)
+        return mat.astype(np.float32)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        texts = list(texts)
+        out: List[List[float]] = []
+        for i in range(0, len(texts), self.batch_size):
+            out.extend(self.encode(texts[i:i + self.batch_size]).tolist())
+        return out
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.encode([text])[0].tolist()
+
+
+# ============================================================
+# 임베딩 백엔드 레지스트리
+# ============================================================
+EMBED_BACKENDS: Dict[str, Dict[str, Any]] = {}
+
+
+def register_embedding_backend(
+    name: str,
+    factory: Callable[[str], Any],
+    requires_key: bool = True,
+    disk_cache: bool = True,
+    available: Optional[Callable[[], bool]] = None,
+) -> None:
+    """
+    factory(api_key) -> embeddings 객체 (실패 시 None).
+    disk_cache=True면 결과를 CachedEmbeddings로 감쌈 (원격 API처럼 호출 비용이 큰 백엔드용)
+    """
+    EMBED_BACKENDS[name] = {
+        "factory": factory, "requires_key": requires_key,
+        "disk_cache": disk_cache, "available": available or (lambda: True),
+    }
+
+
+def embedding_backend_error() -> str:
+    """현재 RAG_EMBED_BACKEND를 사용할 수 없는 이유 (사용 가능하면 "")"""
+    spec = EMBED_BACKENDS.get(st.RAG_EMBED_BACKEND)
+    if spec is None:
+        return f"알 수 없는 임베딩 백엔드: {st.RAG_EMBED_BACKEND} (사용 가능: {', '.join(sorted(EMBED_BACKENDS))})"
+    if not spec["available"]():
+        return f"임베딩 백엔드 {st.RAG_EMBED_BACKEND} 라이브러리 import 실패"
+    return ""
+
+
+def embedding_backend_requires_key() -> bool:
+    spec = EMBED_BACKENDS.get(st.RAG_EMBED_BACKEND)
+    return bool(spec is None or spec["requires_key"])
+
+
+def make_embeddings(api_key: str) -> Optional[Any]:
+    """RAG_EMBED_BACKEND의 embeddings 객체 (디스크 캐시 대상이면 감싸서 반환)"""
+    if embedding_backend_error():
+        return None
+    spec = EMBED_BACKENDS[st.RAG_EMBED_BACKEND]
+    emb = spec["factory"](api_key)
+    return with_embedding_cache(emb, st.RAG_EMBED_MODEL) if spec["disk_cache"] else emb
+
+
+register_embedding_backend(
+    "local",
+    lambda api_key: LocalHashEmbeddings(dim=st.RAG_LOCAL_EMBED_DIM, batch_size=st.RAG_LOCAL_EMBED_BATCH),
+    requires_key=False,
+    disk_cache=False,  # SQLite 조회보다 직접 계산이 빠름
+)
+
+
+# ============================================================
+# 공유 캐시
+# ============================================================
+_CACHE_LOCK = Lock()
+
+
+def get_embedding_cache() -> Optional[EmbeddingCache]:
+    """RAG_EMBED_CACHE_ENABLED이면 프로세스 공유 캐시 (RAG_EMBED_CACHE_FILE), 아니면 None"""
+    if not st.RAG_EMBED_CACHE_ENABLED:
+        return None
+    with _CACHE_LOCK:
+        cache = st.RAG_EMBED_CACHE
+        if cache is None or cache.path != st.RAG_EMBED_CACHE_FILE:
+            cache = EmbeddingCache(st.RAG_EMBED_CACHE_FILE, st.RAG_EMBED_CACHE_MAX_ROWS)
+            st.RAG_EMBED_CACHE = cache
+        return cache
+
+
+def with_embedding_cache(inner: Any, model: str) -> Any:
+    """inner를 디스크 캐시로 감싼 embeddings (캐시 비활성/inner 없음이면 inner 그대로)"""
+    if inner is None:
+        return None
+    cache = get_embedding_cache()
+    if cache is None:
+        return inner
+    return CachedEmbeddings(inner, model, cache)
+
+
+def embedding_cache_stats() -> Dict[str, Any]:
+    cache = st.RAG_EMBED_CACHE if st.RAG_EMBED_CACHE_ENABLED else None
+    if cache is None:
+        return {"enabled": bool(st.RAG_EMBED_CACHE_ENABLED)}
+    return {"enabled": True, **cache.stats()}
@@ -14,9 +14,16 @@ import time
 import hashlib
 import tempfile
 import shutil
+import unicodedata
+from threading import Lock
 from typing import List, Any, Dict, Tuple, Optional
 
+from core.cache import LRUTTLCache
 from core.utils import safe_str
+from core.readiness import is_loading, set_status
+from rag.embeddings import (
+    embedding_backend_error, embedding_backend_requires_key, make_embeddings, register_embedding_backend,
+)
 import state as st
 
 # ============================================================
@@ -35,15 +42,6 @@ try:
 except ImportError:
     pass
 
-# SAR import (현재 파일에서는 사용하지 않지만 기존 코드 유지)
-SARSingleNode = None
-SAR_AVAILABLE = False
-try:
-    from recommenders.models.sar.sar_singlenode import SARSingleNode
-    SAR_AVAILABLE = True
-except Exception:
-    pass
-
 # ============================================================
 # Hybrid Search: BM25 (Optional)
 # ============================================================
@@ -61,6 +59,7 @@ except ImportError:
 CrossEncoder = None
 RERANKER_AVAILABLE = False
 RERANKER_MODEL = None
+RERANKER_LOAD_LOCK = Lock()
 try:
     from sentence_transformers import CrossEncoder
     RERANKER_AVAILABLE = True
@@ -178,7 +177,7 @@ def _rag_read_file(path: str) -> str:
         return ""
 
 
-def _make_embeddings(api_key: str):
+def _make_openai_embeddings(api_key: str):
     if OpenAIEmbeddings is None:
         return None
     k = (api_key or "").strip()
@@ -196,6 +195,17 @@ def _make_embeddings(api_key: str):
         return None
 
 
+register_embedding_backend(
+    "openai", _make_openai_embeddings, requires_key=True, disk_cache=True,
+    available=lambda: OpenAIEmbeddings is not None,
+)
+
+
+def _make_embeddings(api_key: str):
+    """RAG_EMBED_BACKEND 임베딩 객체 (openai는 RAG_EMBED_CACHE_ENABLED이면 디스크 캐시로 감쌈)"""
+    return make_embeddings(api_key)
+
+
 def _rag_load_state_file() -> dict:
     try:
         if not os.path.exists(st.RAG_STATE_FILE):
@@ -215,6 +225,30 @@ def _rag_save_state_file(payload: dict) -> None:
         pass
 
 
+def _rag_write_json_atomic(path: str, payload: dict) -> None:
+    """임시 파일에 쓴 뒤 교체 (읽는 쪽이 반쯤 쓰인 파일을 보지 않도록)"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False)
+        os.replace(tmp, path)
+    finally:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+
+
+def _rag_read_json(path: str) -> dict:
+    try:
+        if not os.path.exists(path):
+            return {}
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except Exception:
+        return {}
+
+
 # ============================================================
 # BM25 인덱스 관리
 # ============================================================
@@ -240,43 +274,103 @@ def _tokenize_korean(text: str) -> List[str]:
     return result
 
 
-def _build_bm25_index(chunks: List[Any]) -> bool:
-    """BM25 인덱스 빌드"""
+# 토큰화 규칙이 바뀌면 올려서 저장된 토큰을 무효화
+BM25_TOKENIZER_VERSION = 1
+
+
+def _set_bm25_index(doc_map: List[Dict], tokenized_corpus: List[List[str]]) -> bool:
+    """문서 맵 + 토큰으로 BM25 인덱스 게시"""
     global BM25_INDEX, BM25_CORPUS, BM25_DOC_MAP
 
+    if not BM25_AVAILABLE or BM25Okapi is None or not doc_map:
+        return False
+    index = BM25Okapi(tokenized_corpus)
+    BM25_CORPUS = [d.get("content", "") for d in doc_map]
+    BM25_DOC_MAP = doc_map
+    BM25_INDEX = index
+    return True
+
+
+def _saved_bm25_tokens() -> Dict[str, List[str]]:
+    """저장된 BM25 파일의 청크 ID -> 토큰 (청크 ID는 내용 기반이므로 지문이 달라도 재사용 가능)"""
+    saved = _rag_read_json(st.RAG_BM25_FILE)
+    ids, tokens = saved.get("ids") or [], saved.get("tokens") or []
+    if saved.get("tokenizer") != BM25_TOKENIZER_VERSION or len(ids) != len(tokens):
+        return {}
+    return dict(zip(ids, tokens))
+
+
+def _build_bm25_index(chunks: List[Any], fp: str = "", ids: Optional[List[str]] = None) -> bool:
+    """
+    BM25 인덱스 빌드 (fp가 있으면 토큰/문서 맵을 RAG_BM25_FILE에 저장).
+    ids(청크 ID)가 주어지면 저장본에 같은 ID가 있는 청크는 토큰화를 생략합니다.
+    """
     if not BM25_AVAILABLE or BM25Okapi is None:
         return False
 
     try:
-        BM25_CORPUS = []
-        BM25_DOC_MAP = []
-
-        for chunk in chunks:
+        reuse = _saved_bm25_tokens() if ids else {}
+        doc_map: List[Dict] = []
+        doc_ids: List[str] = []
+        tokenized_corpus: List[List[str]] = []
+        for i, chunk in enumerate(chunks):
             try:
                 content = safe_str(getattr(chunk, "page_content", ""))
                 metadata = getattr(chunk, "metadata", {})
                 if content:
-                    BM25_CORPUS.append(content)
-                    BM25_DOC_MAP.append({
+                    cid = ids[i] if ids else ""
+                    tokens = reuse.get(cid) if cid else None
+                    doc_map.append({
                         "content": content,
                         "source": metadata.get("source", ""),
                     })
+                    doc_ids.append(cid)
+                    tokenized_corpus.append(tokens if tokens is not None else _tokenize_korean(content))
             except Exception:
                 continue
 
-        if not BM25_CORPUS:
+        if not doc_map:
             return False
 
         # BM25 인덱스 생성
-        tokenized_corpus = [_tokenize_korean(doc) for doc in BM25_CORPUS]
-        BM25_INDEX = BM25Okapi(tokenized_corpus)
-        st.logger.info("BM25_INDEX_BUILT docs=%d", len(BM25_CORPUS))
+        if not _set_bm25_index(doc_map, tokenized_corpus):
+            return False
+        st.logger.info("BM25_INDEX_BUILT docs=%d", len(doc_map))
+
+        if fp:
+            try:
+                _rag_write_json_atomic(st.RAG_BM25_FILE, {
+                    "hash": fp, "tokenizer": BM25_TOKENIZER_VERSION,
+                    "ids": doc_ids, "docs": doc_map, "tokens": tokenized_corpus,
+                })
+            except Exception as e:
+                st.logger.warning("BM25_SAVE_FAIL err=%s", safe_str(e))
         return True
     except Exception as e:
         st.logger.warning("BM25_BUILD_FAIL err=%s", safe_str(e))
         return False
 
 
+def _load_bm25_index(fp: str) -> bool:
+    """같은 파일 지문으로 저장된 BM25 토큰/문서 맵 복원 (토큰화/임베딩 없음)"""
+    if not BM25_AVAILABLE or BM25Okapi is None:
+        return False
+    saved = _rag_read_json(st.RAG_BM25_FILE)
+    if saved.get("hash") != fp or saved.get("tokenizer") != BM25_TOKENIZER_VERSION:
+        return False
+    docs, tokens = saved.get("docs") or [], saved.get("tokens") or []
+    if len(docs) != len(tokens):
+        return False
+    try:
+        if not _set_bm25_index(docs, tokens):
+            return False
+        st.logger.info("BM25_INDEX_LOADED docs=%d", len(docs))
+        return True
+    except Exception as e:
+        st.logger.warning("BM25_LOAD_FAIL err=%s", safe_str(e))
+        return False
+
+
 def _bm25_search(query: str, top_k: int = 5) -> List[Tuple[Dict, float]]:
     """BM25 검색 (키워드 기반)"""
     global BM25_INDEX, BM25_DOC_MAP
@@ -306,8 +400,11 @@ def _bm25_search(query: str, top_k: int = 5) -> List[Tuple[Dict, float]]:
 # ============================================================
 # Cross-Encoder Reranking
 # ============================================================
-def _get_reranker():
-    """Reranker 모델 로드 (Lazy Loading)"""
+def _get_reranker(blocking: bool = True):
+    """
+    Reranker 모델 로드 (Lazy Loading)
+    blocking=False면 다른 스레드(시작 워밍업)가 로드 중일 때 기다리지 않고 None 반환
+    """
     global RERANKER_MODEL
 
     if not RERANKER_AVAILABLE or CrossEncoder is None:
@@ -316,19 +413,25 @@ def _get_reranker():
     if RERANKER_MODEL is not None:
         return RERANKER_MODEL
 
+    if not RERANKER_LOAD_LOCK.acquire(blocking=blocking):
+        return None
     try:
-        # 다국어 지원 cross-encoder 모델 사용
-        RERANKER_MODEL = CrossEncoder('cross-encoder/ms-marco-MiniLM-L-6-v2', max_length=512)
-        st.logger.info("RERANKER_LOADED model=ms-marco-MiniLM-L-6-v2")
+        if RERANKER_MODEL is None:
+            # 다국어 지원 cross-encoder 모델 사용
+            RERANKER_MODEL = CrossEncoder('cross-encoder/ms-marco-MiniLM-L-6-v2', max_length=512)
+            st.logger.info("RERANKER_LOADED model=ms-marco-MiniLM-L-6-v2")
+            set_status("reranker", "ready")
         return RERANKER_MODEL
     except Exception as e:
         st.logger.warning("RERANKER_LOAD_FAIL err=%s", safe_str(e))
         return None
+    finally:
+        RERANKER_LOAD_LOCK.release()
 
 
 def _rerank_results(query: str, results: List[Dict], top_k: int = 5) -> List[Dict]:
-    """Cross-Encoder로 결과 재정렬"""
-    reranker = _get_reranker()
+    """Cross-Encoder로 결과 재정렬 (모델 로딩 중이면 재정렬 생략)"""
+    reranker = _get_reranker(blocking=False)
     if reranker is None or not results:
         return results[:top_k]
 
@@ -458,48 +561,90 @@ def _extract_relations_simple(text: str, entities: List[str]) -> List[Dict]:
     return relations
 
 
-def build_knowledge_graph(chunks: List[Any]) -> Dict:
-    """청크에서 Knowledge Graph 구축"""
-    global KNOWLEDGE_GRAPH
+def _set_knowledge_graph(kg: Dict) -> None:
+    """KNOWLEDGE_GRAPH를 제자리 갱신 (다른 모듈이 import한 참조도 같은 객체를 보도록)"""
+    KNOWLEDGE_GRAPH.clear()
+    KNOWLEDGE_GRAPH.update(kg)
+
+
+def _saved_kg_entries() -> Dict[str, Dict]:
+    """저장된 Knowledge Graph 파일의 청크 ID -> {entities, relations}"""
+    saved = _rag_read_json(st.RAG_KG_FILE)
+    ids, entries = saved.get("ids") or [], saved.get("entries") or []
+    if len(ids) != len(entries):
+        return {}
+    return dict(zip(ids, entries))
+
 
-    KNOWLEDGE_GRAPH = {}
+def build_knowledge_graph(chunks: List[Any], fp: str = "", ids: Optional[List[str]] = None) -> Dict:
+    """
+    청크에서 Knowledge Graph 구축 (fp가 있으면 RAG_KG_FILE에 저장).
+    ids(청크 ID)가 주어지면 청크별 추출 결과를 함께 저장하고, 저장본에 같은 ID가 있으면 재사용합니다.
+    """
     entity_docs: Dict[str, List[str]] = {}  # entity -> document sources
     all_relations = []
+    reuse = _saved_kg_entries() if ids else {}
+    entry_ids: List[str] = []
+    entries: List[Dict] = []
 
-    for chunk in chunks:
+    for i, chunk in enumerate(chunks):
         try:
             content = safe_str(getattr(chunk, "page_content", ""))
             source = getattr(chunk, "metadata", {}).get("source", "unknown")
-
-            # 개체 추출
-            entities = _extract_entities_simple(content)
-            for entity in entities:
+            cid = ids[i] if ids else ""
+            entry = reuse.get(cid) if cid else None
+
+            # 개체/관계 추출
+            if entry is None:
+                entities = _extract_entities_simple(content)
+                entry = {"entities": entities, "relations": _extract_relations_simple(content, entities)}
+            if cid:
+                entry_ids.append(cid)
+                entries.append(entry)
+
+            for entity in entry["entities"]:
                 if entity not in entity_docs:
                     entity_docs[entity] = []
                 if source not in entity_docs[entity]:
                     entity_docs[entity].append(source)
-
-            # 관계 추출
-            relations = _extract_relations_simple(content, entities)
-            all_relations.extend(relations)
+            all_relations.extend(entry["relations"])
         except Exception:
             continue
 
     # Knowledge Graph 구조화
-    KNOWLEDGE_GRAPH = {
+    _set_knowledge_graph({
         "entities": entity_docs,
         "relations": all_relations,
         "stats": {
             "entity_count": len(entity_docs),
             "relation_count": len(all_relations),
         }
-    }
+    })
 
     st.logger.info("KNOWLEDGE_GRAPH_BUILT entities=%d relations=%d",
                    len(entity_docs), len(all_relations))
+    if fp:
+        try:
+            _rag_write_json_atomic(st.RAG_KG_FILE, {
+                "hash": fp, "graph": KNOWLEDGE_GRAPH, "ids": entry_ids, "entries": entries,
+            })
+        except Exception as e:
+            st.logger.warning("KNOWLEDGE_GRAPH_SAVE_FAIL err=%s", safe_str(e))
     return KNOWLEDGE_GRAPH
 
 
+def _load_knowledge_graph(fp: str) -> bool:
+    """같은 파일 지문으로 저장된 Knowledge Graph 복원"""
+    saved = _rag_read_json(st.RAG_KG_FILE)
+    graph = saved.get("graph")
+    if saved.get("hash") != fp or not isinstance(graph, dict) or "entities" not in graph:
+        return False
+    _set_knowledge_graph(graph)
+    st.logger.info("KNOWLEDGE_GRAPH_LOADED entities=%d relations=%d",
+                   len(graph.get("entities", {})), len(graph.get("relations", [])))
+    return True
+
+
 def search_knowledge_graph(query: str, top_k: int = 5) -> List[Dict]:
     """Knowledge Graph에서 관련 엔티티 검색"""
     global KNOWLEDGE_GRAPH
@@ -577,23 +722,275 @@ def _safe_faiss_load(target_dir: str, emb):
             return FAISS.load_local(tmp, emb)
 
 
+# ============================================================
+# 파일별 매니페스트 (증분 인덱싱)
+# ============================================================
+# 청킹 규칙(chunk_size/overlap)이나 청크 ID 규칙이 바뀌면 올려서 매니페스트를 무효화 (다음 빌드는 전체 빌드)
+RAG_MANIFEST_VERSION = 1
+RAG_CHUNK_SIZE = 900
+RAG_CHUNK_OVERLAP = 150
+
+
+def _rag_rel_path(path: str) -> str:
+    return os.path.relpath(path, st.RAG_DOCS_DIR).replace("\\", "/")
+
+
+def _rag_file_sha1(path: str) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def _rag_chunk_ids(rel: str, sha1: str, n: int) -> List[str]:
+    """청크 ID = 경로 해시 + 파일 내용 해시 + 순번 (같은 경로/내용이면 항상 같은 ID)"""
+    prefix = f"{_sha1_text(rel)[:12]}-{sha1[:16]}"
+    return [f"{prefix}-{i}" for i in range(n)]
+
+
+def _rag_load_manifest() -> dict:
+    """현재 임베딩 모델/청킹 규칙으로 만든 매니페스트만 반환 (없거나 다르면 {})"""
+    saved = _rag_read_json(st.RAG_MANIFEST_FILE)
+    if saved.get("version") != RAG_MANIFEST_VERSION or saved.get("embed_model") != st.RAG_EMBED_MODEL:
+        return {}
+    if not isinstance(saved.get("files"), dict):
+        return {}
+    return saved
+
+
+def _rag_save_manifest(files: Dict[str, Dict]) -> None:
+    try:
+        _rag_write_json_atomic(st.RAG_MANIFEST_FILE, {
+            "version": RAG_MANIFEST_VERSION, "embed_model": st.RAG_EMBED_MODEL, "files": files,
+        })
+    except Exception as e:
+        st.logger.warning("RAG_MANIFEST_SAVE_FAIL err=%s", safe_str(e))
+
+
+def _rag_drop_manifest() -> None:
+    """인덱스를 저장하지 않는 경우 (빈 문서 폴더 등) 남은 FAISS와 어긋나지 않도록 매니페스트 삭제"""
+    try:
+        if os.path.exists(st.RAG_MANIFEST_FILE):
+            os.remove(st.RAG_MANIFEST_FILE)
+    except Exception:
+        pass
+
+
+def _rag_scan_files(paths: List[str], prev: Dict[str, Dict]) -> Dict[str, Dict]:
+    """
+    rel 경로 -> {path, sha1, size, mtime_ns}.
+    크기/수정 시각이 매니페스트와 같으면 저장된 sha1을 그대로 사용 (파일을 다시 읽지 않음)
+    """
+    scan: Dict[str, Dict] = {}
+    for p in paths:
+        rel = _rag_rel_path(p)
+        try:
+            s = os.stat(p)
+            old = prev.get(rel) or {}
+            if old.get("sha1") and old.get("size") == s.st_size and old.get("mtime_ns") == s.st_mtime_ns:
+                sha1 = old["sha1"]
+            else:
+                sha1 = _rag_file_sha1(p)
+            scan[rel] = {"path": p, "sha1": sha1, "size": int(s.st_size), "mtime_ns": int(s.st_mtime_ns)}
+        except Exception:
+            continue
+    return scan
+
+
+def _rag_manifest_entry(info: Dict, chunk_ids: List[str]) -> Dict:
+    return {"sha1": info["sha1"], "size": info["size"], "mtime_ns": info["mtime_ns"], "chunk_ids": chunk_ids}
+
+
 # ============================================================
 # 인덱스 빌드/로드
 # ============================================================
-def rag_build_or_load_index(api_key: str, force_rebuild: bool = False) -> None:
+def _rag_split_documents(docs: List[Any]) -> List[Any]:
+    if RecursiveCharacterTextSplitter is not None:
+        try:
+            splitter = RecursiveCharacterTextSplitter(chunk_size=RAG_CHUNK_SIZE, chunk_overlap=RAG_CHUNK_OVERLAP)
+            return splitter.split_documents(docs)
+        except Exception:
+            return docs
+    return docs
+
+
+def _rag_chunk_file(path: str, rel: str) -> List[Any]:
+    """파일 1개를 읽어 청킹 (텍스트가 없으면 [])"""
+    txt = _rag_read_file(path)
+    if not txt:
+        return []
+    try:
+        return _rag_split_documents([Document(page_content=txt, metadata={"source": rel})])
+    except Exception:
+        return []
+
+
+def _rag_chunk_files(scan: Dict[str, Dict]) -> Tuple[List[Any], List[str], Dict[str, Dict]]:
+    """스캔된 전체 파일을 경로 순으로 청킹 -> (청크, 청크 ID, 매니페스트 files)"""
+    chunks: List[Any] = []
+    ids: List[str] = []
+    files: Dict[str, Dict] = {}
+    for rel in sorted(scan):
+        info = scan[rel]
+        file_chunks = _rag_chunk_file(info["path"], rel)
+        file_ids = _rag_chunk_ids(rel, info["sha1"], len(file_chunks))
+        chunks.extend(file_chunks)
+        ids.extend(file_ids)
+        files[rel] = _rag_manifest_entry(info, file_ids)
+    return chunks, ids, files
+
+
+def _rag_build_aux_indexes(
+    chunks: List[Any], fp: str, ids: Optional[List[str]] = None, bm25: bool = True, kg: bool = True
+) -> Tuple[bool, bool]:
+    """BM25 / Knowledge Graph 빌드 후 fp로 저장 (임베딩 호출 없음, 저장본에 있는 청크 ID는 재사용)"""
+    bm25_built = _build_bm25_index(chunks, fp, ids) if bm25 else False
+    kg_built = False
+    if kg:
+        try:
+            build_knowledge_graph(chunks, fp, ids)
+            kg_built = True
+        except Exception as e:
+            st.logger.warning("KNOWLEDGE_GRAPH_BUILD_FAIL err=%s", safe_str(e))
+    return bm25_built, kg_built
+
+
+def _rag_restore_aux_indexes(paths: List[str], fp: str) -> Tuple[bool, bool]:
+    """
+    FAISS 로드 경로에서 BM25/KG 복원. 저장본이 없거나 지문이 다르면(이전 버전 인덱스 등)
+    문서를 다시 읽고 청킹만 하여 빌드 후 저장합니다.
+    """
+    bm25_ready = _load_bm25_index(fp)
+    kg_ready = _load_knowledge_graph(fp)
+    if bm25_ready and kg_ready:
+        return True, True
+
+    scan = _rag_scan_files(paths, _rag_load_manifest().get("files") or {})
+    chunks, ids, _ = _rag_chunk_files(scan)
+    if not chunks:
+        return bm25_ready, kg_ready
+    bm25_built, kg_built = _rag_build_aux_indexes(chunks, fp, ids, bm25=not bm25_ready, kg=not kg_ready)
+    return bm25_ready or bm25_built, kg_ready or kg_built
+
+
+def _rag_update_index(emb, scan: Dict[str, Dict], prev: Dict[str, Dict]) -> Optional[Tuple[Any, List[Any], List[str], Dict[str, Dict], Dict[str, int]]]:
+    """
+    저장된 FAISS를 매니페스트 기준으로 증분 갱신.
+    - 삭제/변경된 파일의 청크 ID는 FAISS에서 delete
+    - 추가/변경된 파일만 청킹 + 임베딩 후 add_documents
+    - 변경 없는 파일의 청크는 docstore에서 꺼내 BM25/KG 재구성에 사용 (임베딩 없음)
+    반환: (index, 전체 청크, 전체 청크 ID, 새 매니페스트 files, 변경 통계) / 남는 청크가 없으면 None
+    """
+    idx = _safe_faiss_load(st.RAG_FAISS_DIR, emb)
+
+    changed = {rel for rel, info in scan.items() if (prev.get(rel) or {}).get("sha1") != info["sha1"]}
+    removed = [rel for rel in prev if rel not in scan]
+    existing = set(idx.index_to_docstore_id.values())
+    del_ids = [
+        cid for rel in list(removed) + sorted(changed & set(prev))
+        for cid in (prev[rel].get("chunk_ids") or []) if cid in existing
+    ]
+
+    files: Dict[str, Dict] = {}
+    new_chunks: Dict[str, Any] = {}
+    for rel in sorted(scan):
+        info = scan[rel]
+        if rel in changed:
+            file_chunks = _rag_chunk_file(info["path"], rel)
+            file_ids = _rag_chunk_ids(rel, info["sha1"], len(file_chunks))
+            new_chunks.update(zip(file_ids, file_chunks))
+        else:
+            file_ids = list(prev[rel].get("chunk_ids") or [])
+        files[rel] = _rag_manifest_entry(info, file_ids)
+
+    ids = [cid for rel in sorted(files) for cid in files[rel]["chunk_ids"]]
+    if not ids:
+        return None
+
+    if del_ids:
+        idx.delete(del_ids)
+    if new_chunks:
+        idx.add_documents(list(new_chunks.values()), ids=list(new_chunks.keys()))
+
+    chunks: List[Any] = []
+    for cid in ids:
+        doc = new_chunks.get(cid)
+        if doc is None:
+            doc = idx.docstore.search(cid)
+        if Document is not None and not isinstance(doc, Document):
+            raise RuntimeError(f"docstore_missing id={cid}")
+        chunks.append(doc)
+
+    stats = {
+        "added": len(changed - set(prev)), "changed": len(changed & set(prev)), "removed": len(removed),
+        "embedded_chunks": len(new_chunks), "deleted_chunks": len(del_ids),
+    }
+    return idx, chunks, ids, files, stats
+
+
+def _rag_publish_index(idx, chunks: List[Any], ids: List[str], files: Dict[str, Dict], fp: str, mode: str) -> None:
+    """FAISS/BM25/KG/매니페스트/상태 파일을 같은 지문으로 저장하고 RAG_STORE 게시"""
+    _safe_faiss_save(idx, st.RAG_FAISS_DIR)
+
+    # BM25 인덱스 + Knowledge Graph 빌드 (Hybrid Search용, 재시작 시 로드되도록 같은 지문으로 저장)
+    bm25_built, kg_built = _rag_build_aux_indexes(chunks, fp, ids)
+    _rag_save_manifest(files)
+
+    files_count = sum(1 for f in files.values() if f.get("chunk_ids"))  # 원본 문서 수
+    chunks_count = len(chunks)  # 청크 수
+    with st.RAG_LOCK:
+        st.RAG_STORE.update({
+            "ready": True, "hash": fp,
+            "files_count": files_count,
+            "chunks_count": chunks_count,
+            "last_build_ts": time.time(),
+            "error": "", "index": idx,
+            "bm25_ready": bm25_built,
+            "kg_ready": kg_built,
+        })
+
+    _rag_save_state_file({
+        "hash": fp, "files_count": files_count, "chunks_count": chunks_count,
+        "last_build_ts": float(st.RAG_STORE.get("last_build_ts") or time.time()),
+        "error": "", "embed_model": st.RAG_EMBED_MODEL,
+        "bm25_ready": bm25_built, "kg_ready": kg_built,
+    })
+    st.logger.info("RAG_READY(%s) files=%s chunks=%s bm25=%s kg=%s hash=%s",
+                   mode, files_count, chunks_count, bm25_built, kg_built, safe_str(fp)[:10])
+
+
+def rag_build_or_load_index(api_key: str, force_rebuild: bool = False, full_rebuild: bool = False) -> None:
+    """
+    RAG 인덱스 로드/갱신/빌드 (동시 호출은 RAG_BUILD_LOCK으로 직렬화).
+    - 파일 지문이 같고 force_rebuild가 아니면 저장본 로드
+    - 그 외에는 매니페스트 기준 증분 갱신 (추가/변경 파일만 임베딩)
+    - full_rebuild이거나 매니페스트/저장본이 없으면 전체 빌드
+    """
+    with st.RAG_BUILD_LOCK:
+        _rag_build_or_load_index(api_key, force_rebuild, full_rebuild)
+
+
+def _rag_build_or_load_index(api_key: str, force_rebuild: bool, full_rebuild: bool) -> None:
     with st.RAG_LOCK:
         st.RAG_STORE["error"] = ""
 
-    if (FAISS is None) or (OpenAIEmbeddings is None) or (Document is None):
+    if (FAISS is None) or (Document is None):
         with st.RAG_LOCK:
             st.RAG_STORE.update({
                 "ready": False, "index": None,
-                "error": "RAG 비활성화: langchain_community/FAISS 또는 OpenAIEmbeddings 또는 Document import 실패",
+                "error": "RAG 비활성화: langchain_community/FAISS 또는 Document import 실패",
             })
         return
 
+    backend_err = embedding_backend_error()
+    if backend_err:
+        with st.RAG_LOCK:
+            st.RAG_STORE.update({"ready": False, "index": None, "error": f"RAG 비활성화: {backend_err}"})
+        return
+
     k = (api_key or "").strip()
-    if not k:
+    if not k and embedding_backend_requires_key():
         with st.RAG_LOCK:
             st.RAG_STORE.update({
                 "ready": False, "index": None,
@@ -605,14 +1002,17 @@ def rag_build_or_load_index(api_key: str, force_rebuild: bool = False) -> None:
     fp = _rag_files_fingerprint(paths)
 
     # 기존 인덱스 로드 (파일 해시 동일)
-    if (not force_rebuild) and os.path.exists(st.RAG_FAISS_DIR):
+    if (not force_rebuild) and (not full_rebuild) and os.path.exists(st.RAG_FAISS_DIR):
         saved = _rag_load_state_file()
-        if isinstance(saved, dict) and saved.get("hash") == fp:
+        # 문서 지문과 임베딩 모델이 모두 같을 때만 로드 (백엔드를 바꾸면 벡터 차원/공간이 달라 재빌드)
+        if isinstance(saved, dict) and saved.get("hash") == fp and saved.get("embed_model") == st.RAG_EMBED_MODEL:
             try:
                 emb = _make_embeddings(k)
                 if emb is None:
                     raise RuntimeError("embeddings_init_failed")
                 idx = _safe_faiss_load(st.RAG_FAISS_DIR, emb)
+                # Hybrid Search용 BM25/KG도 같은 지문으로 복원 (임베딩 호출 없음)
+                bm25_ready, kg_ready = _rag_restore_aux_indexes(paths, fp)
                 with st.RAG_LOCK:
                     st.RAG_STORE.update({
                         "ready": True, "hash": fp,
@@ -620,26 +1020,44 @@ def rag_build_or_load_index(api_key: str, force_rebuild: bool = False) -> None:
                         "chunks_count": int(saved.get("chunks_count") or saved.get("docs_count") or 0),
                         "last_build_ts": float(saved.get("last_build_ts") or time.time()),
                         "error": "", "index": idx,
+                        "bm25_ready": bm25_ready,
+                        "kg_ready": kg_ready,
                     })
-                st.logger.info("RAG_READY(load) files=%s chunks=%s hash=%s",
-                              st.RAG_STORE.get("files_count"), st.RAG_STORE.get("chunks_count"), safe_str(fp)[:10])
+                st.logger.info("RAG_READY(load) files=%s chunks=%s bm25=%s kg=%s hash=%s",
+                              st.RAG_STORE.get("files_count"), st.RAG_STORE.get("chunks_count"),
+                              bm25_ready, kg_ready, safe_str(fp)[:10])
                 return
             except Exception as e:
                 st.logger.warning("RAG_LOAD_FAIL err=%s", safe_str(e))
 
-    # 새로 빌드
-    docs: List[Any] = []
-    for p in paths:
-        txt = _rag_read_file(p)
-        if not txt:
-            continue
-        rel = os.path.relpath(p, st.RAG_DOCS_DIR).replace("\\", "/")
+    manifest = _rag_load_manifest()
+    prev = manifest.get("files") or {}
+    scan = _rag_scan_files(paths, prev)
+
+    # 증분 갱신 (추가/변경 파일만 청킹 + 임베딩, 삭제/변경 파일의 벡터는 delete)
+    if manifest and (not full_rebuild) and os.path.exists(st.RAG_FAISS_DIR):
         try:
-            docs.append(Document(page_content=txt, metadata={"source": rel}))
-        except Exception:
-            continue
+            emb = _make_embeddings(k)
+            if emb is None:
+                raise RuntimeError("embeddings_init_failed")
+            updated = _rag_update_index(emb, scan, prev)
+            if updated is not None:
+                idx, chunks, ids, files, stats = updated
+                st.logger.info(
+                    "RAG_INCREMENTAL added=%s changed=%s removed=%s embedded_chunks=%s deleted_chunks=%s",
+                    stats["added"], stats["changed"], stats["removed"],
+                    stats["embedded_chunks"], stats["deleted_chunks"],
+                )
+                _rag_publish_index(idx, chunks, ids, files, fp, "incremental")
+                return
+        except Exception as e:
+            st.logger.warning("RAG_INCREMENTAL_FAIL err=%s", safe_str(e))
 
-    if not docs:
+    # 새로 빌드 (파일 단위 청킹 - 청크 ID를 매니페스트에 기록)
+    chunks, ids, files = _rag_chunk_files(scan)
+
+    if not chunks:
+        _rag_drop_manifest()
         with st.RAG_LOCK:
             st.RAG_STORE.update({
                 "ready": False, "index": None, "hash": fp,
@@ -656,58 +1074,15 @@ def rag_build_or_load_index(api_key: str, force_rebuild: bool = False) -> None:
         st.logger.info("RAG_EMPTY docs_dir=%s", st.RAG_DOCS_DIR)
         return
 
-    # 청킹
-    files_count = len(docs)  # 원본 문서 수
-    chunks: List[Any] = []
-    if RecursiveCharacterTextSplitter is not None:
-        try:
-            splitter = RecursiveCharacterTextSplitter(chunk_size=900, chunk_overlap=150)
-            chunks = splitter.split_documents(docs)
-        except Exception:
-            chunks = docs
-    else:
-        chunks = docs
-    chunks_count = len(chunks)  # 청크 수
-
     try:
         emb = _make_embeddings(k)
         if emb is None:
             raise RuntimeError("embeddings_init_failed")
 
-        idx = FAISS.from_documents(chunks, emb)
-        _safe_faiss_save(idx, st.RAG_FAISS_DIR)
-
-        # BM25 인덱스 빌드 (Hybrid Search용)
-        bm25_built = _build_bm25_index(chunks)
-
-        # Knowledge Graph 빌드
-        kg_built = False
-        try:
-            build_knowledge_graph(chunks)
-            kg_built = True
-        except Exception as e:
-            st.logger.warning("KNOWLEDGE_GRAPH_BUILD_FAIL err=%s", safe_str(e))
-
-        with st.RAG_LOCK:
-            st.RAG_STORE.update({
-                "ready": True, "hash": fp,
-                "files_count": files_count,
-                "chunks_count": chunks_count,
-                "last_build_ts": time.time(),
-                "error": "", "index": idx,
-                "bm25_ready": bm25_built,
-                "kg_ready": kg_built,
-            })
-
-        _rag_save_state_file({
-            "hash": fp, "files_count": files_count, "chunks_count": chunks_count,
-            "last_build_ts": float(st.RAG_STORE.get("last_build_ts") or time.time()),
-            "error": "", "embed_model": st.RAG_EMBED_MODEL,
-            "bm25_ready": bm25_built, "kg_ready": kg_built,
-        })
-        st.logger.info("RAG_READY(build) files=%s chunks=%s bm25=%s kg=%s hash=%s",
-                       files_count, chunks_count, bm25_built, kg_built, safe_str(fp)[:10])
+        idx = FAISS.from_documents(chunks, emb, ids=ids)
+        _rag_publish_index(idx, chunks, ids, files, fp, "build")
     except Exception as e:
+        _rag_drop_manifest()
         with st.RAG_LOCK:
             st.RAG_STORE.update({
                 "ready": False, "index": None, "hash": fp,
@@ -717,6 +1092,39 @@ def rag_build_or_load_index(api_key: str, force_rebuild: bool = False) -> None:
         st.logger.exception("RAG_BUILD_FAIL err=%s", safe_str(e))
 
 
+# ============================================================
+# 질의 임베딩 / 검색 결과 캐시
+# ============================================================
+# 같은 질의(에이전트 스트림은 매 메시지 tool_rag_search 호출)의 임베딩 API 왕복과 검색을 생략.
+# 결과 캐시는 RAG_STORE["hash"]를 generation으로 사용 → 인덱스가 바뀌면 자동 무효화
+RAG_QUERY_EMBED_CACHE = LRUTTLCache(st.RAG_QUERY_EMBED_CACHE_SIZE, st.RAG_QUERY_CACHE_TTL_SEC)
+RAG_RESULT_CACHE = LRUTTLCache(st.RAG_RESULT_CACHE_SIZE, st.RAG_QUERY_CACHE_TTL_SEC, copy_values=True)
+
+
+def _rag_query_key(query: str) -> str:
+    """캐시 키용 정규화 (NFKC + 공백 정리)"""
+    return " ".join(unicodedata.normalize("NFKC", safe_str(query)).split())
+
+
+def _rag_similarity_search(idx, query: str, k: int) -> List[Tuple[Any, float]]:
+    """similarity_search_with_score와 같은 결과, 질의 임베딩은 RAG_QUERY_EMBED_CACHE에서 재사용"""
+    emb = getattr(idx, "embedding_function", None)
+    by_vector = getattr(idx, "similarity_search_with_score_by_vector", None)
+    if by_vector is None or not hasattr(emb, "embed_query"):
+        return idx.similarity_search_with_score(query, k=k)
+
+    key = _rag_query_key(query)
+    vec = RAG_QUERY_EMBED_CACHE.get(key, st.RAG_EMBED_MODEL)
+    if vec is None:
+        vec = emb.embed_query(query)
+        RAG_QUERY_EMBED_CACHE.put(key, vec, st.RAG_EMBED_MODEL)
+    return by_vector(vec, k=k)
+
+
+def rag_query_cache_stats() -> Dict[str, Any]:
+    return {"query_embeddings": RAG_QUERY_EMBED_CACHE.stats(), "results": RAG_RESULT_CACHE.stats()}
+
+
 # ============================================================
 # FAISS 벡터 검색 (기본)
 # ============================================================
@@ -731,18 +1139,28 @@ def rag_search_local(query: str, top_k: int = st.RAG_DEFAULT_TOPK, api_key: str
         ready = bool(st.RAG_STORE.get("ready"))
         idx = st.RAG_STORE.get("index")
         err = safe_str(st.RAG_STORE.get("error", ""))
+        gen = safe_str(st.RAG_STORE.get("hash", ""))
 
     if (not ready) or (idx is None):
+        if is_loading("rag"):
+            # 시작 워밍업이 인덱스를 빌드 중이면 중복 빌드 없이 바로 반환
+            return [{"title": "RAG_ERROR", "source": "", "score": 0.0, "content": "RAG 인덱스 준비 중입니다."}]
         rag_build_or_load_index(api_key=api_key, force_rebuild=False)
         with st.RAG_LOCK:
             ready = bool(st.RAG_STORE.get("ready"))
             idx = st.RAG_STORE.get("index")
             err = safe_str(st.RAG_STORE.get("error", ""))
+            gen = safe_str(st.RAG_STORE.get("hash", ""))
         if (not ready) or (idx is None):
             return [{"title": "RAG_ERROR", "source": "", "score": 0.0, "content": err}] if err else []
 
+    cache_key = ("local", _rag_query_key(q), k)
+    cached = RAG_RESULT_CACHE.get(cache_key, gen)
+    if cached is not None:
+        return cached
+
     try:
-        pairs = idx.similarity_search_with_score(q, k=k)
+        pairs = _rag_similarity_search(idx, q, k)
 
         max_dist = float(getattr(st, "RAG_MAX_DISTANCE", 1.6))
 
@@ -775,6 +1193,7 @@ def rag_search_local(query: str, top_k: int = st.RAG_DEFAULT_TOPK, api_key: str
                 "score": round(dist, 6),
                 "content": txt[:st.RAG_SNIPPET_CHARS],
             })
+        RAG_RESULT_CACHE.put(cache_key, out, gen)
         return out
     except Exception as e:
         return [{"title": "RAG_ERROR", "source": "", "score": 0.0, "content": f"RAG 검색 실패: {safe_str(e)}"}]
@@ -808,16 +1227,27 @@ def rag_search_hybrid(
     with st.RAG_LOCK:
         ready = bool(st.RAG_STORE.get("ready"))
         idx = st.RAG_STORE.get("index")
+        gen = safe_str(st.RAG_STORE.get("hash", ""))
 
-    if (not ready) or (idx is None):
+    if ((not ready) or (idx is None)) and not is_loading("rag"):
         rag_build_or_load_index(api_key=effective_key, force_rebuild=False)
         with st.RAG_LOCK:
             ready = bool(st.RAG_STORE.get("ready"))
             idx = st.RAG_STORE.get("index")
+            gen = safe_str(st.RAG_STORE.get("hash", ""))
+
+    # Reranker 로드 여부도 결과를 바꾸므로 키에 포함
+    cache_key = ("hybrid", _rag_query_key(q), k, bool(use_reranking), bool(use_kg), RERANKER_MODEL is not None)
+    cacheable = ready and idx is not None
+    if cacheable:
+        cached = RAG_RESULT_CACHE.get(cache_key, gen)
+        if cached is not None:
+            cached["query"] = q
+            return cached
 
     if ready and idx is not None:
         try:
-            pairs = idx.similarity_search_with_score(q, k=k * 2)  # 더 많이 가져와서 fusion
+            pairs = _rag_similarity_search(idx, q, k * 2)  # 더 많이 가져와서 fusion
             for doc, dist in pairs:
                 try:
                     content = safe_str(getattr(doc, "page_content", ""))
@@ -830,6 +1260,7 @@ def rag_search_hybrid(
                 except Exception:
                     continue
         except Exception as e:
+            cacheable = False
             st.logger.warning("HYBRID_VECTOR_FAIL err=%s", safe_str(e))
 
     # 2. BM25 Search (키워드 기반)
@@ -856,6 +1287,8 @@ def rag_search_hybrid(
             for doc, score in bm25_results
         ]
         search_method = "bm25"
+    elif is_loading("rag"):
+        return {"status": "FAILED", "error": "RAG 인덱스 준비 중입니다.", "results": []}
     else:
         return {"status": "FAILED", "error": "No search results", "results": []}
 
@@ -863,7 +1296,7 @@ def rag_search_hybrid(
     reranked = False
     if use_reranking and RERANKER_AVAILABLE and len(fused_results) > 1:
         fused_results = _rerank_results(q, fused_results, top_k=k)
-        reranked = True
+        reranked = any("rerank_score" in r for r in fused_results)
 
     # top_k 제한 및 content 자르기
     final_results = []
@@ -879,7 +1312,7 @@ def rag_search_hybrid(
         if kg_ready:
             kg_entities = search_knowledge_graph(q, top_k=3)
 
-    return {
+    out = {
         "status": "SUCCESS",
         "query": q,
         "top_k": k,
@@ -891,6 +1324,9 @@ def rag_search_hybrid(
         "results": final_results,
         "kg_entities": kg_entities,
     }
+    if cacheable:
+        RAG_RESULT_CACHE.put(cache_key, out, gen)
+    return out
 
 
 # ============================================================
@@ -927,6 +1363,16 @@ def tool_rag_search(query: str, top_k: int = st.RAG_DEFAULT_TOPK, api_key: str =
     effective_key = safe_str(api_key).strip() or st.OPENAI_API_KEY
     k = int(max(1, min(int(top_k), st.RAG_MAX_TOPK)))
 
+    with st.RAG_LOCK:
+        ready_before = bool(st.RAG_STORE.get("ready"))
+        gen = safe_str(st.RAG_STORE.get("hash", ""))
+    cache_key = ("tool", _rag_query_key(query), k)
+    if ready_before:
+        cached = RAG_RESULT_CACHE.get(cache_key, gen)
+        if cached is not None:
+            cached["query"] = safe_str(query)
+            return cached
+
     gloss = rag_search_glossary(query, top_k=k)
     local = rag_search_local(query, top_k=k, api_key=effective_key)
 
@@ -975,8 +1421,9 @@ def tool_rag_search(query: str, top_k: int = st.RAG_DEFAULT_TOPK, api_key: str =
         rag_ready = bool(st.RAG_STORE.get("ready"))
         rag_err = safe_str(st.RAG_STORE.get("error", ""))
         rag_docs = int(st.RAG_STORE.get("docs_count") or 0)
+        rag_hash = safe_str(st.RAG_STORE.get("hash", ""))
 
-    return {
+    out = {
         "status": "SUCCESS" if merged else "FAILED",
         "query": safe_str(query),
         "top_k": k,
@@ -985,3 +1432,7 @@ def tool_rag_search(query: str, top_k: int = st.RAG_DEFAULT_TOPK, api_key: str =
         "rag_error": rag_err,
         "results": merged,
     }
+    # 인덱스가 준비된 상태의 성공 결과만 저장 (준비 중/오류 응답은 다음 호출에서 다시 검색)
+    if merged and rag_ready and not rag_err and not any(m.get("title") == "RAG_ERROR" for m in merged):
+        RAG_RESULT_CACHE.put(cache_key, out, rag_hash)
+    return out
@@ -63,11 +63,39 @@ USERS: Dict[str, Dict[str, str]] = {
 merchants: pd.DataFrame = pd.DataFrame()
 metrics_clean: pd.DataFrame = pd.DataFrame()
 
+# ============================================================
+# 데이터 스냅샷 (전처리 결과 컬럼형 캐시)
+# ============================================================
+DATA_SNAPSHOT_DIR = os.path.join(BASE_DIR, "data_cache")
+DATA_SNAPSHOT_ENABLED = os.getenv("DATA_SNAPSHOT_ENABLED", "1") != "0"
+DATA_VERSION: str = ""
+# 데이터 교체(재로드/증분 갱신) 직렬화
+DATA_LOCK = Lock()
+# 스냅샷 컬럼을 읽기 전용 memory-map으로 사용 (워커 간 페이지 공유)
+DATA_MMAP_ENABLED = os.getenv("DATA_MMAP", "0") == "1"
+# 다른 워커/프로세스가 게시한 새 스냅샷(CURRENT) 확인 주기 (0이면 확인 안 함)
+DATA_VERSION_CHECK_SEC = float(os.getenv("DATA_VERSION_CHECK_SEC", "10"))
+# 이 크기(bytes) 이상의 metrics.csv는 청크 단위로 적재 (data/ingest.py)
+DATA_CHUNKED_MIN_BYTES = int(os.getenv("DATA_CHUNKED_MIN_BYTES", str(256 * 1024 * 1024)))
+DATA_CSV_CHUNK_ROWS = int(os.getenv("DATA_CSV_CHUNK_ROWS", "200000"))
+
+# ============================================================
+# 백그라운드 워밍업 / 준비 상태 (core/readiness.py)
+# ============================================================
+# 서브시스템별 {"status": pending|loading|ready|failed|skipped, "error", "started_ts", "elapsed_sec"}
+READINESS: Dict[str, Dict[str, Any]] = {}
+READINESS_LOCK = Lock()
+# 시작 시 미리 로드하지 않을 선택 서브시스템 (쉼표 구분, 예: "ocr,reranker") -> 첫 사용 시 지연 로드
+WARMUP_SKIP = {x.strip() for x in os.getenv("WARMUP_SKIP", "").split(",") if x.strip()}
+READY_RETRY_AFTER_SEC = 5
+
 # ============================================================
 # 캐시
 # ============================================================
-LATEST_METRICS_MAP: Dict[str, pd.Series] = {}
-METRICS_BY_MERCHANT: Dict[str, pd.DataFrame] = {}
+LATEST_STORE: Optional[Any] = None  # data.latest_store.LatestMetricsStore
+METRICS_HISTORY: Optional[Any] = None  # data.history_index.MerchantHistoryIndex
+METRICS_CUBE: Optional[Any] = None  # data.cube.MetricsCube (월 × 업종 × 지역 × 성장유형 집계)
+RANK_INDEX: Optional[Any] = None  # data.rank_index.MerchantRankIndex (가맹점 랭킹 그룹/월 합계)
 INDUSTRY_NORM_MAP: Dict[str, str] = {}
 
 # ============================================================
@@ -80,11 +108,34 @@ scaler: Optional[Any] = None
 le_industry: Optional[Any] = None
 le_region: Optional[Any] = None
 le_growth: Optional[Any] = None
+# 모델 교체(로드/MLflow 선택)마다 증가 -> 점수 테이블 무효화 기준
+MODEL_VERSION: int = 0
+# 최신 월 기준 가맹점별 예측/이상/성장 점수 (ml.scores.ScoreTable)
+SCORE_TABLE: Optional[Any] = None
+SCORE_LOCK = Lock()
+# 이상 탐지 설명용 피처 중앙값 ((데이터 버전, 프레임 id), {feature: median})
+ANOMALY_MEDIANS: Optional[Any] = None
+# 전체 가맹점-월 이상 점수 (ml.anomaly_scan.AnomalyScan)
+ANOMALY_SCAN: Optional[Any] = None
+ANOMALY_SCAN_LOCK = Lock()
+ANOMALY_SCAN_CHUNK_ROWS = int(os.getenv("ANOMALY_SCAN_CHUNK_ROWS", "50000"))
+# 평탄화된 트리 모델 ((MODEL_VERSION, {모델명: ml.forest.FlatForest}))
+FLAT_FORESTS: Optional[Any] = None
+# 1이면 rf_reg/rf_clf 예측을 평탄화 배열 순회로 수행 (실패 시 sklearn 폴백)
+FOREST_COMPILED = os.getenv("FOREST_COMPILED", "1") == "1"
+# 가맹점별 트리 기여도 설명 (((DATA_VERSION, MODEL_VERSION), {(모델명, 가맹점ID): 분해 결과}))
+CONTRIB_CACHE: Optional[Any] = None
 
 # ============================================================
 # 추천 시스템
 # ============================================================
 sar_model: Optional[Any] = None
+# 1이면 SAR 점수를 추출한 희소 행렬로 직접 계산 (ml.sar_serving.SarScorer, recommenders 호출 없음)
+SAR_NATIVE = os.getenv("SAR_NATIVE", "1") == "1"
+SAR_SERVING_CACHE = os.path.join(BASE_DIR, "data_cache", "sar_serving.npz")
+SAR_SCORER: Optional[Any] = None
+# 일괄 추천 시 한 번에 행렬 곱을 수행할 고객 수 (메모리 = 고객 수 × 가맹점 수 float64)
+SAR_BATCH_CHUNK_USERS = int(os.getenv("SAR_BATCH_CHUNK_USERS", "2048"))
 POPULAR_MERCHANTS: List[Dict[str, Any]] = []
 
 # ============================================================
@@ -100,7 +151,26 @@ LAST_CONTEXT_TTL_SEC = 600
 RAG_DOCS_DIR = os.path.join(BASE_DIR, "rag_docs")
 RAG_FAISS_DIR = os.path.join(BASE_DIR, "rag_faiss")
 RAG_STATE_FILE = os.path.join(RAG_FAISS_DIR, "rag_state.json")
-RAG_EMBED_MODEL = "text-embedding-3-small"
+# FAISS와 같은 파일 지문(hash)으로 저장되는 BM25 토큰/문서 맵, Knowledge Graph (재시작 시 임베딩 없이 복원)
+RAG_BM25_FILE = os.path.join(RAG_FAISS_DIR, "bm25.json")
+RAG_KG_FILE = os.path.join(RAG_FAISS_DIR, "knowledge_graph.json")
+# 파일별 (sha1, 크기, 수정 시각, 청크 ID) 매니페스트 - 업로드/삭제 시 바뀐 파일만 임베딩/삭제하는 증분 인덱싱용
+RAG_MANIFEST_FILE = os.path.join(RAG_FAISS_DIR, "manifest.json")
+# 임베딩 백엔드 (rag.embeddings 레지스트리): openai = OpenAIEmbeddings / local = 문자 n-gram 해싱 (API 키/네트워크 불필요)
+RAG_EMBED_BACKEND = os.getenv("RAG_EMBED_BACKEND", "openai").strip().lower()
+RAG_LOCAL_EMBED_DIM = int(os.getenv("RAG_LOCAL_EMBED_DIM", "768"))
+RAG_LOCAL_EMBED_BATCH = int(os.getenv("RAG_LOCAL_EMBED_BATCH", "256"))
+# 매니페스트/임베딩 캐시 키에 쓰이므로 백엔드를 바꾸면 다음 빌드는 전체 빌드
+RAG_EMBED_MODEL = f"local-char-ngram-d{RAG_LOCAL_EMBED_DIM}" if RAG_EMBED_BACKEND == "local" else "text-embedding-3-small"
+# (임베딩 모델, 텍스트 sha1) 키 임베딩 디스크 캐시 (rag.embeddings.CachedEmbeddings) - 재빌드/중복 청크 재임베딩 방지
+RAG_EMBED_CACHE_ENABLED = os.getenv("RAG_EMBED_CACHE", "1") == "1"
+RAG_EMBED_CACHE_FILE = os.path.join(BASE_DIR, "data_cache", "rag_embeddings.sqlite")
+RAG_EMBED_CACHE_MAX_ROWS = int(os.getenv("RAG_EMBED_CACHE_MAX_ROWS", "200000"))
+RAG_EMBED_CACHE: Optional[Any] = None
+# 프로세스 내 질의 임베딩 / 검색 결과 LRU+TTL 캐시 (RAG_STORE["hash"]가 바뀌면 결과 캐시 자동 무효화)
+RAG_QUERY_CACHE_TTL_SEC = float(os.getenv("RAG_QUERY_CACHE_TTL_SEC", "600"))
+RAG_QUERY_EMBED_CACHE_SIZE = int(os.getenv("RAG_QUERY_EMBED_CACHE_SIZE", "1024"))
+RAG_RESULT_CACHE_SIZE = int(os.getenv("RAG_RESULT_CACHE_SIZE", "512"))
 RAG_ALLOWED_EXTS = {".txt", ".md", ".json", ".csv", ".log", ".pdf"}
 RAG_MAX_DOC_CHARS = 200000
 RAG_SNIPPET_CHARS = 1200
@@ -108,6 +178,7 @@ RAG_DEFAULT_TOPK = 3
 RAG_MAX_TOPK = 10
 
 RAG_LOCK = Lock()
+RAG_BUILD_LOCK = Lock()  # 인덱스 빌드/증분 갱신 직렬화 (백그라운드 작업이 겹쳐도 저장본이 어긋나지 않도록)
 RAG_STORE: Dict[str, Any] = {
     "ready": False,
     "hash": "",